@@ -0,0 +1,229 @@
+import asyncio
+import os
+import time
+from web3 import Web3
+from dotenv import load_dotenv
+import relayer
+from relayer import (
+    ETH_CONTRACT_OWNER_ADDRESS, ETH_CONTRACT_OWNER_PRIVATE_KEY,
+    BSC_CONTRACT_OWNER_ADDRESS, BSC_CONTRACT_OWNER_PRIVATE_KEY,
+    BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS, BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY,
+    RELAYER_POLL_INTERVAL, RELAYER_CHECKPOINT_FILE, LOGS_MAX_BLOCK_RANGE, LOGS_BACKFILL_WORKERS,
+    LOGS_MIN_POLL_INTERVAL, LOGS_MAX_POLL_INTERVAL,
+    record_fee_owed, watch_transaction, record_relay_tx, record_stage, once_per_transfer, reconcile_claims,
+    events_handled, event_to_transaction_latency,
+)
+from utils.transferjournal import (
+    STAGE_LOCKED, STAGE_TRANSFER_INITIATED, STAGE_BURN_INITIATED, STAGE_RELEASED, STAGE_RELEASE_FAILED,
+)
+from utils.logpoller import AsyncLogPoller
+from utils.checkpoint import BlockCheckpoint
+from utils.nonces import async_send_transaction
+from utils.chainclient import get_async_web3, get_contract, lazy
+from utils.lifecycle import stop_flag
+from utils.metrics import queue_depth
+
+# Load environment variables
+load_dotenv()
+
+# Handler coroutines per event type, and how many decoded events may wait per event type before ingestion blocks
+ASYNC_RELAYER_WORKERS = int(os.getenv('ASYNC_RELAYER_WORKERS', '8'))
+ASYNC_RELAYER_QUEUE_SIZE = int(os.getenv('ASYNC_RELAYER_QUEUE_SIZE', '100'))
+
+# AsyncWeb3 instances for Ethereum and BSC, contracts share the ABIs already parsed for the threaded services
+async_web3_eth = lazy(get_async_web3, 'ethereum')
+async_web3_bsc = lazy(get_async_web3, 'bsc')
+
+erc20_lock_contract = lazy(get_contract, 'ERC20Lock', asynchronous=True)
+bep20_contract = lazy(get_contract, 'BEP20Mintable', asynchronous=True)
+burnAndReleaseContract = lazy(get_contract, 'BurnAndReleaseCoordinator', asynchronous=True)
+
+
+@once_per_transfer(STAGE_LOCKED, 'eth_to_bsc')
+async def handle_tokens_locked(event, logger=None):
+    args = event.args
+    print(f'[AsyncRelayer] TokensLocked event detected: {args.fromUserAddressOnEthereumChain} locked {args.amount}')
+    tx_hash = await async_send_transaction(async_web3_bsc, 'bsc', bep20_contract.functions.mint(args.toUserAddressOnBinanceChain, args.amount, args.fromUserAddressOnEthereumChain, args.transferRequestId), {
+        'from': BSC_CONTRACT_OWNER_ADDRESS,
+        'gas': 2000000,
+        **(await asyncio.to_thread(relayer.bsc_gas_oracle.tx_params))
+    }, BSC_CONTRACT_OWNER_PRIVATE_KEY)
+    await asyncio.to_thread(record_relay_tx, STAGE_LOCKED, args.transferRequestId, tx_hash)
+    print(f'[AsyncRelayer] Created Transaction for Minting {args.amount} tokens for {args.toUserAddressOnBinanceChain} on BSC. TxHash: {Web3.to_hex(tx_hash)}')
+    watch_transaction(relayer.web3_bsc, 'bsc', tx_hash, 'Mint')
+    record_fee_owed('Mint')
+    await asyncio.to_thread(record_stage, STAGE_LOCKED, event, 'eth_to_bsc', tx_hash)
+
+@once_per_transfer(STAGE_BURN_INITIATED, 'bsc_to_eth')
+async def handle_burn_initiated(event, logger=None):
+    args = event.args
+    print('[AsyncRelayer] TokensBurnInitiated event detected')
+    tx_hash = await async_send_transaction(async_web3_eth, 'ethereum', erc20_lock_contract.functions.releaseTokens(args.tokenAddress, args.toUserAddressOnEthereumChain, args.amount, args.fromUserAddressOnBinanceChain, args.transferRequestId), {
+        'from': ETH_CONTRACT_OWNER_ADDRESS,
+        'gas': 2000000,
+        **(await asyncio.to_thread(relayer.eth_gas_oracle.tx_params))
+    }, ETH_CONTRACT_OWNER_PRIVATE_KEY)
+    await asyncio.to_thread(record_relay_tx, STAGE_BURN_INITIATED, args.transferRequestId, tx_hash)
+    print(f'[AsyncRelayer] Created Transaction for Unlocking {args.amount} tokens for {args.toUserAddressOnEthereumChain} on Ethereum. TxHash: {Web3.to_hex(tx_hash)}')
+    watch_transaction(relayer.web3_eth, 'ethereum', tx_hash, 'Release tokens')
+    record_fee_owed('Release')
+    await asyncio.to_thread(record_stage, STAGE_BURN_INITIATED, event, 'bsc_to_eth', tx_hash)
+
+@once_per_transfer(STAGE_TRANSFER_INITIATED, 'bsc_to_eth')
+async def handle_tokens_transfer_initiated(event, logger=None):
+    args = event.args
+    print('[AsyncRelayer] TokensTransferInitiated event detected')
+    tx_hash = await async_send_transaction(async_web3_bsc, 'bsc', burnAndReleaseContract.functions.initateBurnAndRelease(args.tokenAddress, args.fromUserAddressOnBinanceChain, args.amount, args.toUserAddressOnEthereumChain, args.transferRequestId), {
+        'from': BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS,
+        'gas': 2000000,
+        **(await asyncio.to_thread(relayer.bsc_gas_oracle.tx_params))
+    }, BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY)
+    await asyncio.to_thread(record_relay_tx, STAGE_TRANSFER_INITIATED, args.transferRequestId, tx_hash)
+    print(f'[AsyncRelayer] Created Transaction for Initiating Burn of {args.amount} tokens for {args.fromUserAddressOnBinanceChain} on Binance. TxHash: {Web3.to_hex(tx_hash)}')
+    watch_transaction(relayer.web3_bsc, 'bsc', tx_hash, 'Initiate burn and release')
+    record_fee_owed('Coordinator')
+    await asyncio.to_thread(record_stage, STAGE_TRANSFER_INITIATED, event, 'bsc_to_eth', tx_hash)
+
+@once_per_transfer(STAGE_RELEASED, 'bsc_to_eth')
+async def handle_tokens_released(event, logger=None):
+    args = event.args
+    print(f'[AsyncRelayer] TokensReleased event detected: {args.toUserAddressOnEthereumChain} released {args.amount}')
+    tx_hash = await async_send_transaction(async_web3_bsc, 'bsc', burnAndReleaseContract.functions.releaseCompleted(args.tokenAddress, args.toUserAddressOnEthereumChain, args.amount, args.fromUserAddressOnBinanceChain, args.transferRequestId), {
+        'from': BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS,
+        'gas': 2000000,
+        **(await asyncio.to_thread(relayer.bsc_gas_oracle.tx_params))
+    }, BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY)
+    await asyncio.to_thread(record_relay_tx, STAGE_RELEASED, args.transferRequestId, tx_hash)
+    print(f'[AsyncRelayer] Created Transaction for Release completion of {args.amount} tokens for {args.toUserAddressOnEthereumChain} on Ethereum. TxHash: {Web3.to_hex(tx_hash)}')
+    watch_transaction(relayer.web3_bsc, 'bsc', tx_hash, 'Release completed')
+    record_fee_owed('Coordinator')
+    await asyncio.to_thread(record_stage, STAGE_RELEASED, event, 'bsc_to_eth', tx_hash)
+
+@once_per_transfer(STAGE_RELEASE_FAILED, 'bsc_to_eth')
+async def handle_token_release_failed(event, logger=None):
+    args = event.args
+    print('[AsyncRelayer] TokenReleaseFailed event detected')
+    tx_hash = await async_send_transaction(async_web3_bsc, 'bsc', burnAndReleaseContract.functions.releaseFailed(args.tokenAddress, args.toUserAddressOnEthereumChain, args.amount, args.fromUserAddressOnBinanceChain, args.transferRequestId), {
+        'from': BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS,
+        'gas': 2000000,
+        **(await asyncio.to_thread(relayer.bsc_gas_oracle.tx_params))
+    }, BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY)
+    await asyncio.to_thread(record_relay_tx, STAGE_RELEASE_FAILED, args.transferRequestId, tx_hash)
+    print(f'[AsyncRelayer] Created Transaction for Release Failure of {args.amount} tokens for {args.toUserAddressOnEthereumChain} on Ethereum. TxHash: {Web3.to_hex(tx_hash)}')
+    watch_transaction(relayer.web3_bsc, 'bsc', tx_hash, 'Release failed')
+    record_fee_owed('Coordinator')
+    await asyncio.to_thread(record_stage, STAGE_RELEASE_FAILED, event, 'bsc_to_eth', tx_hash)
+
+async def handle_tokens_minted(event, logger=None):
+    # Claims and completion records go through the same store and writer as the threaded relayer, off the event loop
+    await asyncio.to_thread(relayer.handle_tokens_minted, event, logger)
+
+async def handle_transfer_completed(event, logger=None):
+    await asyncio.to_thread(relayer.handle_transfer_completed, event, logger)
+
+async def handle_returned_tokens(event, logger=None):
+    await asyncio.to_thread(relayer.handle_returned_tokens, event, logger)
+
+
+class AsyncRelayer:
+    """
+    Runs one log-ingestion task per chain, feeding a bounded queue per event type
+    that is drained by a pool of handler coroutines. Ingestion waits for a fetched
+    range to be fully handled before committing its checkpoint, only up to the
+    block before the earliest failed event, and blocks on a full queue, so slow
+    handlers slow down ingestion instead of piling up events.
+    """
+
+    def __init__(self, logger=None, workers_per_event=None, queue_size=ASYNC_RELAYER_QUEUE_SIZE, poll_interval=RELAYER_POLL_INTERVAL):
+        self.logger = logger
+        self.workers_per_event = workers_per_event or {}
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.queues = {}
+
+    def create_log_pollers(self):
+        checkpoint = BlockCheckpoint(RELAYER_CHECKPOINT_FILE)
+        eth_poller = AsyncLogPoller(async_web3_eth, 'ethereum', checkpoint, LOGS_MAX_BLOCK_RANGE, LOGS_BACKFILL_WORKERS,
+                                    LOGS_MIN_POLL_INTERVAL, LOGS_MAX_POLL_INTERVAL)
+        eth_poller.watch(erc20_lock_contract, 'TokensLocked', handle_tokens_locked)
+        eth_poller.watch(erc20_lock_contract, 'TokensReleased', handle_tokens_released)
+        eth_poller.watch(erc20_lock_contract, 'TokenReleaseFailed', handle_token_release_failed)
+
+        bsc_poller = AsyncLogPoller(async_web3_bsc, 'bsc', checkpoint, LOGS_MAX_BLOCK_RANGE, LOGS_BACKFILL_WORKERS,
+                                    LOGS_MIN_POLL_INTERVAL, LOGS_MAX_POLL_INTERVAL)
+        bsc_poller.watch(bep20_contract, 'TokensMinted', handle_tokens_minted)
+        bsc_poller.watch(bep20_contract, 'TokensTransferInitiated', handle_tokens_transfer_initiated)
+        bsc_poller.watch(burnAndReleaseContract, 'BurnInitiated', handle_burn_initiated)
+        bsc_poller.watch(burnAndReleaseContract, 'TransferCompleted', handle_transfer_completed)
+        bsc_poller.watch(burnAndReleaseContract, 'ReturnedTokens', handle_returned_tokens)
+        return {
+            eth_poller: ['TokensLocked', 'TokensReleased', 'TokenReleaseFailed'],
+            bsc_poller: ['TokensMinted', 'TokensTransferInitiated', 'BurnInitiated', 'TransferCompleted', 'ReturnedTokens'],
+        }
+
+    async def handle_events(self, event_name):
+        queue = self.queues[event_name]
+        handled = events_handled.labels(event_name, 'ok')
+        failed = events_handled.labels(event_name, 'error')
+        latency = event_to_transaction_latency.labels(event_name)
+        while True:
+            event, handler, fetched_at, failed_blocks = await queue.get()
+            try:
+                await handler(event, self.logger)
+                handled.inc()
+            except Exception as e:
+                failed.inc()
+                # Reported to the ingestion task, which keeps this block out of the checkpoint
+                failed_blocks.append(event.blockNumber)
+                print(f'[AsyncRelayer] Error handling {event_name} event: {e}')
+            finally:
+                # Includes the time the event waited in its queue
+                latency.observe(time.monotonic() - fetched_at)
+                queue.task_done()
+
+    async def ingest(self, poller, event_names):
+        while not stop_flag.is_set():
+            try:
+                events = await poller.poll()
+            except Exception as e:
+                print(f'[AsyncRelayer] Error fetching logs on {poller.chain_name}: {e}')
+                await asyncio.sleep(self.poll_interval)
+                continue
+            fetched_at = time.monotonic()
+            failed_blocks = []
+            for event, handler in events:
+                await self.queues[event.event].put((event, handler, fetched_at, failed_blocks))
+            await asyncio.gather(*(self.queues[event_name].join() for event_name in event_names))
+            if failed_blocks:
+                # Events are handled out of order, so the range is only committed up to the earliest failure.
+                # Its block is fetched again, events already handled in it are skipped as duplicates
+                poller.commit(min(failed_blocks) - 1)
+                await asyncio.sleep(self.poll_interval)
+                continue
+            poller.commit()
+            # Each chain's ingestion task follows that chain's block time
+            await asyncio.sleep(poller.next_poll_delay())
+
+    async def run(self):
+        await asyncio.to_thread(reconcile_claims)
+        workers = []
+        ingesters = []
+        for poller, event_names in self.create_log_pollers().items():
+            for event_name in event_names:
+                self.queues[event_name] = asyncio.Queue(maxsize=self.queue_size)
+                queue_depth.labels(queue=f'async_relayer_{event_name}').set_function(self.queues[event_name].qsize)
+                for _ in range(self.workers_per_event.get(event_name, ASYNC_RELAYER_WORKERS)):
+                    workers.append(asyncio.create_task(self.handle_events(event_name)))
+            ingesters.append(asyncio.create_task(self.ingest(poller, event_names)))
+        # Ingestion returns once stop_flag is set, after the events it queued have been handled
+        await asyncio.gather(*ingesters)
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def run_async_relayer(logger=None):
+    asyncio.run(AsyncRelayer(logger).run())
+
+if __name__ == '__main__':
+    run_async_relayer(logger=None)
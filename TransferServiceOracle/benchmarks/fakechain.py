@@ -0,0 +1,439 @@
+"""
+Stand-in JSON-RPC node for benchmarking the oracle without a real chain.
+
+FakeChain serves just enough of the Ethereum JSON-RPC API for the relayer,
+the receipt generator and the fee estimator: block numbers, scripted logs
+for eth_getLogs, eth_sendRawTransaction with receipts that appear after a
+configurable delay, fee history and constant answers for reads. Latency,
+errors and reorgs can be injected, so the oracle's own overhead can be told
+apart from the node's.
+
+Logs are scripted from Python with emit(), which ABI-encodes an event of a
+web3 contract, and sealed into blocks by mine(), by a block_time timer, or by
+every eth_sendRawTransaction when block_time is 0. The server runs on a
+daemon thread of the calling process and keeps count of the CPU time it
+uses, so a benchmark can leave it out of its own measurement.
+
+Transactions are not executed or validated: a raw transaction is hashed,
+included in a block and given a successful receipt.
+
+Standalone, for pointing service.py at an idle chain:
+
+    python benchmarks/fakechain.py --port 8545 --block-time 2 --latency 0.05
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eth_abi import encode
+from eth_utils import encode_hex, event_abi_to_log_topic, keccak
+from utils.logpoller import find_event_abi
+
+ZERO_ADDRESS = '0x' + '00' * 20
+EMPTY_BLOOM = '0x' + '00' * 256
+
+
+def parse_block(tag, head):
+    if tag in (None, 'latest', 'pending', 'safe', 'finalized'):
+        return head
+    if tag == 'earliest':
+        return 0
+    return int(tag, 16)
+
+
+class RPCError(Exception):
+    def __init__(self, message, code=-32000):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeChain:
+    """
+    One fake chain. Every knob is a plain attribute and can be changed while
+    the server runs:
+
+    latency, jitter   seconds added to every HTTP request (a batch counts once)
+    error_rate        fraction of requests answered with an injected error,
+                      HTTP error_status when it is set, else a JSON-RPC error
+    error_methods     only inject errors into these methods, all when empty
+    receipt_delay     seconds from eth_sendRawTransaction to the receipt
+    block_time        seconds between blocks mined by the timer, 0 mines one
+                      block per raw transaction instead
+    """
+
+    def __init__(self, chain_id=31337, block_time=0, receipt_delay=0, latency=0, jitter=0, error_rate=0,
+                 error_status=503, error_methods=(), gas_used=50000, base_fee=10 ** 9, priority_fee=10 ** 9):
+        self.chain_id = chain_id
+        self.block_time = block_time
+        self.receipt_delay = receipt_delay
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_methods = set(error_methods)
+        self.gas_used = gas_used
+        self.base_fee = base_fee
+        self.priority_fee = priority_fee
+        # Answer of eth_call per (lower-case address, 4-byte selector), 32 zero bytes otherwise
+        self.call_results = {}
+
+        self.head = 0
+        self.epoch = 0
+        self.blocks = {0: {'timestamp': int(time.time()), 'logs': [], 'transactions': []}}
+        self.transactions = {}
+        self._pending_logs = []
+        self._pending_transactions = []
+        self._lock = threading.RLock()
+
+        # Statistics read by the benchmarks
+        self.requests = Counter()
+        self.batches = 0
+        self.errors_injected = 0
+        self.logs_served = 0
+        self.served_to = 0
+        self.raw_transactions = 0
+        self.cpu_time = 0.0
+
+        self._server = None
+        self._stopped = threading.Event()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self, host='127.0.0.1', port=0):
+        self._server = ThreadingHTTPServer((host, port), _RPCHandler)
+        self._server.daemon_threads = True
+        self._server.chain = self
+        threading.Thread(target=self._server.serve_forever, name=f'FakeChain-{self.chain_id}', daemon=True).start()
+        if self.block_time > 0:
+            threading.Thread(target=self._mine_on_timer, name=f'FakeChainMiner-{self.chain_id}', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _mine_on_timer(self):
+        while not self._stopped.wait(self.block_time):
+            started = time.thread_time()
+            self.mine()
+            self.add_cpu_time(time.thread_time() - started)
+
+    def add_cpu_time(self, seconds):
+        with self._lock:
+            self.cpu_time += seconds
+
+    # Scripting
+
+    def block_hash(self, number):
+        return encode_hex(keccak(f'{self.chain_id}:{self.epoch}:{number}'.encode()))
+
+    def add_log(self, address, topics, data='0x'):
+        """Queues a raw log for the next mined block."""
+        with self._lock:
+            self._pending_logs.append({'address': address.lower(), 'topics': list(topics), 'data': data})
+
+    def emit(self, contract, event_name, **args):
+        """Queues an event of a web3 contract for the next mined block, encoded from its ABI."""
+        event_abi = find_event_abi(contract, event_name)
+        topics = [encode_hex(event_abi_to_log_topic(event_abi))]
+        data_types, data_values = [], []
+        for entry in event_abi['inputs']:
+            if entry['indexed']:
+                topics.append(encode_hex(encode([entry['type']], [args[entry['name']]])))
+            else:
+                data_types.append(entry['type'])
+                data_values.append(args[entry['name']])
+        self.add_log(contract.address, topics, encode_hex(encode(data_types, data_values)))
+
+    def mine(self, count=1):
+        """Seals the queued logs and transactions into the next block, then mines count - 1 empty ones. Returns the head."""
+        with self._lock:
+            for _ in range(count):
+                self.head += 1
+                block_hash = self.block_hash(self.head)
+                logs = []
+                for index, log in enumerate(self._pending_logs):
+                    tx_hash = encode_hex(keccak(f'{block_hash}:{index}'.encode()))
+                    logs.append(dict(
+                        log, blockNumber=hex(self.head), blockHash=block_hash, transactionHash=tx_hash,
+                        transactionIndex=hex(index), logIndex=hex(index), removed=False,
+                    ))
+                for tx_hash in self._pending_transactions:
+                    self.transactions[tx_hash]['block'] = self.head
+                self.blocks[self.head] = {'timestamp': int(time.time()), 'logs': logs, 'transactions': self._pending_transactions}
+                self._pending_logs = []
+                self._pending_transactions = []
+            return self.head
+
+    def reorg(self, depth, replay=True):
+        """
+        Drops the last depth blocks and mines depth + 1 new ones with new hashes.
+        With replay, their logs and transactions are included again in the first
+        new block, the way a reorg usually re-includes them at another height.
+        """
+        with self._lock:
+            fork = max(0, self.head - depth)
+            dropped = [self.blocks.pop(number) for number in range(fork + 1, self.head + 1)]
+            self.head = fork
+            self.epoch += 1
+            self.served_to = min(self.served_to, fork)
+            for block in dropped:
+                for tx_hash in block['transactions']:
+                    self.transactions[tx_hash]['block'] = None
+                if replay:
+                    self._pending_logs.extend(
+                        {'address': log['address'], 'topics': log['topics'], 'data': log['data']} for log in block['logs']
+                    )
+                    self._pending_transactions.extend(block['transactions'])
+            return self.mine(depth + 1)
+
+    # JSON-RPC
+
+    def handle_payload(self, payload):
+        """Returns (HTTP status, response object) for a request or a batch."""
+        if isinstance(payload, list):
+            with self._lock:
+                self.batches += 1
+            methods = [request.get('method') for request in payload]
+        else:
+            methods = [payload.get('method')]
+        if self.error_rate and random.random() < self.error_rate and (not self.error_methods or self.error_methods.intersection(methods)):
+            with self._lock:
+                self.errors_injected += 1
+            if self.error_status:
+                return self.error_status, {'error': 'injected error'}
+            error = {'code': -32000, 'message': 'injected error'}
+            if isinstance(payload, list):
+                return 200, [{'jsonrpc': '2.0', 'id': request.get('id'), 'error': error} for request in payload]
+            return 200, {'jsonrpc': '2.0', 'id': payload.get('id'), 'error': error}
+        if isinstance(payload, list):
+            return 200, [self.handle_request(request) for request in payload]
+        return 200, self.handle_request(payload)
+
+    def handle_request(self, request):
+        method = request.get('method')
+        with self._lock:
+            self.requests[method] += 1
+        reply = {'jsonrpc': '2.0', 'id': request.get('id')}
+        handler = getattr(self, 'rpc_' + str(method), None)
+        if handler is None:
+            reply['error'] = {'code': -32601, 'message': f'Method {method} not supported by FakeChain'}
+            return reply
+        try:
+            reply['result'] = handler(*request.get('params', []))
+        except RPCError as e:
+            reply['error'] = {'code': e.code, 'message': str(e)}
+        return reply
+
+    def rpc_eth_chainId(self):
+        return hex(self.chain_id)
+
+    def rpc_net_version(self):
+        return str(self.chain_id)
+
+    def rpc_web3_clientVersion(self):
+        return 'FakeChain/1.0'
+
+    def rpc_eth_syncing(self):
+        return False
+
+    def rpc_eth_blockNumber(self):
+        return hex(self.head)
+
+    def rpc_eth_getBlockByNumber(self, tag, full_transactions=False):
+        with self._lock:
+            number = parse_block(tag, self.head)
+            block = self.blocks.get(number)
+            if block is None:
+                return None
+            return {
+                'number': hex(number),
+                'hash': self.block_hash(number),
+                'parentHash': self.block_hash(number - 1) if number else '0x' + '00' * 32,
+                'timestamp': hex(block['timestamp']),
+                'baseFeePerGas': hex(self.base_fee),
+                'gasLimit': hex(30000000),
+                'gasUsed': hex(self.gas_used * len(block['transactions'])),
+                'miner': ZERO_ADDRESS,
+                'difficulty': '0x0',
+                'totalDifficulty': '0x0',
+                'extraData': '0x',
+                'logsBloom': EMPTY_BLOOM,
+                'nonce': '0x0000000000000000',
+                'mixHash': '0x' + '00' * 32,
+                'sha3Uncles': '0x' + '00' * 32,
+                'stateRoot': '0x' + '00' * 32,
+                'transactionsRoot': '0x' + '00' * 32,
+                'receiptsRoot': '0x' + '00' * 32,
+                'size': '0x0',
+                'transactions': list(block['transactions']),
+                'uncles': [],
+            }
+
+    def rpc_eth_getLogs(self, log_filter):
+        addresses = log_filter.get('address') or []
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {address.lower() for address in addresses}
+        topic_filters = [
+            None if topic is None else {topic} if isinstance(topic, str) else set(topic)
+            for topic in log_filter.get('topics') or []
+        ]
+        with self._lock:
+            from_block = parse_block(log_filter.get('fromBlock'), self.head)
+            to_block = min(parse_block(log_filter.get('toBlock'), self.head), self.head)
+            logs = []
+            for number in range(from_block, to_block + 1):
+                for log in self.blocks.get(number, {'logs': ()})['logs']:
+                    if addresses and log['address'] not in addresses:
+                        continue
+                    if any(wanted is not None and (position >= len(log['topics']) or log['topics'][position] not in wanted)
+                           for position, wanted in enumerate(topic_filters)):
+                        continue
+                    logs.append(log)
+            self.logs_served += len(logs)
+            self.served_to = max(self.served_to, to_block)
+            return logs
+
+    def rpc_eth_sendRawTransaction(self, raw_transaction):
+        tx_hash = encode_hex(keccak(hexstr=raw_transaction))
+        with self._lock:
+            self.raw_transactions += 1
+            self.transactions[tx_hash] = {'sent_at': time.monotonic(), 'block': None}
+            self._pending_transactions.append(tx_hash)
+            if self.block_time <= 0:
+                self.mine()
+        return tx_hash
+
+    def rpc_eth_getTransactionReceipt(self, tx_hash):
+        with self._lock:
+            transaction = self.transactions.get(tx_hash)
+            if transaction is None or transaction['block'] is None:
+                return None
+            if time.monotonic() < transaction['sent_at'] + self.receipt_delay:
+                return None
+            number = transaction['block']
+            return {
+                'transactionHash': tx_hash,
+                'transactionIndex': hex(self.blocks[number]['transactions'].index(tx_hash)),
+                'blockHash': self.block_hash(number),
+                'blockNumber': hex(number),
+                'from': ZERO_ADDRESS,
+                'to': ZERO_ADDRESS,
+                'cumulativeGasUsed': hex(self.gas_used),
+                'gasUsed': hex(self.gas_used),
+                'effectiveGasPrice': hex(self.base_fee + self.priority_fee),
+                'contractAddress': None,
+                'logs': [],
+                'logsBloom': EMPTY_BLOOM,
+                'status': '0x1',
+                'type': '0x2',
+            }
+
+    def rpc_eth_getTransactionCount(self, address, tag='latest'):
+        # Nonces are not validated, the oracle's nonce manager only reads this once per signer
+        return '0x0'
+
+    def rpc_eth_feeHistory(self, block_count, newest, percentiles=()):
+        count = min(int(block_count, 16) if isinstance(block_count, str) else int(block_count), max(self.head, 1))
+        newest_block = parse_block(newest, self.head)
+        return {
+            'oldestBlock': hex(max(0, newest_block - count + 1)),
+            'baseFeePerGas': [hex(self.base_fee)] * (count + 1),
+            'gasUsedRatio': [0.5] * count,
+            'reward': [[hex(self.priority_fee)] * len(percentiles)] * count,
+        }
+
+    def rpc_eth_gasPrice(self):
+        return hex(self.base_fee + self.priority_fee)
+
+    def rpc_eth_maxPriorityFeePerGas(self):
+        return hex(self.priority_fee)
+
+    def rpc_eth_estimateGas(self, transaction, tag='latest'):
+        return hex(self.gas_used)
+
+    def rpc_eth_getBalance(self, address, tag='latest'):
+        return hex(10 ** 24)
+
+    def rpc_eth_getCode(self, address, tag='latest'):
+        return '0x6080604052'
+
+    def rpc_eth_call(self, transaction, tag='latest'):
+        data = transaction.get('data') or transaction.get('input') or '0x'
+        key = ((transaction.get('to') or '').lower(), data[:10])
+        return self.call_results.get(key, '0x' + '00' * 32)
+
+
+class _RPCHandler(BaseHTTPRequestHandler):
+    # Keep-alive, the oracle's pooled sessions reuse their connections
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self._cpu_mark = time.thread_time()
+
+    def do_POST(self):
+        chain = self.server.chain
+        delay = chain.latency + (random.uniform(0, chain.jitter) if chain.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            status, reply = chain.handle_payload(payload)
+        except ValueError:
+            status, reply = 400, {'error': 'invalid JSON'}
+        body = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Everything this connection's thread did since the last request, parsing included
+        now = time.thread_time()
+        chain.add_cpu_time(now - self._cpu_mark)
+        self._cpu_mark = now
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8545)
+    parser.add_argument('--chain-id', type=int, default=31337)
+    parser.add_argument('--block-time', type=float, default=0, help='seconds between blocks, 0 mines one per transaction')
+    parser.add_argument('--receipt-delay', type=float, default=0, help='seconds before a sent transaction has a receipt')
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0, help='random extra latency, up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests failed on purpose')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected errors, 0 for JSON-RPC errors')
+    args = parser.parse_args()
+
+    chain = FakeChain(args.chain_id, args.block_time, args.receipt_delay, args.latency, args.jitter, args.error_rate, args.error_status)
+    chain.start(args.host, args.port)
+    print(f"[FakeChain] Serving chain id {args.chain_id} on {chain.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        chain.stop()
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
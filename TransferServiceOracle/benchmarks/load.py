@@ -0,0 +1,552 @@
+"""
+Concurrent load benchmark for the TransferServiceOracle against local chains.
+
+Starts two local nodes (Anvil or Hardhat) standing in for Ethereum and BSC,
+deploys the bridge contracts from the Hardhat artifacts, starts service.py
+against them and drives transfers in both directions from many user
+accounts at a fixed arrival rate. A user account runs one transfer at a
+time, so --users bounds the concurrency; arrivals that find every user busy
+wait for one, and that wait is reported as the queueing stage.
+
+Each transfer is timed on the client side (approve, fee payment, receipt
+collection, lock/burn mined) and on the oracle side from the stage history
+served by /status/{transferRequestId}. RPC calls and relay gas are the
+difference of the oracle's /metrics between the start and the end of the
+measured run. The report is JSON, so runs can be compared with each other.
+
+    npx hardhat compile
+    python benchmarks/load.py --transfers 200 --rate 5 --users 20 > load.json
+
+Before the measured run every user does one Ethereum to BSC transfer through
+the oracle, which locks the tokens the BSC to Ethereum transfers release.
+The repository has no plain ERC20 test token, so a second BEP20Mintable
+with no mint fee is deployed on the Ethereum node as the token to transfer.
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import random
+import re
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(SERVICE_DIR)
+sys.path.insert(0, SERVICE_DIR)
+
+import requests
+from web3 import Web3
+from utils.chainclient import ARTIFACTS_DIR, NODE_URL_ENV, get_web3
+from utils.gasoracle import get_gas_oracle
+from utils.nonces import get_nonce_manager, send_transaction
+from utils.receipttracker import get_receipt_tracker
+
+# First two accounts of the default Anvil/Hardhat mnemonic, funded on every local node
+DEV_KEYS = (
+    '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80',
+    '0x59c6995e998f97a5a0044966f0945389dc9e86dae88c7a8412f4603b6b78690d',
+)
+
+# Stages the relayer records for each direction, in order, and the ones that end a transfer
+STAGES = {
+    'eth_to_bsc': ['locked', 'minted'],
+    'bsc_to_eth': ['transfer_initiated', 'burn_initiated', 'released', 'completed'],
+}
+TERMINAL_STAGES = {'minted', 'completed', 'returned'}
+
+# Client-side steps of a transfer, in the order they run
+CLIENT_STAGES = ['queueing', 'approve', 'fee_payment', 'receipt', 'submit']
+
+METRIC_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+METRIC_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def log(message):
+    # The report goes to stdout, progress to stderr
+    print(f"[Load] {message}", file=sys.stderr, flush=True)
+
+
+def wait_until(check, timeout, description):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if check():
+                return
+        except Exception:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{description} not ready after {timeout:.0f} seconds")
+        time.sleep(0.25)
+
+
+def start_node(kind, port, chain_id, log_file):
+    if kind == 'anvil':
+        command = ['anvil', '--port', str(port), '--chain-id', str(chain_id)]
+    else:
+        # Hardhat takes the chain id from hardhat.config.ts, both nodes share it
+        command = ['npx', 'hardhat', 'node', '--port', str(port)]
+    return subprocess.Popen(command, cwd=REPO_DIR, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def load_artifact(contract_name):
+    with open(os.path.join(ARTIFACTS_DIR, f'{contract_name}.sol', f'{contract_name}.json'), 'r') as file:
+        return json.load(file)
+
+
+class Chain:
+    """
+    One local node as seen by the benchmark: sends signed transactions with
+    nonces allocated by utils.nonces, like the relayer's, so several can be in
+    flight per account, and waits for their receipts through the shared
+    batched receipt tracker.
+    """
+
+    def __init__(self, name, url, receipt_timeout):
+        self.name = name
+        self.url = url
+        self.receipt_timeout = receipt_timeout
+        self.web3 = get_web3(name)
+        self.chain_id = self.web3.eth.chain_id
+        self.tracker = get_receipt_tracker(self.web3, url, name)
+        self.gas_oracle = get_gas_oracle(self.web3, name)
+
+    def send(self, account, call=None, value=0, to=None):
+        params = {'from': account.address, 'value': value, 'chainId': self.chain_id, **self.gas_oracle.tx_params()}
+        if call is not None:
+            return send_transaction(self.web3, self.name, call, params, account.key)
+        manager = get_nonce_manager(self.name, account.address)
+        tx = {'to': to, 'gas': 21000, 'nonce': manager.allocate(self.web3), **params}
+        signed_tx = self.web3.eth.account.sign_transaction(tx, private_key=account.key)
+        try:
+            return self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        except Exception:
+            manager.resync()
+            raise
+
+    def wait(self, tx_hash):
+        receipt = self.tracker.wait(tx_hash, self.receipt_timeout)
+        if receipt['status'] != 1:
+            raise RuntimeError(f"Transaction {Web3.to_hex(tx_hash)} reverted on {self.name}")
+        return receipt
+
+    def transact(self, account, call=None, value=0, to=None):
+        return self.wait(self.send(account, call, value, to))
+
+    def deploy(self, account, contract_name, *args):
+        artifact = load_artifact(contract_name)
+        factory = self.web3.eth.contract(abi=artifact['abi'], bytecode=artifact['bytecode'])
+        receipt = self.transact(account, factory.constructor(*args))
+        log(f"{contract_name} deployed on {self.name} at {receipt['contractAddress']}")
+        return self.web3.eth.contract(address=receipt['contractAddress'], abi=artifact['abi'])
+
+
+def deploy_bridge(eth, bsc, eth_owner, bsc_owner, fee):
+    """Deploys and wires the contracts the way deploy.js does. Returns the contracts by name."""
+    token = eth.deploy(eth_owner, 'BEP20Mintable', 'Load Test Token', 'LTT', 0, eth_owner.address, 0)
+    erc20_lock = eth.deploy(eth_owner, 'ERC20Lock', [token.address], fee, bsc_owner.address)
+    bep20 = bsc.deploy(bsc_owner, 'BEP20Mintable', 'Token Name', 'TOKEN', fee, eth_owner.address, fee)
+    escrow = bsc.deploy(bsc_owner, 'BurnTokensEscrow')
+    bsc.transact(bsc_owner, bep20.functions.setBurnEscrowTokenContractAddress(escrow.address))
+    bsc.transact(bsc_owner, escrow.functions.setBEP20TokenContractAddress(bep20.address))
+    coordinator = bsc.deploy(bsc_owner, 'BurnAndReleaseCoordinator', escrow.address)
+    # The coordinator moves tokens in and out of the escrow, which only its owner may do
+    bsc.transact(bsc_owner, escrow.functions.transferOwnership(coordinator.address))
+    # releaseTokens checks the fees collected from its caller, the Ethereum owner, so the owner pays one release fee up front
+    eth.transact(eth_owner, erc20_lock.functions.payReleaseFee(0), value=erc20_lock.functions.releaseFee().call())
+    return {
+        'token': token,
+        'ERC20Lock': erc20_lock,
+        'BEP20Mintable': bep20,
+        'BurnTokensEscrow': escrow,
+        'BurnAndReleaseCoordinator': coordinator,
+    }
+
+
+def fund_users(eth, bsc, eth_owner, bsc_owner, contracts, users, ether, tokens):
+    """Native currency on both chains and test tokens on Ethereum for every user, all sent before any is waited for."""
+    tx_hashes = []
+    for user in users:
+        tx_hashes.append((eth, eth.send(eth_owner, to=user.address, value=ether)))
+        tx_hashes.append((bsc, bsc.send(bsc_owner, to=user.address, value=ether)))
+        tx_hashes.append((eth, eth.send(eth_owner, contracts['token'].functions.mint(user.address, tokens, user.address, uuid.uuid4().bytes))))
+    for chain, tx_hash in tx_hashes:
+        chain.wait(tx_hash)
+
+
+def start_oracle(env, workdir, log_file):
+    # stdin stays open, service.py waits on input() in the foreground
+    return subprocess.Popen(
+        [sys.executable, os.path.join(SERVICE_DIR, 'service.py')],
+        cwd=workdir, env=env, stdin=subprocess.PIPE, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+
+
+def stop_process(process, timeout=15):
+    if process is None or process.poll() is not None:
+        return
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def scrape_metrics(url):
+    """Samples of a /metrics page as {(name, ((label, value), ...)): value}."""
+    samples = {}
+    for line in requests.get(url, timeout=10).text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        samples[(name, tuple(sorted(METRIC_LABEL.findall(labels or ''))))] = float(value)
+    return samples
+
+
+def metric_delta(before, after, name, by=()):
+    """Increase of a counter between two scrapes, summed over every series or grouped by the given labels."""
+    totals = {}
+    for (sample_name, labels), value in after.items():
+        if sample_name != name:
+            continue
+        increase = value - before.get((sample_name, labels), 0)
+        label_map = dict(labels)
+        key = '/'.join(label_map.get(label, '') for label in by) or 'total'
+        totals[key] = totals.get(key, 0) + increase
+    return totals
+
+
+def percentiles(values):
+    if not values:
+        return {'count': 0}
+    values = sorted(values)
+
+    def rank(p):
+        # Nearest-rank percentile
+        return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+    return {
+        'count': len(values),
+        'mean': statistics.fmean(values),
+        'p50': rank(50),
+        'p95': rank(95),
+        'p99': rank(99),
+        'max': values[-1],
+    }
+
+
+class User:
+    def __init__(self, account):
+        self.account = account
+        self.address = account.address
+        self.key = account.key
+        self._last_timestamp = 0
+
+    def fee_timestamp(self):
+        # The receipt id is "<payer>-<userTimestamp>", it has to differ between fee payments of the same user
+        self._last_timestamp = max(int(time.time()), self._last_timestamp + 1)
+        return self._last_timestamp
+
+
+class LoadRun:
+    def __init__(self, eth, bsc, contracts, api_url, amount, receipt_wait, timeout):
+        self.eth = eth
+        self.bsc = bsc
+        self.contracts = contracts
+        self.api_url = api_url
+        self.amount = amount
+        self.receipt_wait = receipt_wait
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def collect_receipt(self, receipt_id):
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            response = self.session.post(f"{self.api_url}/collect/", json={'receipt_id': receipt_id, 'wait': self.receipt_wait}, timeout=self.receipt_wait + 10)
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code != 404:
+                response.raise_for_status()
+        raise TimeoutError(f"Receipt {receipt_id} not signed in time")
+
+    def run_transfer(self, user, direction, arrived_at):
+        """Client side of one transfer, from approval to the lock or burn being mined."""
+        result = {'direction': direction, 'user': user.address, 'stages': {}, 'gas': 0}
+        stages = result['stages']
+        token = self.contracts['token']
+        erc20_lock = self.contracts['ERC20Lock']
+        bep20 = self.contracts['BEP20Mintable']
+        transfer_request_id = uuid.uuid4().bytes
+        result['transferRequestId'] = transfer_request_id.hex()
+        started = time.time()
+        stages['queueing'] = started - arrived_at
+        try:
+            if direction == 'eth_to_bsc':
+                source, fee_chain = self.eth, self.bsc
+                approve = token.functions.approve(erc20_lock.address, self.amount)
+                fee_call, fee = bep20.functions.payMintFee, bep20.functions.mintFee().call()
+            else:
+                source, fee_chain = self.bsc, self.eth
+                approve = bep20.functions.approve(self.contracts['BurnTokensEscrow'].address, self.amount)
+                fee_call, fee = erc20_lock.functions.payReleaseFee, erc20_lock.functions.releaseFee().call()
+
+            step = time.time()
+            result['gas'] += source.transact(user, approve)['gasUsed']
+            stages['approve'] = time.time() - step
+
+            step = time.time()
+            timestamp = user.fee_timestamp()
+            result['gas'] += fee_chain.transact(user, fee_call(timestamp), value=fee)['gasUsed']
+            stages['fee_payment'] = time.time() - step
+
+            step = time.time()
+            receipt = self.collect_receipt(f"{user.address}-{timestamp}")
+            stages['receipt'] = time.time() - step
+
+            step = time.time()
+            proof = (receipt['feeAmount'], receipt['nonce'], receipt['contractAddress'], receipt['receipt'], transfer_request_id)
+            if direction == 'eth_to_bsc':
+                call, value = erc20_lock.functions.lockTokens(token.address, self.amount, user.address, *proof), 0
+            else:
+                call, value = bep20.functions.burn(user.address, self.amount, user.address, token.address, *proof), 3 * bep20.functions.coordinatorFee().call()
+            tx_receipt = source.transact(user, call, value=value)
+            result['gas'] += tx_receipt['gasUsed']
+            result['submitted_at'] = time.time()
+            stages['submit'] = result['submitted_at'] - step
+        except Exception as e:
+            result['error'] = str(e)
+        result['arrived_at'] = arrived_at
+        return result
+
+    def drive(self, users, directions, rate, arrivals):
+        """Starts one transfer per entry of directions at the given arrival rate, returns their client-side results."""
+        idle = queue.Queue()
+        for user in users:
+            idle.put(user)
+        results = []
+
+        def run(user, direction, arrived_at):
+            try:
+                results.append(self.run_transfer(user, direction, arrived_at))
+            finally:
+                idle.put(user)
+
+        interval = 1 / rate if rate > 0 else 0
+        next_arrival = time.time()
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            for direction in directions:
+                delay = next_arrival - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                arrived_at = time.time()
+                executor.submit(run, idle.get(), direction, arrived_at)
+                next_arrival += random.expovariate(rate) if arrivals == 'poisson' and rate > 0 else interval
+        return results
+
+    def wait_for_completion(self, results, poll_interval=0.5):
+        """Polls /status of every submitted transfer until it reaches a terminal stage or the timeout expires."""
+        outstanding = {result['transferRequestId']: result for result in results if 'submitted_at' in result}
+        deadline = time.monotonic() + self.timeout
+        while outstanding and time.monotonic() < deadline:
+            for transfer_request_id, result in list(outstanding.items()):
+                response = self.session.get(f"{self.api_url}/status/{transfer_request_id}", timeout=10)
+                if response.status_code != 200:
+                    continue
+                status = response.json()
+                result['transitions'] = {transition['stage']: transition['timestamp'] for transition in status['transitions']}
+                if status['stage'] in TERMINAL_STAGES:
+                    result['stage'] = status['stage']
+                    result['completed_at'] = result['transitions'][status['stage']]
+                    del outstanding[transfer_request_id]
+            if outstanding:
+                time.sleep(poll_interval)
+        for result in outstanding.values():
+            result.setdefault('error', 'not completed before the timeout')
+
+
+def stage_report(results, direction):
+    transfers = [result for result in results if result['direction'] == direction]
+    completed = [result for result in transfers if 'completed_at' in result]
+    stages = {stage: percentiles([result['stages'][stage] for result in transfers if stage in result['stages']]) for stage in CLIENT_STAGES}
+    # Oracle side: from the lock or burn being mined to the first stage, then between consecutive stages
+    previous = 'submitted'
+    for stage in STAGES[direction]:
+        spans = []
+        for result in completed:
+            transitions = result.get('transitions', {})
+            started = result['submitted_at'] if previous == 'submitted' else transitions.get(previous)
+            if started is not None and stage in transitions:
+                spans.append(transitions[stage] - started)
+        stages[f'{previous}->{stage}'] = percentiles(spans)
+        previous = stage
+    return {
+        'transfers': len(transfers),
+        'completed': len(completed),
+        'failed': len(transfers) - len(completed),
+        'end_to_end': percentiles([result['completed_at'] - result['arrived_at'] for result in completed]),
+        'stages': stages,
+        'user_gas': percentiles([result['gas'] for result in transfers if 'submitted_at' in result]),
+    }
+
+
+def build_report(args, results, before, after):
+    completed = [result for result in results if 'completed_at' in result]
+    started_at = min(result['arrived_at'] for result in results)
+    finished_at = max([result['completed_at'] for result in completed], default=started_at)
+    duration = finished_at - started_at
+    # Calls sent in a JSON-RPC batch are counted one by one, and the batch round trip once more as method "batch"
+    rpc_by_method = metric_delta(before, after, 'oracle_rpc_requests_total', by=('chain', 'method'))
+    rpc_batches = sum(value for key, value in rpc_by_method.items() if key.endswith('/batch'))
+    rpc_calls = sum(rpc_by_method.values()) - rpc_batches
+    relay_gas = metric_delta(before, after, 'oracle_relay_gas_used_total').get('total', 0)
+
+    def per_transfer(total):
+        return total / len(completed) if completed else None
+
+    return {
+        'config': {
+            'node': args.node,
+            'transfers': args.transfers,
+            'users': args.users,
+            'rate': args.rate,
+            'arrivals': args.arrivals,
+            'eth_to_bsc_share': args.eth_to_bsc_share,
+            'amount': args.amount,
+        },
+        'duration': duration,
+        'completed': len(completed),
+        'failed': len(results) - len(completed),
+        'throughput': len(completed) / duration if duration > 0 else None,
+        'directions': {direction: stage_report(results, direction) for direction in STAGES},
+        'rpc': {
+            'calls': rpc_calls,
+            'calls_per_transfer': per_transfer(rpc_calls),
+            'batches': rpc_batches,
+            'batches_per_transfer': per_transfer(rpc_batches),
+            'errors': sum(value for key, value in metric_delta(before, after, 'oracle_rpc_requests_total', by=('outcome',)).items() if key != 'ok'),
+            'by_chain_and_method': rpc_by_method,
+        },
+        'gas': {
+            'relay_per_transfer': per_transfer(relay_gas),
+            'relay_by_transaction': metric_delta(before, after, 'oracle_relay_gas_used_total', by=('chain', 'transaction')),
+            'user_per_transfer': statistics.fmean([result['gas'] for result in completed]) if completed else None,
+        },
+        'errors': sorted({result['error'] for result in results if 'error' in result}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transfers', type=int, default=100, help='transfers in the measured run')
+    parser.add_argument('--users', type=int, default=10, help='user accounts, at most one transfer in flight per user')
+    parser.add_argument('--rate', type=float, default=2, help='transfer arrivals per second, 0 starts them as fast as users are free')
+    parser.add_argument('--arrivals', choices=['uniform', 'poisson'], default='poisson', help='spacing of the arrivals')
+    parser.add_argument('--eth-to-bsc-share', type=float, default=0.5, help='fraction of the transfers going from Ethereum to BSC')
+    parser.add_argument('--amount', type=int, default=10 ** 18, help='tokens moved per transfer, in base units')
+    parser.add_argument('--fee', type=float, default=0.01, help='mint, release and coordinator fee in ether')
+    parser.add_argument('--fund', type=float, default=10, help='ether sent to every user on each chain')
+    parser.add_argument('--node', choices=['anvil', 'hardhat', 'external'], default='anvil', help='local node to start, or external to use --eth-url and --bsc-url')
+    parser.add_argument('--eth-url', default='http://127.0.0.1:8545')
+    parser.add_argument('--bsc-url', default='http://127.0.0.1:8546')
+    parser.add_argument('--api-port', type=int, default=8000, help='port of the oracle receipt API')
+    parser.add_argument('--metrics-port', type=int, default=9108, help='port of the oracle /metrics endpoint')
+    parser.add_argument('--receipt-wait', type=float, default=30, help='seconds a receipt long-poll is held open')
+    parser.add_argument('--timeout', type=float, default=600, help='seconds a transfer may take before it counts as failed')
+    parser.add_argument('--seed', type=int, default=None, help='random seed of the arrivals and directions')
+    parser.add_argument('--workdir', default=None, help='directory for node and oracle logs and state, a temporary one by default')
+    parser.add_argument('--keep-workdir', action='store_true', help='keep the temporary directory for inspection')
+    args = parser.parse_args()
+
+    if not os.path.isdir(ARTIFACTS_DIR):
+        parser.error(f"no contract artifacts in {ARTIFACTS_DIR}, run `npx hardhat compile` first")
+    random.seed(args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='oracle-load-')
+    os.makedirs(workdir, exist_ok=True)
+    processes = []
+    try:
+        if args.node != 'external':
+            for chain_name, url, chain_id in (('ethereum', args.eth_url, 31337), ('bsc', args.bsc_url, 31338)):
+                port = int(url.rsplit(':', 1)[1].split('/')[0])
+                processes.append(start_node(args.node, port, chain_id, open(os.path.join(workdir, f'{chain_name}-node.log'), 'w')))
+
+        # The benchmark's own clients go through utils.chainclient like the services do
+        os.environ[NODE_URL_ENV['ethereum']] = args.eth_url
+        os.environ[NODE_URL_ENV['bsc']] = args.bsc_url
+        for url in (args.eth_url, args.bsc_url):
+            wait_until(lambda: requests.post(url, json={'jsonrpc': '2.0', 'id': 1, 'method': 'eth_chainId', 'params': []}, timeout=2).ok, 60, url)
+        eth = Chain('ethereum', args.eth_url, args.timeout)
+        bsc = Chain('bsc', args.bsc_url, args.timeout)
+
+        eth_owner = eth.web3.eth.account.from_key(os.getenv('ETH_CONTRACT_OWNER_PRIVATE_KEY', DEV_KEYS[0]))
+        bsc_owner = bsc.web3.eth.account.from_key(os.getenv('BSC_CONTRACT_OWNER_PRIVATE_KEY', DEV_KEYS[1]))
+        fee = Web3.to_wei(args.fee, 'ether')
+        contracts = deploy_bridge(eth, bsc, eth_owner, bsc_owner, fee)
+
+        users = [User(eth.web3.eth.account.create()) for _ in range(args.users)]
+        directions = ['eth_to_bsc' if random.random() < args.eth_to_bsc_share else 'bsc_to_eth' for _ in range(args.transfers)]
+        # Enough tokens for every measured transfer plus the seeding one, whichever user they land on
+        seed_amount = args.amount * max(1, directions.count('bsc_to_eth'))
+        fund_users(eth, bsc, eth_owner, bsc_owner, contracts, users, Web3.to_wei(args.fund, 'ether'), args.amount * args.transfers + seed_amount)
+        log(f"Funded {len(users)} users")
+
+        env = dict(
+            os.environ,
+            ETH_CONTRACT_OWNER_ADDRESS=eth_owner.address,
+            ETH_CONTRACT_OWNER_PRIVATE_KEY=Web3.to_hex(eth_owner.key),
+            BSC_CONTRACT_OWNER_ADDRESS=bsc_owner.address,
+            BSC_CONTRACT_OWNER_PRIVATE_KEY=Web3.to_hex(bsc_owner.key),
+            ERC20_LOCK_ADDRESS=contracts['ERC20Lock'].address,
+            BEP20_MINTABLE_ADDRESS=contracts['BEP20Mintable'].address,
+            BURN_ESCROW_ADDRESS=contracts['BurnTokensEscrow'].address,
+            BURN_AND_RELEASE_COORDINATOR_ADDRESS=contracts['BurnAndReleaseCoordinator'].address,
+            RECEIPT_API_PORT=str(args.api_port),
+            METRICS_PORT=str(args.metrics_port),
+            SERVICE_MODE='threads',
+        )
+        processes.append(start_oracle(env, workdir, open(os.path.join(workdir, 'oracle.log'), 'w')))
+        api_url = f'http://127.0.0.1:{args.api_port}'
+        metrics_url = f'http://127.0.0.1:{args.metrics_port}/metrics'
+        wait_until(lambda: requests.get(f'{api_url}/status/00', timeout=2).status_code in (400, 404), 120, 'receipt API')
+        wait_until(lambda: requests.get(metrics_url, timeout=2).ok, 60, 'metrics endpoint')
+
+        run = LoadRun(eth, bsc, contracts, api_url, args.amount, args.receipt_wait, args.timeout)
+        if 'bsc_to_eth' in directions:
+            # Locks the tokens on Ethereum and mints the BSC tokens the measured BSC to Ethereum transfers spend
+            log("Seeding every user with one Ethereum to BSC transfer")
+            run.amount = seed_amount
+            seeded = run.drive(users, ['eth_to_bsc'] * len(users), 0, 'uniform')
+            run.wait_for_completion(seeded)
+            failed = [result for result in seeded if 'completed_at' not in result]
+            if failed:
+                raise RuntimeError(f"{len(failed)} seeding transfers failed: {failed[0].get('error')}")
+            run.amount = args.amount
+
+        log(f"Running {args.transfers} transfers at {args.rate} per second from {len(users)} users")
+        before = scrape_metrics(metrics_url)
+        results = run.drive(users, directions, args.rate, args.arrivals)
+        run.wait_for_completion(results)
+        after = scrape_metrics(metrics_url)
+
+        json.dump(build_report(args, results, before, after), sys.stdout, indent=2)
+        print()
+    finally:
+        for process in reversed(processes):
+            stop_process(process)
+        if args.workdir is None and not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            log(f"Logs and state kept in {workdir}")
+
+
+if __name__ == '__main__':
+    main()
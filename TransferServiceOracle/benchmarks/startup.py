@@ -0,0 +1,117 @@
+"""
+Import-time and startup-time benchmark for the TransferServiceOracle services.
+
+Every sample runs in a fresh interpreter, so module caches of earlier samples
+do not hide import cost. Import samples time `import <module>`; startup
+samples time building and starting every service of service.py, then stop
+them again. Children run in a scratch directory so the journals, checkpoints
+and databases they create do not touch the working tree.
+
+    python benchmarks/startup.py --repeat 5 > startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'utils.chainclient',
+    'relayer',
+    'asyncRelayer',
+    'feeEstimator',
+    'receiptApi',
+    'receiptGenerator',
+    'service',
+]
+
+IMPORT_SAMPLE = '''
+import sys, time
+sys.path.insert(0, {service_dir!r})
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+'''
+
+STARTUP_SAMPLE = '''
+import sys, time
+sys.path.insert(0, {service_dir!r})
+started = time.perf_counter()
+import service
+imported = time.perf_counter()
+service.services[:] = service.build_services()
+built = time.perf_counter()
+for running in service.services:
+    running.start()
+print(imported - started, built - imported, time.perf_counter() - built)
+for running in service.services:
+    running.stop()
+for running in service.services:
+    running.join(1)
+'''
+
+
+def run_sample(code, workdir, timeout):
+    env = dict(os.environ)
+    # No node is needed to start the services, and one unreachable right away keeps the samples short
+    env.setdefault('ETHEREUM_NODE_URL', 'http://127.0.0.1:9')
+    env.setdefault('BSC_NODE_URL', 'http://127.0.0.1:9')
+    env.setdefault('RECEIPT_API_PORT', '0')
+    result = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, capture_output=True, text=True, timeout=timeout)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 and not lines:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f'exit code {result.returncode}')
+    # Services print while they start, the timings are on the last line
+    return [float(value) for value in lines[-1].split()]
+
+
+def summarize(samples):
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'samples': samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per measurement')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds before a sample is abandoned')
+    parser.add_argument('--modules', nargs='*', default=MODULES, help='modules whose import time is measured')
+    parser.add_argument('--skip-startup', action='store_true', help='only measure import times')
+    args = parser.parse_args()
+
+    report = {'python': sys.version.split()[0], 'repeat': args.repeat, 'imports': {}, 'startup': None}
+    with tempfile.TemporaryDirectory() as workdir:
+        for module in args.modules:
+            try:
+                samples = [run_sample(IMPORT_SAMPLE.format(service_dir=SERVICE_DIR, module=module), workdir, args.timeout)[0]
+                           for _ in range(args.repeat)]
+                report['imports'][module] = summarize(samples)
+            except Exception as e:
+                report['imports'][module] = {'error': str(e)}
+
+        if not args.skip_startup:
+            try:
+                samples = [run_sample(STARTUP_SAMPLE.format(service_dir=SERVICE_DIR), workdir, args.timeout)
+                           for _ in range(args.repeat)]
+                report['startup'] = {
+                    'import': summarize([sample[0] for sample in samples]),
+                    'build': summarize([sample[1] for sample in samples]),
+                    'start': summarize([sample[2] for sample in samples]),
+                    'total': summarize([sum(sample) for sample in samples]),
+                }
+            except Exception as e:
+                report['startup'] = {'error': str(e)}
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
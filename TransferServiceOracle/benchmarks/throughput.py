@@ -0,0 +1,270 @@
+"""
+Relayer microbenchmarks against fake chains: events per second and CPU per event.
+
+Two FakeChain servers stand in for Ethereum and BSC. A backlog of scripted
+contract events is put on them before the relayer starts from block 0, so
+every run measures how fast the oracle works through the same events,
+without node latency unless it is injected. Scenarios:
+
+    decode   log polling and ABI decoding only (LogPoller.poll, no handlers)
+    relayer  listen_and_relay: polling, decoding, the per-transfer claim,
+             signing and sending relay transactions, journaling
+    async    the same handlers driven by AsyncRelayer
+
+A run ends once every log the fake chains served has been handled. CPU per
+event is the process CPU time minus what the fake chains used themselves.
+Every sample runs in a fresh interpreter in a scratch directory, like
+benchmarks/startup.py.
+
+    npx hardhat compile
+    python benchmarks/throughput.py --events 2000 --repeat 3 > throughput.json
+    python benchmarks/throughput.py --scenarios relayer --latency 0.02 --error-rate 0.01 --reorg-interval 1
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+from startup import summarize
+
+SCENARIOS = ['decode', 'relayer', 'async']
+
+# Every event the relayer watches: chain, relayer module attribute of the emitting contract, event
+RELAYER_EVENTS = [
+    ('ethereum', 'erc20_lock_contract', 'TokensLocked'),
+    ('ethereum', 'erc20_lock_contract', 'TokensReleased'),
+    ('ethereum', 'erc20_lock_contract', 'TokenReleaseFailed'),
+    ('bsc', 'bep20_contract', 'TokensMinted'),
+    ('bsc', 'bep20_contract', 'TokensTransferInitiated'),
+    ('bsc', 'burnAndReleaseContract', 'BurnInitiated'),
+    ('bsc', 'burnAndReleaseContract', 'TransferCompleted'),
+    ('bsc', 'burnAndReleaseContract', 'ReturnedTokens'),
+]
+
+RESULT_PREFIX = 'RESULT '
+
+
+def random_address():
+    from eth_utils import to_checksum_address
+    return to_checksum_address(os.urandom(20))
+
+
+def fake_value(abi_type):
+    if abi_type == 'address':
+        return random_address()
+    if abi_type.startswith('uint'):
+        return random.randrange(1, 10 ** 21)
+    if abi_type == 'bytes16':
+        return uuid.uuid4().bytes
+    if abi_type == 'bytes32':
+        return os.urandom(32)
+    raise ValueError(f"No fake value for ABI type {abi_type}")
+
+
+def script_events(relayer, chains, events, events_per_block, mix):
+    """Puts the backlog on the fake chains, events_per_block logs per block on each chain."""
+    from utils.logpoller import find_event_abi
+    kinds = RELAYER_EVENTS if mix == 'all' else RELAYER_EVENTS[:1]
+    queued = {chain_name: 0 for chain_name in chains}
+    for index in range(events):
+        chain_name, contract_name, event_name = kinds[index % len(kinds)]
+        contract = getattr(relayer, contract_name)
+        args = {entry['name']: fake_value(entry['type']) for entry in find_event_abi(contract, event_name)['inputs']}
+        chains[chain_name].emit(contract, event_name, **args)
+        queued[chain_name] += 1
+        if queued[chain_name] == events_per_block:
+            chains[chain_name].mine()
+            queued[chain_name] = 0
+    for chain in chains.values():
+        chain.mine()
+
+
+def run_scenario(config):
+    """Child side: one sample of one scenario, printed as a RESULT line."""
+    from eth_account import Account
+    from fakechain import FakeChain
+    from utils.checkpoint import BlockCheckpoint
+
+    fake_options = dict(
+        receipt_delay=config['receipt_delay'], latency=config['latency'], jitter=config['jitter'],
+        error_rate=config['error_rate'], error_status=config['error_status'],
+    )
+    chains = {
+        'ethereum': FakeChain(chain_id=31337, **fake_options).start(),
+        'bsc': FakeChain(chain_id=31338, **fake_options).start(),
+    }
+    owner = Account.create()
+    checkpoint_file = os.path.abspath('relayer_checkpoint.json')
+    os.environ.update(
+        ETHEREUM_NODE_URL=chains['ethereum'].url,
+        BSC_NODE_URL=chains['bsc'].url,
+        ETH_CONTRACT_OWNER_ADDRESS=owner.address,
+        ETH_CONTRACT_OWNER_PRIVATE_KEY=owner.key.hex(),
+        BSC_CONTRACT_OWNER_ADDRESS=owner.address,
+        BSC_CONTRACT_OWNER_PRIVATE_KEY=owner.key.hex(),
+        ERC20_LOCK_ADDRESS=random_address(),
+        BEP20_MINTABLE_ADDRESS=random_address(),
+        BURN_AND_RELEASE_COORDINATOR_ADDRESS=random_address(),
+        RELAYER_CHECKPOINT_FILE=checkpoint_file,
+        RELAYER_POLL_INTERVAL='0.1',
+        LOGS_MIN_POLL_INTERVAL='0.05',
+    )
+    # Start from block 0, so the whole backlog is fetched as a catch-up
+    checkpoint = BlockCheckpoint(checkpoint_file)
+    for chain_name in chains:
+        checkpoint.save(chain_name, 0)
+
+    import relayer
+    from utils.lifecycle import stop_flag
+    script_events(relayer, chains, config['events'], config['events_per_block'], config['mix'])
+
+    logger = logging.getLogger('Relayer')
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.FileHandler('transfers.log'))
+
+    event_names = sorted({event_name for _, _, event_name in RELAYER_EVENTS})
+    outcomes = {
+        (event_name, outcome): relayer.events_handled.labels(event_name, outcome)
+        for event_name in event_names for outcome in ('ok', 'error')
+    }
+
+    def handled(outcome=None):
+        return sum(counter.get() for (_, counter_outcome), counter in outcomes.items() if outcome in (None, counter_outcome))
+
+    def caught_up():
+        return all(chain.served_to >= chain.head for chain in chains.values())
+
+    finished = threading.Event()
+
+    def inject_reorgs():
+        while not finished.wait(config['reorg_interval']):
+            random.choice(list(chains.values())).reorg(config['reorg_depth'])
+
+    if config['reorg_interval'] > 0:
+        threading.Thread(target=inject_reorgs, daemon=True).start()
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    fake_cpu_started = sum(chain.cpu_time for chain in chains.values())
+    deadline = time.monotonic() + config['timeout']
+
+    if config['scenario'] == 'decode':
+        processed = 0
+        pollers = relayer.create_log_pollers()
+        while time.monotonic() < deadline:
+            for poller in pollers:
+                try:
+                    processed += len(poller.poll())
+                except Exception as e:
+                    print(f"[Throughput] Error fetching logs on {poller.chain_name}: {e}")
+                    continue
+                poller.commit()
+            if caught_up() and all(poller.caught_up for poller in pollers):
+                break
+    else:
+        if config['scenario'] == 'async':
+            from asyncRelayer import run_async_relayer
+            target = run_async_relayer
+        else:
+            target = relayer.listen_and_relay
+        thread = threading.Thread(target=target, args=(logger,), name='Relayer', daemon=True)
+        thread.start()
+        # Every log served has been handled, and nothing newer is left to serve
+        while time.monotonic() < deadline:
+            if caught_up() and handled() >= sum(chain.logs_served for chain in chains.values()):
+                break
+            time.sleep(0.01)
+        processed = handled()
+
+    seconds = time.perf_counter() - started
+    fake_cpu = sum(chain.cpu_time for chain in chains.values()) - fake_cpu_started
+    cpu_seconds = time.process_time() - cpu_started - fake_cpu
+    finished.set()
+    stop_flag.set()
+
+    result = {
+        'scenario': config['scenario'],
+        'events': config['events'],
+        'processed': processed,
+        'handler_errors': handled('error') if config['scenario'] != 'decode' else 0,
+        'completed': processed >= config['events'],
+        'seconds': seconds,
+        'events_per_second': processed / seconds if seconds > 0 else None,
+        'cpu_seconds': cpu_seconds,
+        'cpu_per_event_us': cpu_seconds / processed * 1e6 if processed else None,
+        'fake_chain_cpu_seconds': fake_cpu,
+        'relay_transactions': sum(chain.raw_transactions for chain in chains.values()),
+        'errors_injected': sum(chain.errors_injected for chain in chains.values()),
+        'rpc': {
+            chain_name: {'requests': dict(chain.requests), 'batches': chain.batches}
+            for chain_name, chain in chains.items()
+        },
+    }
+    relayer.close_transfer_journal()
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def run_sample(config, timeout):
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', json.dumps(config)],
+            cwd=workdir, capture_output=True, text=True, timeout=timeout,
+        )
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    stderr = result.stderr.strip().splitlines()
+    raise RuntimeError(stderr[-1] if stderr else f'exit code {result.returncode}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='*', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--events', type=int, default=2000, help='scripted events per sample')
+    parser.add_argument('--events-per-block', type=int, default=10)
+    parser.add_argument('--mix', choices=['locked', 'all'], default='all', help='only TokensLocked, or every event the relayer watches in turn')
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters per scenario')
+    parser.add_argument('--latency', type=float, default=0, help='seconds the fake chains add to every request')
+    parser.add_argument('--jitter', type=float, default=0, help='random extra latency, up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests the fake chains fail')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected errors, 0 for JSON-RPC errors')
+    parser.add_argument('--receipt-delay', type=float, default=0, help='seconds before a relay transaction has a receipt')
+    parser.add_argument('--reorg-interval', type=float, default=0, help='seconds between injected reorgs, 0 for none')
+    parser.add_argument('--reorg-depth', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=300, help='seconds before a sample is abandoned')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_scenario(json.loads(args.child))
+        return
+
+    config = {key: value for key, value in vars(args).items() if key not in ('scenarios', 'repeat', 'child')}
+    report = {'python': sys.version.split()[0], 'config': config, 'scenarios': {}}
+    for scenario in args.scenarios:
+        try:
+            samples = [run_sample(dict(config, scenario=scenario), args.timeout + 60) for _ in range(args.repeat)]
+            report['scenarios'][scenario] = {
+                'events_per_second': summarize([sample['events_per_second'] for sample in samples]),
+                'cpu_per_event_us': summarize([sample['cpu_per_event_us'] for sample in samples]),
+                'last_sample': samples[-1],
+            }
+        except Exception as e:
+            report['scenarios'][scenario] = {'error': str(e)}
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
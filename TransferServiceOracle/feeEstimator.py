@@ -1,19 +1,19 @@
-from web3 import Web3
-import json
 import os
 import time
 import threading
 from dotenv import load_dotenv
-from service import stop_flag
+from utils.lifecycle import stop_flag
+from utils.metrics import counter, gauge
+from utils.nonces import send_transaction
+from utils.gasoracle import get_gas_oracle
+from utils.gasestimates import GasEstimateCache
+from utils.logpoller import BlockCadence
+from utils.multicall import get_read_batcher
+from utils.chainclient import get_web3, get_contract, lazy, node_url
 
 # Load environment variables
 load_dotenv()
 
-def load_abi(file_path):
-    with open(file_path, 'r') as file:
-        contract_json = json.load(file)
-        return contract_json['abi']
-    
 # Infura/Node URLs for Ethereum and Binance Smart Chain
 ETHEREUM_NODE_URL = os.getenv('ETHEREUM_NODE_URL')
 BSC_NODE_URL = os.getenv('BSC_NODE_URL')
@@ -25,102 +25,124 @@ BSC_CONTRACT_OWNER_PRIVATE_KEY = os.getenv('BSC_CONTRACT_OWNER_PRIVATE_KEY')
 ETH_CONTRACT_OWNER_ADDRESS = os.getenv('ETH_CONTRACT_OWNER_ADDRESS')
 BSC_CONTRACT_OWNER_ADDRESS = os.getenv('BSC_CONTRACT_OWNER_ADDRESS')
 
-# Contract addresses and ABI (replace with actual values)
-ERC20_LOCK_ABI = load_abi('../artifacts/contracts/ERC20Lock.sol/ERC20Lock.json')  # Replace with your ERC20Lock contract ABI
+# Contract addresses, ABIs are loaded once per process by utils.chainclient
 ERC20_LOCK_ADDRESS = os.getenv('ERC20_LOCK_ADDRESS')
 
-BEP20_ABI = load_abi('../artifacts/contracts/BEP20Mintable.sol/BEP20Mintable.json') # Replace with your BEP20Mintable contract ABI
 BEP20_ADDRESS = os.getenv('BEP20_MINTABLE_ADDRESS')
 
-BURN_AND_RELEASE_COORDINATOR_ABI = load_abi('../artifacts/contracts/BurnAndReleaseCoordinator.sol/BurnAndReleaseCoordinator.json')  # Replace with your coordinator contract ABI
 BURN_AND_RELEASE_COORDINATOR_ADDRESS = os.getenv('BURN_AND_RELEASE_COORDINATOR_ADDRESS')
 
-# Initialize Web3 instances
-web3_eth = Web3(Web3.HTTPProvider(ETHEREUM_NODE_URL))
-web3_bsc = Web3(Web3.HTTPProvider(BSC_NODE_URL))
+# Web3 instances and contracts shared with the other services in the process, built on first use
+web3_eth = lazy(get_web3, 'ethereum')
+web3_bsc = lazy(get_web3, 'bsc')
 
 # Contract instances
-erc20_lock_contract = web3_eth.eth.contract(address=ERC20_LOCK_ADDRESS, abi=ERC20_LOCK_ABI)
-bep20_contract = web3_bsc.eth.contract(address=BEP20_ADDRESS, abi=BEP20_ABI)
-burn_and_release_contract = web3_eth.eth.contract(address=BURN_AND_RELEASE_COORDINATOR_ADDRESS, abi=BURN_AND_RELEASE_COORDINATOR_ABI)
+erc20_lock_contract = lazy(get_contract, 'ERC20Lock')
+bep20_contract = lazy(get_contract, 'BEP20Mintable')
+burn_and_release_contract = lazy(get_contract, 'BurnAndReleaseCoordinator')
+
+# Same per-chain gas samples the relayer prices its transactions with
+eth_gas_oracle = get_gas_oracle(web3_eth, 'ethereum')
+bsc_gas_oracle = get_gas_oracle(web3_bsc, 'bsc')
+
+def read_batcher(web3_instance, chain_name):
+    # The node URL is resolved on first use like the web3 instances, not when this module is imported
+    return get_read_batcher(web3_instance, node_url(chain_name), chain_name)
+
+# Fee reads issued together on a chain share one Multicall3 round trip
+eth_reads = lazy(read_batcher, web3_eth, 'ethereum')
+bsc_reads = lazy(read_batcher, web3_bsc, 'bsc')
 
+# Gas usage of the relayed calls, re-estimated only when the contract code changes or the estimate gets old
+gas_estimates = GasEstimateCache()
 
+# Fee estimator metrics, served on /metrics
+fee_updates = counter('oracle_fee_updates', 'Fee update transactions sent, by fee setter', ('setter',))
+fee_wei = gauge('oracle_fee_wei', 'Fee on chain and fee computed from the current gas price, in wei', ('setter', 'kind'))
 
-def update_gas_fee(contract,web3_instance, function_name, address,privatekey, fee):
+# Block-driven mode: a fee is only pushed when the computed fee leaves a band of FEE_UPDATE_BAND (fraction) around
+# the fee on chain, and at most once per FEE_UPDATE_MIN_INTERVAL seconds per fee
+FEE_UPDATE_BAND = float(os.getenv('FEE_UPDATE_BAND', '0.1'))
+FEE_UPDATE_MIN_INTERVAL = float(os.getenv('FEE_UPDATE_MIN_INTERVAL', '120'))
+# Seconds after which the fee on chain is read again instead of trusting the last value seen or pushed
+FEE_CURRENT_REFRESH_INTERVAL = float(os.getenv('FEE_CURRENT_REFRESH_INTERVAL', '600'))
+
+
+def update_gas_fee(contract,web3_instance,chain_name, function_name, address,privatekey, fee):
     
-        tx = contract.functions[function_name](fee).buildTransaction({
+        tx_hash = send_transaction(web3_instance, chain_name, contract.functions[function_name](fee), {
             'from': address,
-            'nonce': web3_instance.eth.getTransactionCount(address),
             'gas': 2000000,
-            'gasPrice': web3_eth.toWei('20', 'gwei')
-        })
-        signed_tx = web3_instance.eth.account.sign_transaction(tx, private_key=privatekey)
-        tx_hash = web3_instance.eth.sendRawTransaction(signed_tx.rawTransaction)
-        print(f"[FeeEstimator] Updated {function_name} fee. TxHash: {web3_instance.toHex(tx_hash)}")
-
-def calculate_and_update_gas_fee_for_coordinator():
-    gas_estimate = burn_and_release_contract.functions.initateBurnAndRelease().estimateGas({
-        'from': BSC_CONTRACT_OWNER_ADDRESS
-    })
-    gas_estimate += burn_and_release_contract.functions.releaseCompleted().estimateGas({
-        'from': BSC_CONTRACT_OWNER_ADDRESS
-    })
-    gas_estimate += burn_and_release_contract.functions.releaseFailed().estimateGas({
-        'from': BSC_CONTRACT_OWNER_ADDRESS
-    })
-
-    gas_price = web3_bsc.eth.gas_price
-    current_fee = bep20_contract.functions.coordinatorFee().call()
+            **get_gas_oracle(web3_instance, chain_name).tx_params()
+        }, privatekey)
+        fee_updates.labels(function_name).inc()
+        print(f"[FeeEstimator] Updated {function_name} fee. TxHash: {web3_instance.to_hex(tx_hash)}")
+
+def observe_fee(setter, current_fee, computed_fee):
+    fee_wei.labels(setter, 'current').set(current_fee)
+    fee_wei.labels(setter, 'computed').set(computed_fee)
+
+def calculate_and_update_gas_fee_for_coordinator(gas_price):
+    gas_estimate = sum(
+        gas_estimates.estimate(web3_bsc, 'bsc', burn_and_release_contract, function_name, {'from': BSC_CONTRACT_OWNER_ADDRESS})
+        for function_name in ('initateBurnAndRelease', 'releaseCompleted', 'releaseFailed')
+    )
+
+    current_fee = bsc_reads.call(bep20_contract.functions.coordinatorFee()).result()
     total_gas_fee = gas_estimate * gas_price
-    total_gas_fee_in_ether = web3_bsc.fromWei(total_gas_fee, 'ether')
+    observe_fee('setCoordinatorFee', current_fee, total_gas_fee)
+    total_gas_fee_in_ether = web3_bsc.from_wei(total_gas_fee, 'ether')
 
     print(f"[FeeEstimator] Estimated Max Gas Usage for Coordinator: {gas_estimate}")
-    print(f"[FeeEstimator] Gas Price: {web3_bsc.fromWei(gas_price, 'gwei')} gwei")
+    print(f"[FeeEstimator] Gas Price: {web3_bsc.from_wei(gas_price, 'gwei')} gwei")
     print(f"[FeeEstimator] Total Gas Fee: {total_gas_fee_in_ether} ETH")
 
     if total_gas_fee < current_fee:
-        update_gas_fee(bep20_contract,web3_bsc,'setCoordinatorFee', BSC_CONTRACT_OWNER_ADDRESS, BSC_CONTRACT_OWNER_PRIVATE_KEY,total_gas_fee)
+        update_gas_fee(bep20_contract,web3_bsc,'bsc','setCoordinatorFee', BSC_CONTRACT_OWNER_ADDRESS, BSC_CONTRACT_OWNER_PRIVATE_KEY,total_gas_fee)
 
-def calculate_and_update_gas_fee_for_release_tokens():
-    gas_estimate = erc20_lock_contract.functions.releaseTokens().estimateGas({
+def calculate_and_update_gas_fee_for_release_tokens(gas_price):
+    gas_estimate = gas_estimates.estimate(web3_eth, 'ethereum', erc20_lock_contract, 'releaseTokens', {
         'from': ETH_CONTRACT_OWNER_ADDRESS
     })
-    
-    gas_price = web3_eth.eth.gas_price
-    current_fee = erc20_lock_contract.functions.releaseFee().call()
+
+    current_fee = eth_reads.call(erc20_lock_contract.functions.releaseFee()).result()
     total_gas_fee = gas_estimate * gas_price
-    total_gas_fee_in_ether = web3_eth.fromWei(total_gas_fee, 'ether')
+    observe_fee('setReleaseFee', current_fee, total_gas_fee)
+    total_gas_fee_in_ether = web3_eth.from_wei(total_gas_fee, 'ether')
 
     print(f"[FeeEstimator] Estimated Max Gas Usage for Release Tokens: {gas_estimate}")
-    print(f"[FeeEstimator] Gas Price: {web3_eth.fromWei(gas_price, 'gwei')} gwei")
+    print(f"[FeeEstimator] Gas Price: {web3_eth.from_wei(gas_price, 'gwei')} gwei")
     print(f"[FeeEstimator] Total Gas Fee: {total_gas_fee_in_ether} ETH")
 
     if total_gas_fee < current_fee:
-        update_gas_fee(erc20_lock_contract,web3_eth,'setReleaseFee', ETH_CONTRACT_OWNER_ADDRESS, ETH_CONTRACT_OWNER_PRIVATE_KEY,total_gas_fee)
+        update_gas_fee(erc20_lock_contract,web3_eth,'ethereum','setReleaseFee', ETH_CONTRACT_OWNER_ADDRESS, ETH_CONTRACT_OWNER_PRIVATE_KEY,total_gas_fee)
 
-def calculate_and_update_gas_fee_for_mint():
-    gas_estimate = bep20_contract.functions.mint().estimateGas({
+def calculate_and_update_gas_fee_for_mint(gas_price):
+    gas_estimate = gas_estimates.estimate(web3_bsc, 'bsc', bep20_contract, 'mint', {
         'from': BSC_CONTRACT_OWNER_ADDRESS
     })
 
-    gas_price = web3_bsc.eth.gas_price
-    current_fee = bep20_contract.functions.mintFee().call()
+    current_fee = bsc_reads.call(bep20_contract.functions.mintFee()).result()
     total_gas_fee = gas_estimate * gas_price
-    total_gas_fee_in_ether = web3_bsc.fromWei(total_gas_fee, 'ether')
+    observe_fee('setMintFee', current_fee, total_gas_fee)
+    total_gas_fee_in_ether = web3_bsc.from_wei(total_gas_fee, 'ether')
 
     print(f"[FeeEstimator] Estimated Max Gas Usage for Mint: {gas_estimate}")
-    print(f"[FeeEstimator] Gas Price: {web3_bsc.fromWei(gas_price, 'gwei')} gwei")
+    print(f"[FeeEstimator] Gas Price: {web3_bsc.from_wei(gas_price, 'gwei')} gwei")
     print(f"[FeeEstimator] Total Gas Fee: {total_gas_fee_in_ether} ETH")
 
     if total_gas_fee < current_fee:
-        update_gas_fee(bep20_contract,web3_bsc,'setMintFee', BSC_CONTRACT_OWNER_ADDRESS, BSC_CONTRACT_OWNER_PRIVATE_KEY,total_gas_fee)
+        update_gas_fee(bep20_contract,web3_bsc,'bsc','setMintFee', BSC_CONTRACT_OWNER_ADDRESS, BSC_CONTRACT_OWNER_PRIVATE_KEY,total_gas_fee)
 
 # Function to run the fee update tasks in parallel
 def run_fee_update_tasks():
+    # One gas price sample per chain for the whole cycle
+    eth_gas_price = eth_gas_oracle.gas_price()
+    bsc_gas_price = bsc_gas_oracle.gas_price()
     tasks = [
-        threading.Thread(target=calculate_and_update_gas_fee_for_coordinator,daemon=True),
-        threading.Thread(target=calculate_and_update_gas_fee_for_release_tokens,daemon=True),
-        threading.Thread(target=calculate_and_update_gas_fee_for_mint,daemon=True)
+        threading.Thread(target=calculate_and_update_gas_fee_for_coordinator,args=(bsc_gas_price,),daemon=True),
+        threading.Thread(target=calculate_and_update_gas_fee_for_release_tokens,args=(eth_gas_price,),daemon=True),
+        threading.Thread(target=calculate_and_update_gas_fee_for_mint,args=(bsc_gas_price,),daemon=True)
     ]
 
     for task in tasks:
@@ -129,6 +151,97 @@ def run_fee_update_tasks():
     for task in tasks:
         task.join()
 
+def fee_targets():
+    # fee setter -> (chain, web3 instance, gas oracle, fee contract, fee getter, [(contract, estimated function)], owner address, owner private key)
+    return {
+        'setCoordinatorFee': ('bsc', web3_bsc, bsc_gas_oracle, bep20_contract, 'coordinatorFee',
+                              [(burn_and_release_contract, name) for name in ('initateBurnAndRelease', 'releaseCompleted', 'releaseFailed')],
+                              BSC_CONTRACT_OWNER_ADDRESS, BSC_CONTRACT_OWNER_PRIVATE_KEY),
+        'setReleaseFee': ('ethereum', web3_eth, eth_gas_oracle, erc20_lock_contract, 'releaseFee',
+                          [(erc20_lock_contract, 'releaseTokens')],
+                          ETH_CONTRACT_OWNER_ADDRESS, ETH_CONTRACT_OWNER_PRIVATE_KEY),
+        'setMintFee': ('bsc', web3_bsc, bsc_gas_oracle, bep20_contract, 'mintFee',
+                       [(bep20_contract, 'mint')],
+                       BSC_CONTRACT_OWNER_ADDRESS, BSC_CONTRACT_OWNER_PRIVATE_KEY),
+    }
+
+class BlockFeeUpdater:
+    """
+    Reprices fees on every new block of a chain instead of on a fixed timer.
+    The computed fee (cached gas estimate x the block's gas price) only
+    triggers a fee update when it leaves a band of +/- band around the fee
+    currently on chain, and each fee is updated at most once per min_interval,
+    so a price oscillating around the current fee costs no transactions.
+    """
+
+    def __init__(self, chain_name, band=FEE_UPDATE_BAND, min_interval=FEE_UPDATE_MIN_INTERVAL,
+                 current_refresh_interval=FEE_CURRENT_REFRESH_INTERVAL):
+        self.chain_name = chain_name
+        self.band = band
+        self.min_interval = min_interval
+        self.current_refresh_interval = current_refresh_interval
+        self.targets = {setter: target for setter, target in fee_targets().items() if target[0] == chain_name}
+        self.web3 = next(iter(self.targets.values()))[1]
+        self.cadence = BlockCadence()
+        self._current_fees = {}  # setter -> (fee on chain, read or pushed at)
+        self._last_update = {}  # setter -> time of the last fee update sent
+
+    def current_fees(self):
+        # Fees not read for a while are read again, all of this chain's in one batched round trip
+        now = time.time()
+        reads = eth_reads if self.chain_name == 'ethereum' else bsc_reads
+        stale = {
+            setter: reads.call(contract.functions[getter]())
+            for setter, (_, _, _, contract, getter, _, _, _) in self.targets.items()
+            if setter not in self._current_fees or now - self._current_fees[setter][1] >= self.current_refresh_interval
+        }
+        for setter, fee in stale.items():
+            self._current_fees[setter] = (fee.result(), now)
+        return {setter: fee for setter, (fee, _) in self._current_fees.items()}
+
+    def reprice(self, setter, gas_price, current_fee):
+        chain_name, web3_instance, _, contract, _, estimated, address, private_key = self.targets[setter]
+        gas_estimate = sum(
+            gas_estimates.estimate(web3_instance, chain_name, estimated_contract, function_name, {'from': address})
+            for estimated_contract, function_name in estimated
+        )
+        fee = gas_estimate * gas_price
+        observe_fee(setter, current_fee, fee)
+        if current_fee * (1 - self.band) <= fee <= current_fee * (1 + self.band):
+            return
+        if time.time() - self._last_update.get(setter, 0) < self.min_interval:
+            return
+        print(f"[FeeEstimator] {setter[3:]} moved from {web3_instance.from_wei(current_fee, 'ether')} to {web3_instance.from_wei(fee, 'ether')} at {web3_instance.from_wei(gas_price, 'gwei')} gwei")
+        update_gas_fee(contract, web3_instance, chain_name, setter, address, private_key, fee)
+        self._last_update[setter] = time.time()
+        self._current_fees[setter] = (fee, time.time())
+
+    def run(self):
+        last_block = None
+        while not stop_flag.is_set():
+            try:
+                block = self.web3.eth.block_number
+                self.cadence.observe(block)
+                if block != last_block:
+                    last_block = block
+                    # The gas oracle samples once per block, every fee of this chain is priced from the same sample
+                    gas_price = get_gas_oracle(self.web3, self.chain_name).gas_price()
+                    current_fees = self.current_fees()
+                    for setter in self.targets:
+                        self.reprice(setter, gas_price, current_fees[setter])
+            except Exception as e:
+                print(f"[FeeEstimator] Error repricing fees on {self.chain_name}: {e}")
+            stop_flag.wait(self.cadence.delay())
+
+def run_block_driven_fee_updates():
+    # Each chain follows its own block time
+    updaters = [BlockFeeUpdater('ethereum'), BlockFeeUpdater('bsc')]
+    threads = [threading.Thread(target=updater.run, daemon=True) for updater in updaters]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
 # Polling the fee update tasks at regular intervals
 def poll_fee_updates(interval=600):
     while not stop_flag.is_set():
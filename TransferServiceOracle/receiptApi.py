@@ -0,0 +1,253 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+from contextlib import asynccontextmanager
+from typing import List
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import uvicorn
+from utils.transferstore import get_transfer_store
+from utils.lifecycle import stop_flag
+from utils.receiptstore import ReceiptStore
+
+# Load environment variables
+load_dotenv()
+
+# Address of the receipt API, and how many worker processes serve it (1 serves it from a thread of the listener process)
+RECEIPT_API_HOST = os.getenv('RECEIPT_API_HOST', '0.0.0.0')
+RECEIPT_API_PORT = int(os.getenv('RECEIPT_API_PORT', '8000'))
+RECEIPT_API_WORKERS = int(os.getenv('RECEIPT_API_WORKERS', '1'))
+# Seconds between two store lookups for the receipts waited on, in worker processes that are not woken by the signer
+RECEIPT_API_STORE_POLL_INTERVAL = float(os.getenv('RECEIPT_API_STORE_POLL_INTERVAL', '0.25'))
+# Longest a /collect/ long-poll is held open, and seconds between keep-alive comments on a receipt stream
+RECEIPT_LONG_POLL_MAX_WAIT = float(os.getenv('RECEIPT_LONG_POLL_MAX_WAIT', '60'))
+RECEIPT_STREAM_KEEPALIVE = float(os.getenv('RECEIPT_STREAM_KEEPALIVE', '15'))
+# Most receipt ids accepted by one /collect/batch request
+RECEIPT_BATCH_MAX_SIZE = int(os.getenv('RECEIPT_BATCH_MAX_SIZE', '10000'))
+
+# Signed receipts: recent ones in a bounded in-memory tier, all of them on disk
+signed_receipts = ReceiptStore()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Set for worker processes started by run_http_server, the listener process wakes its waiters directly
+    watcher = None
+    if os.getenv('RECEIPT_API_WATCH_STORE') == '1':
+        watcher = asyncio.create_task(watch_store(RECEIPT_API_STORE_POLL_INTERVAL))
+    try:
+        yield
+    finally:
+        if watcher:
+            watcher.cancel()
+
+app = FastAPI(lifespan=lifespan)
+
+# Requests waiting for a receipt that is not signed yet: receipt_id -> [(event loop, future)]
+receipt_waiters = {}
+receipt_waiters_lock = threading.Lock()
+
+def notify_receipt(receipt_id, receipt):
+    # Called from the signer or the store watcher, wakes the waiting requests on the HTTP server's event loop
+    with receipt_waiters_lock:
+        waiters = receipt_waiters.pop(receipt_id, [])
+    for loop, future in waiters:
+        loop.call_soon_threadsafe(resolve_waiter, future, receipt)
+
+def resolve_waiter(future, receipt):
+    if not future.done():
+        future.set_result(receipt)
+
+async def wait_for_receipt(receipt_id, timeout):
+    """Returns the receipt as soon as it is signed, or None after timeout seconds."""
+    # The store reads from SQLite for receipts no longer in memory, so lookups run off the event loop
+    receipt = await asyncio.to_thread(signed_receipts.get, receipt_id)
+    if receipt or timeout <= 0:
+        return receipt
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    waiter = (loop, future)
+    with receipt_waiters_lock:
+        receipt_waiters.setdefault(receipt_id, []).append(waiter)
+    try:
+        # The receipt may have been stored between the first lookup and registering the waiter
+        receipt = await asyncio.to_thread(signed_receipts.get, receipt_id)
+        if receipt:
+            return receipt
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+    finally:
+        with receipt_waiters_lock:
+            waiters = receipt_waiters.get(receipt_id)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del receipt_waiters[receipt_id]
+
+async def watch_store(interval):
+    # One lookup per interval for every receipt this process is waiting on, written by the listener process
+    while True:
+        await asyncio.sleep(interval)
+        with receipt_waiters_lock:
+            waiting = list(receipt_waiters)
+        if not waiting:
+            continue
+        try:
+            found = await asyncio.to_thread(signed_receipts.get_many, waiting)
+        except Exception as e:
+            print(f"[ReceiptApi] Error reading the receipt store: {e}")
+            continue
+        for receipt_id, receipt in found.items():
+            notify_receipt(receipt_id, receipt)
+
+class ReceiptRequest(BaseModel):
+    receipt_id: str
+    # Seconds to hold the request open waiting for the receipt, 0 answers immediately
+    wait: float = 0
+
+@app.post("/collect/")
+async def collect_receipt(request: ReceiptRequest):
+    receipt = await wait_for_receipt(request.receipt_id, min(request.wait, RECEIPT_LONG_POLL_MAX_WAIT))
+
+    if receipt:
+        return receipt
+    else:
+        raise HTTPException(status_code=404, detail="Receipt not found.")
+
+@app.get("/collect/stream/{receipt_id}")
+async def stream_receipt(receipt_id: str, request: Request):
+    # Server-sent events: keep-alive comments until the receipt is signed, then a single receipt event
+    async def events():
+        while True:
+            receipt = await wait_for_receipt(receipt_id, RECEIPT_STREAM_KEEPALIVE)
+            if receipt:
+                yield f"event: receipt\ndata: {json.dumps(receipt)}\n\n"
+                return
+            if await request.is_disconnected():
+                return
+            yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={'Cache-Control': 'no-cache'})
+
+async def receipts_as_signed(receipt_ids, timeout):
+    """Yields (receipt_id, receipt) for stored receipts first, then for missing ones as they are signed, until timeout."""
+    found = await asyncio.to_thread(signed_receipts.get_many, receipt_ids)
+    for receipt_id in receipt_ids:
+        if receipt_id in found:
+            yield receipt_id, found[receipt_id]
+    missing = [receipt_id for receipt_id in receipt_ids if receipt_id not in found]
+    if not missing or timeout <= 0:
+        return
+
+    async def wait_for(receipt_id):
+        return receipt_id, await wait_for_receipt(receipt_id, timeout)
+
+    tasks = [asyncio.create_task(wait_for(receipt_id)) for receipt_id in missing]
+    try:
+        for next_signed in asyncio.as_completed(tasks):
+            receipt_id, receipt = await next_signed
+            if receipt:
+                yield receipt_id, receipt
+    finally:
+        for task in tasks:
+            task.cancel()
+
+class BatchReceiptRequest(BaseModel):
+    receipt_ids: List[str]
+    # Seconds to wait for the missing receipts to be signed, 0 answers immediately
+    wait: float = 0
+
+@app.post("/collect/batch")
+async def collect_receipts(batch: BatchReceiptRequest, request: Request):
+    receipt_ids = list(dict.fromkeys(batch.receipt_ids))
+    if len(receipt_ids) > RECEIPT_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {RECEIPT_BATCH_MAX_SIZE} receipt ids per batch.")
+    wait = min(batch.wait, RECEIPT_LONG_POLL_MAX_WAIT)
+
+    if 'application/x-ndjson' in request.headers.get('accept', ''):
+        # One line per receipt as soon as it is available, then a final line listing the ids still missing
+        async def lines():
+            collected = set()
+            async for receipt_id, receipt in receipts_as_signed(receipt_ids, wait):
+                collected.add(receipt_id)
+                yield json.dumps({'receipt_id': receipt_id, 'receipt': receipt}) + '\n'
+            yield json.dumps({'missing': [receipt_id for receipt_id in receipt_ids if receipt_id not in collected]}) + '\n'
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    receipts = {receipt_id: receipt async for receipt_id, receipt in receipts_as_signed(receipt_ids, wait)}
+    return {
+        'receipts': receipts,
+        'missing': [receipt_id for receipt_id in receipt_ids if receipt_id not in receipts],
+    }
+
+@app.get("/status/{transfer_request_id}")
+async def transfer_status(transfer_request_id: str):
+    # Lifecycle recorded by the relayer in the shared transfer store
+    try:
+        status = await asyncio.to_thread(lambda: get_transfer_store().get(transfer_request_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid transfer request id.")
+
+    if status:
+        return status
+    else:
+        raise HTTPException(status_code=404, detail="Transfer not found.")
+
+
+
+# The running server: a uvicorn.Server on a thread of this process, or the uvicorn process managing the workers
+http_server = None
+http_server_lock = threading.Lock()
+
+def run_http_server(workers=RECEIPT_API_WORKERS):
+    global http_server
+    with http_server_lock:
+        if stop_flag.is_set():
+            return
+        if workers <= 1:
+            server = http_server = uvicorn.Server(uvicorn.Config(app, host=RECEIPT_API_HOST, port=RECEIPT_API_PORT))
+        else:
+            # uvicorn's process manager needs a main thread, so it runs as its own process, the workers only read the shared stores
+            env = dict(os.environ, RECEIPT_API_WATCH_STORE='1')
+            server = http_server = subprocess.Popen([
+                sys.executable, '-m', 'uvicorn', 'receiptApi:app',
+                '--app-dir', os.path.dirname(os.path.abspath(__file__)),
+                '--host', RECEIPT_API_HOST, '--port', str(RECEIPT_API_PORT), '--workers', str(workers),
+            ], env=env)
+    if workers <= 1:
+        server.run()
+        return
+    try:
+        server.wait()
+    finally:
+        if server.poll() is None:
+            server.terminate()
+            server.wait()
+
+def stop_http_server(timeout=10):
+    """Stops the server started by run_http_server; the uvicorn process is terminated and waited for, with its workers."""
+    with http_server_lock:
+        server = http_server
+    if server is None:
+        return
+    if not isinstance(server, subprocess.Popen):
+        server.should_exit = True
+        return
+    if server.poll() is None:
+        server.terminate()
+        try:
+            server.wait(timeout)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+if __name__ == '__main__':
+    # Serve the API on its own, next to a receiptGenerator process that signs and stores receipts
+    run_http_server()
@@ -1,68 +1,52 @@
 import threading
-import asyncio
-import json
-from web3 import Web3
+import time
 import os
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import uvicorn
+from utils.logpoller import LogPoller
+from utils.checkpoint import BlockCheckpoint
+from utils.receiptsigner import ReceiptSigner
+from utils.chainclient import get_web3, get_contract, lazy
+from utils.lifecycle import stop_flag
+from utils.metrics import counter, histogram, queue_depth
+from receiptApi import signed_receipts, notify_receipt, run_http_server
 
 
 # Load environment variables
 load_dotenv()
 
-def load_abi(file_path):
-    with open(file_path, 'r') as file:
-        contract_json = json.load(file)
-        return contract_json['abi']
-    
 # Connect to Ethereum and BSC nodes
 BSC_NODE_URL = os.getenv('BSC_NODE_URL')
 ETH_NODE_URL = os.getenv('ETHEREUM_NODE_URL')
 
 # Contract details
-BEP20_ABI = load_abi('../artifacts/contracts/BEP20Mintable.sol/BEP20Mintable.json')  # Replace with the ABI of your BEP20Mintable contract
-ETH20_LOCK_ABI = load_abi('../artifacts/contracts/ERC20Lock.sol/ERC20Lock.json')   # Replace with the ABI of your ERC20Lock contract
-
 BEP20_ADDRESS = os.getenv('BEP20_MINTABLE_ADDRESS')
 ERC20_LOCK_ADDRESS = os.getenv('ERC20_LOCK_ADDRESS')
 
-# Initialize Web3 instances for BSC and Ethereum
-web3_bsc = Web3(Web3.HTTPProvider(BSC_NODE_URL))
-web3_eth = Web3(Web3.HTTPProvider(ETH_NODE_URL))
+# Web3 instances and contracts shared with the other services in the process, built on first use
+web3_bsc = lazy(get_web3, 'bsc')
+web3_eth = lazy(get_web3, 'ethereum')
 
 # Initialize contracts
-bep20_contract = web3_bsc.eth.contract(address=BEP20_ADDRESS, abi=BEP20_ABI)
-erc20_lock_contract = web3_eth.eth.contract(address=ERC20_LOCK_ADDRESS, abi=ETH20_LOCK_ABI)
+bep20_contract = lazy(get_contract, 'BEP20Mintable')
+erc20_lock_contract = lazy(get_contract, 'ERC20Lock')
 
 # Private keys for signing (Make sure to keep this secure!)
 BSC_CONTRACT_OWNER_PRIVATE_KEY = os.getenv('BSC_CONTRACT_OWNER_PRIVATE_KEY')
 ETH_CONTRACT_OWNER_PRIVATE_KEY = os.getenv('ETH_CONTRACT_OWNER_PRIVATE_KEY')
 
-# Data structure to store signed receipts
-signed_receipts = {}
-
-app = FastAPI()
-
-class ReceiptRequest(BaseModel):
-    receipt_id: str
-
-@app.post("/collect/")
-async def collect_receipt(request: ReceiptRequest):
-    receipt_id = request.receipt_id
-    await asyncio.sleep(0)  # Yield control to the event loop
-    receipt = signed_receipts.get(receipt_id, None)
-
-    if receipt:
-        return receipt
-    else:
-        raise HTTPException(status_code=404, detail="Receipt not found.")
+# Last processed block per chain, so fee payments made while the service was down still get receipts
+RECEIPT_CHECKPOINT_FILE = os.getenv('RECEIPT_CHECKPOINT_FILE', './receipt_checkpoint.json')
+LOGS_MAX_BLOCK_RANGE = int(os.getenv('LOGS_MAX_BLOCK_RANGE', '2000'))
+LOGS_BACKFILL_WORKERS = int(os.getenv('LOGS_BACKFILL_WORKERS', '4'))
+# Bounds on the block-time-driven wait between two eth_blockNumber checks on a chain
+LOGS_MIN_POLL_INTERVAL = float(os.getenv('LOGS_MIN_POLL_INTERVAL', '0.5'))
+LOGS_MAX_POLL_INTERVAL = float(os.getenv('LOGS_MAX_POLL_INTERVAL', '30'))
 
+# Receipt generator metrics, served on /metrics
+receipts_signed = counter('oracle_receipts_signed', 'Fee receipts signed and stored, by event', ('event',))
+receipt_signing_latency = histogram('oracle_receipt_signing_seconds', 'Time from a fee payment event being handled to its signed receipt being stored', ('event',))
+fee_events_seen = counter('oracle_receipt_events', 'Fee payment events seen by the receipt generator, by event and whether they were new', ('event', 'outcome'))
 
-def run_http_server():
-    uvicorn.run(app, host="0.0.0.0", port=8000)
-    
 # Event handler (as defined above)
 def handle_event(event, event_name):
     sender = event['args']['payer']
@@ -71,61 +55,95 @@ def handle_event(event, event_name):
     contractAddress = event['args']['contractAddress']
     timestamp = event['args']['userTimestamp']
     receipt_message = event['args']['receiptMessage']
+    receipt_id = f"{sender}-{timestamp}"
+
+    # Receipts are persisted, so an event replayed from an older checkpoint is not signed again
+    receipt_signer = get_receipt_signer()
+    if receipt_id in signed_receipts or receipt_signer.is_pending(receipt_id):
+        fee_events_seen.labels(event_name, 'duplicate').inc()
+        return
+    fee_events_seen.labels(event_name, 'new').inc()
 
-    # Select the private key based on the event name
-    if event_name == "MintFeePaid":
-        private_key = BSC_CONTRACT_OWNER_PRIVATE_KEY
-    elif event_name == "ReleaseFeePaid":
-        private_key = ETH_CONTRACT_OWNER_PRIVATE_KEY
-    else:
+    # The signing key is selected by the event name in the signer's worker processes
+    if event_name not in ("MintFeePaid", "ReleaseFeePaid"):
         raise ValueError(f"Unknown event name: {event_name}")
 
-    # Sign the receipt message using the selected private key
-    signed_message = web3_bsc.eth.account.sign_message(receipt_message, private_key)
-    receipt_id = f"{sender}-{timestamp}"
-    signed_receipts[receipt_id] = {
+    receipt_signer.submit(receipt_id, event_name, receipt_message, {
         'feeAmount': value,
         'nonce': nonce,
         'contractAddress': contractAddress,
-        'receipt': signed_message.signature.hex(),
-    }
-
-    print(f"[ReceiptGenerator] Signed receipt stored for {sender} for {event_name} event: {signed_receipts[receipt_id]}")
+        'sender': sender,
+        'event': event_name,
+        'submitted_at': time.monotonic(),
+    })
+
+def store_signed_receipt(receipt_id, receipt):
+    sender = receipt.pop('sender')
+    event_name = receipt.pop('event')
+    submitted_at = receipt.pop('submitted_at')
+    signed_receipts.put(receipt_id, receipt)
+    notify_receipt(receipt_id, receipt)
+    receipts_signed.labels(event_name).inc()
+    receipt_signing_latency.labels(event_name).observe(time.monotonic() - submitted_at)
+
+    print(f"[ReceiptGenerator] Signed receipt stored for {sender} for {event_name} event: {receipt}")
+
+receipt_signer = None
+receipt_signer_lock = threading.Lock()
+
+def get_receipt_signer():
+    # Receipts are signed in a process pool, each worker loads the owner keys once. Created on first use
+    global receipt_signer
+    with receipt_signer_lock:
+        if receipt_signer is None:
+            receipt_signer = ReceiptSigner({
+                "MintFeePaid": BSC_CONTRACT_OWNER_PRIVATE_KEY,
+                "ReleaseFeePaid": ETH_CONTRACT_OWNER_PRIVATE_KEY,
+            }, store_signed_receipt)
+            queue_depth.labels(queue='receipt_signer').set_function(receipt_signer.pending_count)
+        return receipt_signer
 
 # Event listener function
-def log_loop(event_filter, poll_interval, event_name):
-    while True:
+def log_loop(poller, poll_interval):
+    # poll_interval is the retry delay after an error, otherwise the poller follows its chain's block time
+    while not stop_flag.is_set():
         try:
-            for event in event_filter.get_new_entries():
-                handle_event(event, event_name)
+            for event, handler in poller.poll():
+                handler(event, event.event)
+            # Signing runs in parallel for the whole range, the checkpoint only moves once it is stored
+            get_receipt_signer().wait_idle()
+            poller.commit()
         except Exception as e:
-            print(f"[ReceiptGenerator] Error handling events: {e}")
-        web3_bsc.middleware_stack.sleep(poll_interval)
-
-# Create a filter for the MintFeePaid event on BSC
-mint_fee_filter = bep20_contract.events.MintFeePaid.createFilter(fromBlock='latest')
-# Create a filter for the ReleaseFeePaid event on Ethereum
-release_fee_filter = erc20_lock_contract.events.ReleaseFeePaid.createFilter(fromBlock='latest')
-
-
-# Function to run the event listeners in parallel using threading
+            print(f"[ReceiptGenerator] Error handling events on {poller.chain_name}: {e}")
+            stop_flag.wait(poll_interval)
+            continue
+        stop_flag.wait(poller.next_poll_delay())
+
+def create_log_pollers():
+    receipt_checkpoint = BlockCheckpoint(RECEIPT_CHECKPOINT_FILE)
+    # Poll the MintFeePaid event on BSC
+    mint_fee_poller = LogPoller(web3_bsc, 'bsc', receipt_checkpoint, LOGS_MAX_BLOCK_RANGE, LOGS_BACKFILL_WORKERS,
+                                LOGS_MIN_POLL_INTERVAL, LOGS_MAX_POLL_INTERVAL)
+    mint_fee_poller.watch(bep20_contract, 'MintFeePaid', handle_event)
+    # Poll the ReleaseFeePaid event on Ethereum
+    release_fee_poller = LogPoller(web3_eth, 'ethereum', receipt_checkpoint, LOGS_MAX_BLOCK_RANGE, LOGS_BACKFILL_WORKERS,
+                                LOGS_MIN_POLL_INTERVAL, LOGS_MAX_POLL_INTERVAL)
+    release_fee_poller.watch(erc20_lock_contract, 'ReleaseFeePaid', handle_event)
+    return [mint_fee_poller, release_fee_poller]
+
+
+# Function to run the event listeners in parallel using threading, returns once stop_flag is set
 def start_event_listeners():
+    print("[ReceiptGenerator] Event listeners started...")
     # Start the HTTP server in a separate thread
     threading.Thread(target=run_http_server, daemon=True).start()
-    threading.Thread(target=log_loop, args=(mint_fee_filter, 2, 'MintFeePaid'),daemon=True).start()
-    threading.Thread(target=log_loop, args=(release_fee_filter, 2, 'ReleaseFeePaid'),daemon=True).start()
-
-async def main():
-    print("[ReceiptGenerator] Event listeners started...")
+    listeners = [threading.Thread(target=log_loop, args=(poller, 2), daemon=True) for poller in create_log_pollers()]
+    for listener in listeners:
+        listener.start()
+    for listener in listeners:
+        listener.join()
+    if receipt_signer is not None:
+        receipt_signer.close()
+
+if __name__ == "__main__":
     start_event_listeners()
-
-    # Example usage: collecting receipts asynchronously
-    # while True:
-            # Simulate some async receipt collection
-    #     receipt_id = "some-receipt-id"
-    #     receipt = await collect_receipt(receipt_id)
-    #     print(f"Collected receipt: {receipt}")
-    #     await asyncio.sleep(10)  
-
-# Run the asyncio event loop
-asyncio.run(main())
@@ -1,20 +1,30 @@
 from web3 import Web3
+from hexbytes import HexBytes
 import os
 from dotenv import load_dotenv
 from datetime import datetime
-import json
 import time
-from utils.filelock import acquire_lock
-from utils.filelock import release_lock
+import threading
+import asyncio
+import functools
+from utils.logpoller import LogPoller
+from utils.checkpoint import BlockCheckpoint
+from utils.nonces import send_transaction
+from utils.receipttracker import get_receipt_tracker
+from utils.gasoracle import get_gas_oracle
+from utils.multicall import get_read_batcher
+from utils.transferjournal import (
+    TransferJournal, STAGE_LOCKED, STAGE_MINTED, STAGE_TRANSFER_INITIATED, STAGE_BURN_INITIATED,
+    STAGE_RELEASED, STAGE_RELEASE_FAILED, STAGE_COMPLETED, STAGE_RETURNED,
+)
+from utils.transferstore import get_transfer_store
+from utils.chainclient import get_web3, get_contract, lazy, node_url
+from utils.lifecycle import stop_flag
+from utils.metrics import counter, histogram, queue_depth
 
 # Load environment variables
 load_dotenv()
 
-def load_abi(file_path):
-    with open(file_path, 'r') as file:
-        contract_json = json.load(file)
-        return contract_json['abi']
-    
 # Infura/Node URLs for Ethereum and Binance Smart Chain
 ETHEREUM_NODE_URL = os.getenv('ETHEREUM_NODE_URL')
 BSC_NODE_URL = os.getenv('BSC_NODE_URL')
@@ -29,227 +39,526 @@ BSC_CONTRACT_OWNER_ADDRESS = os.getenv('BSC_CONTRACT_OWNER_ADDRESS')  # Use envi
 BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS=os.getenv('BSC_CONTRACT_OWNER_ADDRESS')
 BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY=os.getenv('BSC_CONTRACT_OWNER_PRIVATE_KEY')
 
-# ABI and contract addresses (Replace with actual ABI and contract addresses)
-ERC20_LOCK_ABI = load_abi('../artifacts/contracts/ERC20Lock.sol/ERC20Lock.json')  # Replace with the ABI of your ERC20Lock contract
+# Contract addresses, ABIs are loaded once per process by utils.chainclient
 ERC20_LOCK_ADDRESS = os.getenv('ERC20_LOCK_ADDRESS')
 
-BEP20_ABI = load_abi('../artifacts/contracts/BEP20Mintable.sol/BEP20Mintable.json') # Replace with the ABI of your BEP20Mintable contract
 BEP20_ADDRESS = os.getenv('BEP20_MINTABLE_ADDRESS')
 
-BURN_AND_RELEASE_COORDINATOR_ABI = load_abi('../artifacts/contracts/BurnAndReleaseCoordinator.sol/BurnAndReleaseCoordinator.json')  # Replace with the ABI of your BEP20Mintable contract
 BURN_AND_RELEASE_COORDINATOR_ADDRESS = os.getenv('BURN_AND_RELEASE_COORDINATOR_ADDRESS')
 
-# Initialize Web3 instances for Ethereum and BSC
-web3_eth = Web3(Web3.HTTPProvider(ETHEREUM_NODE_URL))
-web3_bsc = Web3(Web3.HTTPProvider(BSC_NODE_URL))
-
-erc20_lock_contract = web3_eth.eth.contract(address=ERC20_LOCK_ADDRESS, abi=ERC20_LOCK_ABI)
-bep20_contract = web3_bsc.eth.contract(address=BEP20_ADDRESS, abi=BEP20_ABI)
-burnAndReleaseContract=web3_eth.eth.contract(address=BURN_AND_RELEASE_COORDINATOR_ADDRESS, abi=BURN_AND_RELEASE_COORDINATOR_ABI)
-
-def withdraw_fee(contract_instance,web3_instance, method_name, address, private_key,feetype):
-    withdraw_fee_tx = contract_instance.functions[method_name]().buildTransaction({
+# Seconds to wait before retrying a chain whose log fetch failed
+RELAYER_POLL_INTERVAL = float(os.getenv('RELAYER_POLL_INTERVAL', '2'))
+# Bounds on the block-time-driven wait between two eth_blockNumber checks on a chain
+LOGS_MIN_POLL_INTERVAL = float(os.getenv('LOGS_MIN_POLL_INTERVAL', '0.5'))
+LOGS_MAX_POLL_INTERVAL = float(os.getenv('LOGS_MAX_POLL_INTERVAL', '30'))
+# Last processed block per chain, used to catch up on events emitted while the relayer was down
+RELAYER_CHECKPOINT_FILE = os.getenv('RELAYER_CHECKPOINT_FILE', './relayer_checkpoint.json')
+# Largest block range requested in one eth_getLogs call, and how many ranges are fetched in parallel during catch-up
+LOGS_MAX_BLOCK_RANGE = int(os.getenv('LOGS_MAX_BLOCK_RANGE', '2000'))
+LOGS_BACKFILL_WORKERS = int(os.getenv('LOGS_BACKFILL_WORKERS', '4'))
+# Collected fees are withdrawn in bulk every FEE_SWEEP_INTERVAL seconds, or once FEE_SWEEP_THRESHOLD withdrawals of one fee type are owed
+FEE_SWEEP_INTERVAL = float(os.getenv('FEE_SWEEP_INTERVAL', '300'))
+FEE_SWEEP_THRESHOLD = int(os.getenv('FEE_SWEEP_THRESHOLD', '20'))
+# Machine-readable journal with one record per transfer stage, indexed by transferRequestId
+TRANSFER_JOURNAL_FILE = os.getenv('TRANSFER_JOURNAL_FILE', './transfers.journal')
+
+# Web3 instances and contracts shared with the other services in the process, over pooled keep-alive sessions.
+# They are built on first use, so importing this module does no file or network work
+web3_eth = lazy(get_web3, 'ethereum')
+web3_bsc = lazy(get_web3, 'bsc')
+
+erc20_lock_contract = lazy(get_contract, 'ERC20Lock')
+bep20_contract = lazy(get_contract, 'BEP20Mintable')
+burnAndReleaseContract = lazy(get_contract, 'BurnAndReleaseCoordinator')
+
+# Gas prices are sampled once per block and shared with every sender in the process
+eth_gas_oracle = get_gas_oracle(web3_eth, 'ethereum')
+bsc_gas_oracle = get_gas_oracle(web3_bsc, 'bsc')
+
+# Relayer metrics, served on /metrics
+events_handled = counter('oracle_relayer_events', 'Contract events handled by the relayer, by event and outcome', ('event', 'outcome'))
+handler_latency = histogram('oracle_relayer_handler_duration_seconds', 'Time spent in an event handler, by handler', ('handler',))
+event_to_transaction_latency = histogram('oracle_relayer_event_to_transaction_seconds', 'Time from fetching an event to its handler having sent the relay transaction, by event', ('event',))
+transfer_latency = histogram('oracle_transfer_stage_latency_seconds', 'Time between two stages of a transfer as seen by the relayer', ('direction', 'from_stage', 'to_stage'))
+relay_transactions = counter('oracle_relay_transactions', 'Relay transactions mined, by chain, transaction and status', ('chain', 'transaction', 'status'))
+relay_gas_used = counter('oracle_relay_gas_used', 'Gas used by mined relay transactions, by chain and transaction', ('chain', 'transaction'))
+relay_fee_paid = counter('oracle_relay_fee_paid_wei', 'Fees paid for mined relay transactions in wei, by chain and transaction', ('chain', 'transaction'))
+relay_confirmation_latency = histogram('oracle_relay_confirmation_seconds', 'Time from sending a relay transaction to its receipt, by chain', ('chain',))
+
+# End-to-end spans timed from the transfer store: stage reached -> (direction, stage the span starts at).
+# Lock -> mint for Ethereum to BSC, burn -> release and the whole return trip for BSC to Ethereum
+TRANSFER_LATENCY_SPANS = {
+    STAGE_MINTED: ('eth_to_bsc', STAGE_LOCKED),
+    STAGE_RELEASED: ('bsc_to_eth', STAGE_BURN_INITIATED),
+    STAGE_COMPLETED: ('bsc_to_eth', STAGE_TRANSFER_INITIATED),
+}
+
+# Chain each stage's relay transaction is sent on
+RELAY_CHAINS = {
+    STAGE_LOCKED: 'bsc',
+    STAGE_TRANSFER_INITIATED: 'bsc',
+    STAGE_RELEASED: 'bsc',
+    STAGE_RELEASE_FAILED: 'bsc',
+    STAGE_BURN_INITIATED: 'ethereum',
+}
+
+# Fee withdrawals owed to the relayer since the last sweep, by fee type
+pending_fee_withdrawals = {'Mint': 0, 'Release': 0, 'Coordinator': 0}
+pending_fee_withdrawals_lock = threading.Lock()
+fee_sweep_requested = threading.Event()
+for fee_type in pending_fee_withdrawals:
+    queue_depth.labels(queue=f'fee_withdrawals_{fee_type.lower()}').set_function(lambda fee_type=fee_type: pending_fee_withdrawals[fee_type])
+
+def fee_withdrawal_targets():
+    # fee type -> (contract, web3 instance, chain, withdraw method, fee getter, owner address, owner private key)
+    return {
+        'Mint': (bep20_contract, web3_bsc, 'bsc', 'withdrawMintFee', 'mintFee', BSC_CONTRACT_OWNER_ADDRESS, BSC_CONTRACT_OWNER_PRIVATE_KEY),
+        'Coordinator': (bep20_contract, web3_bsc, 'bsc', 'withdrawCoordinatorFees', 'coordinatorFee', BSC_CONTRACT_OWNER_ADDRESS, BSC_CONTRACT_OWNER_PRIVATE_KEY),
+        'Release': (erc20_lock_contract, web3_eth, 'ethereum', 'withdrawReleaseFee', 'releaseFee', ETH_CONTRACT_OWNER_ADDRESS, ETH_CONTRACT_OWNER_PRIVATE_KEY),
+    }
+
+def record_fee_owed(feetype):
+    with pending_fee_withdrawals_lock:
+        pending_fee_withdrawals[feetype] += 1
+        if pending_fee_withdrawals[feetype] >= FEE_SWEEP_THRESHOLD:
+            fee_sweep_requested.set()
+
+transfer_journal = None
+transfer_journal_lock = threading.Lock()
+
+def get_transfer_journal():
+    global transfer_journal
+    with transfer_journal_lock:
+        if transfer_journal is None:
+            transfer_journal = TransferJournal(
+                TRANSFER_JOURNAL_FILE,
+                fsync_policy=os.getenv('JOURNAL_FSYNC_POLICY', 'interval'),
+                fsync_interval=float(os.getenv('JOURNAL_FSYNC_INTERVAL', '1')),
+            )
+            queue_depth.labels(queue='transfer_journal').set_function(transfer_journal.pending)
+        return transfer_journal
+
+def close_transfer_journal():
+    # Flushes stage records still queued in the journal writer
+    with transfer_journal_lock:
+        if transfer_journal is not None:
+            transfer_journal.close()
+
+def observe_transfer_latency(stage, transfer_request_id):
+    span = TRANSFER_LATENCY_SPANS.get(stage)
+    if span is None:
+        return
+    direction, from_stage = span
+    store = get_transfer_store()
+    started_at = store.stage_time(transfer_request_id, from_stage)
+    reached_at = store.stage_time(transfer_request_id, stage)
+    if started_at is not None and reached_at is not None:
+        transfer_latency.labels(direction, from_stage, stage).observe(reached_at - started_at)
+
+def record_relay_tx(stage, transfer_request_id, tx_hash):
+    # Stored as soon as the relay transaction is sent, from then on a failing handler keeps its claim in flight
+    get_transfer_store().set_relay_tx_hash(transfer_request_id, stage, HexBytes(tx_hash).hex())
+
+def record_stage(stage, event, direction, relay_tx_hash=None):
+    # Only queues the record, the journal's writer thread does the disk I/O
+    observe_transfer_latency(stage, event.args.transferRequestId)
+    get_transfer_journal().record(
+        stage,
+        event.args.transferRequestId,
+        direction=direction,
+        amount=event.args.amount,
+        tx_hash=Web3.to_hex(event.transactionHash),
+        block_number=event.blockNumber,
+        relay_tx_hash=Web3.to_hex(relay_tx_hash) if relay_tx_hash else None,
+    )
+
+def claim_stage(stage, event, direction):
+    # A single primary-key insert, False when this stage was already handled for the transfer
+    return get_transfer_store().claim(
+        event.args.transferRequestId,
+        stage,
+        direction=direction,
+        amount=event.args.amount,
+        tx_hash=Web3.to_hex(event.transactionHash),
+    )
+
+def release_stage(stage, event):
+    if not get_transfer_store().release(event.args.transferRequestId, stage):
+        print(f'[Relayer] Keeping {stage} claim for transfer request Id: {Web3.to_hex(event.args.transferRequestId)} in flight, its relay transaction was already sent')
+
+def complete_stage(stage, event):
+    get_transfer_store().complete(event.args.transferRequestId, stage)
+
+def once_per_transfer(stage, direction):
+    """
+    Makes an event handler idempotent per (transferRequestId, stage): the stage
+    is claimed in the transfer store before the handler runs, so a replayed or
+    duplicate event is skipped. The claim stays in flight until the handler
+    returns, with the relay transaction hash stored by record_relay_tx right
+    after sending. If the handler fails before sending, the claim is released
+    and the event is handled again when the relayer fetches its block again;
+    if it fails after sending, the claim stays in flight so the event is not
+    relayed twice. Claims left in flight are settled by reconcile_claims on the
+    next start. Works for both plain and coroutine handlers.
+    """
+    def decorator(handler):
+        def skip(event):
+            print(f'[Relayer] Skipping duplicate {event.event} event for transfer request Id: {Web3.to_hex(event.args.transferRequestId)}')
+
+        latency = handler_latency.labels(handler.__name__)
+
+        if asyncio.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def async_wrapper(event, logger=None):
+                # The transfer store is synchronous SQLite, so it is used off the event loop
+                if not await asyncio.to_thread(claim_stage, stage, event, direction):
+                    return skip(event)
+                started = time.perf_counter()
+                try:
+                    result = await handler(event, logger)
+                except BaseException:
+                    await asyncio.to_thread(release_stage, stage, event)
+                    raise
+                finally:
+                    latency.observe(time.perf_counter() - started)
+                await asyncio.to_thread(complete_stage, stage, event)
+                return result
+            return async_wrapper
+
+        @functools.wraps(handler)
+        def wrapper(event, logger=None):
+            if not claim_stage(stage, event, direction):
+                return skip(event)
+            started = time.perf_counter()
+            try:
+                result = handler(event, logger)
+            except BaseException:
+                release_stage(stage, event)
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
+            complete_stage(stage, event)
+            return result
+        return wrapper
+    return decorator
+
+def reconcile_claims():
+    """
+    Settles the claims a crash left in flight. A claim without a relay
+    transaction never sent one, so it is released and the event is handled
+    again once its block is fetched. A claim with one only missed its
+    completion: it is completed and its transaction watched again.
+    """
+    store = get_transfer_store()
+    for claim in store.in_flight():
+        if claim['relay_tx_hash'] is None:
+            print(f"[Relayer] Releasing unfinished {claim['stage']} claim for transfer request Id: 0x{claim['transfer_request_id']}")
+            store.release(claim['transfer_request_id'], claim['stage'])
+            continue
+        store.complete(claim['transfer_request_id'], claim['stage'])
+        chain_name = RELAY_CHAINS.get(claim['stage'])
+        if chain_name:
+            print(f"[Relayer] Watching relay transaction {claim['relay_tx_hash']} of unfinished {claim['stage']} claim for transfer request Id: 0x{claim['transfer_request_id']}")
+            watch_transaction(web3_eth if chain_name == 'ethereum' else web3_bsc, chain_name, claim['relay_tx_hash'], f"Recovered {claim['stage']}")
+
+def report_transaction_outcome(future, chain_name, description, tx_hash, sent_at):
+    if future.exception() is not None:
+        relay_transactions.labels(chain_name, description, 'timeout').inc()
+        return  # Already reported by the tracker's stuck-transaction hook
+    receipt = future.result()
+    relay_confirmation_latency.labels(chain_name).observe(time.monotonic() - sent_at)
+    relay_transactions.labels(chain_name, description, 'success' if receipt.status else 'reverted').inc()
+    relay_gas_used.labels(chain_name, description).inc(receipt.gasUsed)
+    relay_fee_paid.labels(chain_name, description).inc(receipt.gasUsed * receipt.get('effectiveGasPrice', 0))
+    if receipt.status == 0:
+        print(f'[Relayer] {description} transaction reverted. TxHash: {tx_hash}')
+
+def read_batcher(web3_instance, chain_name):
+    # Reads issued together on a chain go out in one round trip
+    return get_read_batcher(web3_instance, node_url(chain_name), chain_name)
+
+def watch_transaction(web3_instance, chain_name, tx_hash, description):
+    # Receipts of all in-flight transactions are polled together, nothing blocks on this one.
+    # Hashes come back from send_transaction as bytes, and from the transfer store as hex strings
+    tx_hash = HexBytes(tx_hash).hex()
+    sent_at = time.monotonic()
+    tracker = get_receipt_tracker(web3_instance, node_url(chain_name), chain_name)
+    queue_depth.labels(queue=f'pending_transactions_{chain_name}').set_function(tracker.pending_count)
+    future = tracker.track(tx_hash)
+    future.add_done_callback(lambda f: report_transaction_outcome(f, chain_name, description, tx_hash, sent_at))
+    return future
+
+def withdraw_fee(contract_instance,web3_instance,chain_name, method_name, address, private_key,feetype):
+    withdraw_fee_tx_hash = send_transaction(web3_instance, chain_name, contract_instance.functions[method_name](), {
         'from': address,
-        'nonce': web3_instance.eth.getTransactionCount(address),
         'gas': 100000,  # Adjust gas as needed for the withdraw transaction
-        'gasPrice': web3_instance.toWei('5', 'gwei')
-    })
-
-    signed_withdraw_fee_tx = web3_instance.eth.account.sign_transaction(withdraw_fee_tx, private_key=private_key)
-    withdraw_fee_tx_hash = web3_instance.eth.sendRawTransaction(signed_withdraw_fee_tx.rawTransaction)
-    print(f'[Relayer] Withdrew {feetype} Fee to {address}. TxHash: {web3_instance.toHex(withdraw_fee_tx_hash)}')
-    # Wait for the withdraw transaction to be mined
-    web3_instance.eth.waitForTransactionReceipt(withdraw_fee_tx_hash)
+        **get_gas_oracle(web3_instance, chain_name).tx_params()
+    }, private_key)
+    print(f'[Relayer] Withdrew {feetype} Fee to {address}. TxHash: {web3_instance.to_hex(withdraw_fee_tx_hash)}')
+    watch_transaction(web3_instance, chain_name, withdraw_fee_tx_hash, f'{feetype} fee withdrawal')
+    return withdraw_fee_tx_hash
+
+def sweep_fees():
+    with pending_fee_withdrawals_lock:
+        owed = dict(pending_fee_withdrawals)
+        for feetype in pending_fee_withdrawals:
+            pending_fee_withdrawals[feetype] = 0
+
+    # Every balance and fee read of the sweep is issued up front, so each chain answers them in one round trip.
+    # Mint and Coordinator fees are paid out of the same BEP20 contract balance
+    targets = {feetype: target for feetype, target in fee_withdrawal_targets().items() if owed[feetype] > 0}
+    balance_reads = {}
+    fee_reads = {}
+    for feetype, (contract, web3_instance, chain_name, method_name, fee_getter, address, private_key) in targets.items():
+        reads = read_batcher(web3_instance, chain_name)
+        if contract.address not in balance_reads:
+            balance_reads[contract.address] = reads.get_balance(contract.address)
+        fee_reads[feetype] = reads.call(contract.functions[fee_getter]())
+    balances = {contract_address: balance.result() for contract_address, balance in balance_reads.items()}
+
+    for feetype, (contract, web3_instance, chain_name, method_name, fee_getter, address, private_key) in targets.items():
+        fee = fee_reads[feetype].result()
+        # withdrawReleaseFee pays out the whole balance, the other withdraw methods pay out a single fee per call
+        calls = 1 if feetype == 'Release' else owed[feetype]
+        if fee > 0:
+            calls = min(calls, balances[contract.address] // fee)
+        sent = 0
+        try:
+            # Nonces are allocated locally, so the withdrawals are pipelined without waiting for each receipt
+            for _ in range(calls):
+                withdraw_fee(contract, web3_instance, chain_name, method_name, address, private_key, feetype)
+                sent += 1
+        except Exception as e:
+            print(f'[Relayer] Error withdrawing {feetype} fees: {e}')
+        balances[contract.address] -= fee * sent
+        if feetype != 'Release' and sent < owed[feetype]:
+            # Carry over what could not be withdrawn to the next sweep
+            with pending_fee_withdrawals_lock:
+                pending_fee_withdrawals[feetype] += owed[feetype] - sent
+
+def run_fee_sweeper(interval=FEE_SWEEP_INTERVAL):
+    """
+    Withdraws collected fees in bulk, every interval seconds or as soon as
+    FEE_SWEEP_THRESHOLD withdrawals of one fee type are owed, so relaying a
+    transfer only needs the one transaction that moves it forward.
+    """
+    while not stop_flag.is_set():
+        fee_sweep_requested.wait(interval)
+        fee_sweep_requested.clear()
+        if stop_flag.is_set():
+            break
+        try:
+            sweep_fees()
+        except Exception as e:
+            print(f'[Relayer] Error sweeping fees: {e}')
 
 def mint_tokens_on_bsc(userAddressOnBinanceChain, amount,fromUserAddressOnEthereumChain,transferRequestId):
-    
-    withdraw_fee(bep20_contract,web3_bsc,'withdrawMintFee',BSC_CONTRACT_OWNER_ADDRESS,BSC_CONTRACT_OWNER_PRIVATE_KEY,'Mint')
-    
-    tx = bep20_contract.functions.mint(userAddressOnBinanceChain, amount,fromUserAddressOnEthereumChain,transferRequestId).buildTransaction({
+    tx_hash = send_transaction(web3_bsc, 'bsc', bep20_contract.functions.mint(userAddressOnBinanceChain, amount,fromUserAddressOnEthereumChain,transferRequestId), {
         'from': BSC_CONTRACT_OWNER_ADDRESS,
-        'nonce': web3_bsc.eth.getTransactionCount(BSC_CONTRACT_OWNER_ADDRESS),
         'gas': 2000000,
-        'gasPrice': web3_bsc.toWei('5', 'gwei')
-    })
-
-    signed_tx = web3_bsc.eth.account.sign_transaction(tx, private_key=BSC_CONTRACT_OWNER_PRIVATE_KEY)
-    tx_hash = web3_bsc.eth.sendRawTransaction(signed_tx.rawTransaction)
-    print(f'[Relayer] Created Transaction for Minting {amount} tokens for {userAddressOnBinanceChain} on BSC. TxHash: {web3_bsc.toHex(tx_hash)}')
+        **bsc_gas_oracle.tx_params()
+    }, BSC_CONTRACT_OWNER_PRIVATE_KEY)
+    record_relay_tx(STAGE_LOCKED, transferRequestId, tx_hash)
+    print(f'[Relayer] Created Transaction for Minting {amount} tokens for {userAddressOnBinanceChain} on BSC. TxHash: {web3_bsc.to_hex(tx_hash)}')
+    watch_transaction(web3_bsc, 'bsc', tx_hash, 'Mint')
+    record_fee_owed('Mint')
+    return tx_hash
 
 def unlock_tokens_on_ethereum(tokenAddressOfTokenToRelease,userAddressOnEthereumChain, amount,fromUserAddressOnBinanceChain,transferRequestId):
-
-    withdraw_fee(erc20_lock_contract,web3_eth,'withdrawReleaseFee',ETH_CONTRACT_OWNER_ADDRESS,ETH_CONTRACT_OWNER_PRIVATE_KEY,'Release')
-    
-    tx = erc20_lock_contract.functions.releaseTokens(tokenAddressOfTokenToRelease,userAddressOnEthereumChain, amount,fromUserAddressOnBinanceChain,transferRequestId).buildTransaction({
+    tx_hash = send_transaction(web3_eth, 'ethereum', erc20_lock_contract.functions.releaseTokens(tokenAddressOfTokenToRelease,userAddressOnEthereumChain, amount,fromUserAddressOnBinanceChain,transferRequestId), {
         'from': ETH_CONTRACT_OWNER_ADDRESS,
-        'nonce': web3_eth.eth.getTransactionCount(ETH_CONTRACT_OWNER_ADDRESS),
         'gas': 2000000,
-        'gasPrice': web3_eth.toWei('20', 'gwei')
-    })
-
-    signed_tx = web3_eth.eth.account.sign_transaction(tx, private_key=ETH_CONTRACT_OWNER_PRIVATE_KEY)
-    tx_hash = web3_eth.eth.sendRawTransaction(signed_tx.rawTransaction)
-    print(f'[Relayer] Created Transaction for Unlocking {amount} tokens for {userAddressOnEthereumChain} on Ethereum. TxHash: {web3_eth.toHex(tx_hash)}')
+        **eth_gas_oracle.tx_params()
+    }, ETH_CONTRACT_OWNER_PRIVATE_KEY)
+    record_relay_tx(STAGE_BURN_INITIATED, transferRequestId, tx_hash)
+    print(f'[Relayer] Created Transaction for Unlocking {amount} tokens for {userAddressOnEthereumChain} on Ethereum. TxHash: {web3_eth.to_hex(tx_hash)}')
+    watch_transaction(web3_eth, 'ethereum', tx_hash, 'Release tokens')
+    record_fee_owed('Release')
+    return tx_hash
 
 def initiateBurnAndRelease(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId):
-    
-    withdraw_fee(bep20_contract,web3_bsc,'withdrawCoordinatorFees',BSC_CONTRACT_OWNER_ADDRESS,BSC_CONTRACT_OWNER_PRIVATE_KEY,'Coordinator')
-
-    tx = burnAndReleaseContract.functions.initateBurnAndRelease(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId).buildTransaction({
+    tx_hash = send_transaction(web3_bsc, 'bsc', burnAndReleaseContract.functions.initateBurnAndRelease(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId), {
         'from': BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS,
-        'nonce': web3_bsc.eth.getTransactionCount(BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS),
         'gas': 2000000,
-        'gasPrice': web3_bsc.toWei('20', 'gwei')
-    })
-
-    signed_tx = web3_bsc.eth.account.sign_transaction(tx, private_key=BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY)
-    tx_hash = web3_bsc.eth.sendRawTransaction(signed_tx.rawTransaction)
-    print(f'[Relayer] Created Transaction for Initiating Burn of {amount} tokens for {fromUserAddressOnBinanceChain} on Binance. TxHash: {web3_bsc.toHex(tx_hash)}')
+        **bsc_gas_oracle.tx_params()
+    }, BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY)
+    record_relay_tx(STAGE_TRANSFER_INITIATED, transferRequestId, tx_hash)
+    print(f'[Relayer] Created Transaction for Initiating Burn of {amount} tokens for {fromUserAddressOnBinanceChain} on Binance. TxHash: {web3_bsc.to_hex(tx_hash)}')
+    watch_transaction(web3_bsc, 'bsc', tx_hash, 'Initiate burn and release')
+    record_fee_owed('Coordinator')
+    return tx_hash
 
 def releaseCompleted(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId):
-    withdraw_fee(bep20_contract,web3_bsc,'withdrawCoordinatorFees',BSC_CONTRACT_OWNER_ADDRESS,BSC_CONTRACT_OWNER_PRIVATE_KEY,'Coordinator')
-    
-    tx = burnAndReleaseContract.functions.releaseCompleted(tokenAddress,toUserAddressOnEthereumChain,amount,fromUserAddressOnBinanceChain,transferRequestId).buildTransaction({
+    tx_hash = send_transaction(web3_bsc, 'bsc', burnAndReleaseContract.functions.releaseCompleted(tokenAddress,toUserAddressOnEthereumChain,amount,fromUserAddressOnBinanceChain,transferRequestId), {
         'from': BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS,
-        'nonce': web3_bsc.eth.getTransactionCount(BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS),
         'gas': 2000000,
-        'gasPrice': web3_bsc.toWei('20', 'gwei')
-    })
-
-    signed_tx = web3_bsc.eth.account.sign_transaction(tx, private_key=BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY)
-    tx_hash = web3_bsc.eth.sendRawTransaction(signed_tx.rawTransaction)
-    print(f'[Relayer] Created Transaction for Release completion of {amount} tokens for {toUserAddressOnEthereumChain} on Ethereum. TxHash: {web3_bsc.toHex(tx_hash)}')
+        **bsc_gas_oracle.tx_params()
+    }, BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY)
+    record_relay_tx(STAGE_RELEASED, transferRequestId, tx_hash)
+    print(f'[Relayer] Created Transaction for Release completion of {amount} tokens for {toUserAddressOnEthereumChain} on Ethereum. TxHash: {web3_bsc.to_hex(tx_hash)}')
+    watch_transaction(web3_bsc, 'bsc', tx_hash, 'Release completed')
+    record_fee_owed('Coordinator')
+    return tx_hash
 
 def releaseFailed(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId):
-    withdraw_fee(bep20_contract,web3_bsc,'withdrawCoordinatorFees',BSC_CONTRACT_OWNER_ADDRESS,BSC_CONTRACT_OWNER_PRIVATE_KEY,'Coordinator')
-    
-    tx = burnAndReleaseContract.functions.releaseFailed(tokenAddress,toUserAddressOnEthereumChain,amount,fromUserAddressOnBinanceChain,transferRequestId).buildTransaction({
+    tx_hash = send_transaction(web3_bsc, 'bsc', burnAndReleaseContract.functions.releaseFailed(tokenAddress,toUserAddressOnEthereumChain,amount,fromUserAddressOnBinanceChain,transferRequestId), {
         'from': BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS,
-        'nonce': web3_bsc.eth.getTransactionCount(BURN_AND_RELEASE_COORDINATOR_CONTRACT_OWNER_ADDRESS),
         'gas': 2000000,
-        'gasPrice': web3_bsc.toWei('20', 'gwei')
-    })
-
-    signed_tx = web3_bsc.eth.account.sign_transaction(tx, private_key=BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY)
-    tx_hash = web3_bsc.eth.sendRawTransaction(signed_tx.rawTransaction)
-    print(f'[Relayer] Created Transaction for Release Failure of {amount} tokens for {toUserAddressOnEthereumChain} on Ethereum. TxHash: {web3_bsc.toHex(tx_hash)}')
-
-
-def listen_and_relay(logger=None):
-    while True:
-        # Listen for TokensLocked event on Ethereum
-        event_filter_eth = erc20_lock_contract.events.TokensLocked.createFilter(fromBlock='latest')
-        events_eth = event_filter_eth.get_new_entries()
-        
-        for event in events_eth:
-            fromUserAddressOnEthereumChain = event.args.fromUserAddressOnEthereumChain
-            amount = event.args.amount
-            toUserAddressOnBinanceChain= event.args.toUserAddressOnBinanceChain
-            transferRequestId=event.args.transferRequestId
-            print(f'[Relayer] TokensLocked event detected: {fromUserAddressOnEthereumChain} locked {amount}')
-            mint_tokens_on_bsc(toUserAddressOnBinanceChain, amount,fromUserAddressOnEthereumChain,transferRequestId)
-        # Listen for TokensReleased event on Ethereum
-        event_filter_eth_released = erc20_lock_contract.events.TokensReleased.createFilter(fromBlock='latest')
-        events_eth_released = event_filter_eth_released.get_new_entries()
-
-        for event in events_eth_released:
-            toUserAddressOnEthereumChain = event.args.toUserAddressOnEthereumChain
-            amount = event.args.amount
-            tokenAddress=event.args.tokenAddress
-            fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
-            transferRequestId=event.args.transferRequestId
-            print(f'[Relayer] TokensReleased event detected: {toUserAddressOnEthereumChain} released {amount}')
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            releaseCompleted(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId)
-        
-        event_filter_eth_TransferFailed = erc20_lock_contract.events.TokenReleaseFailed.createFilter(fromBlock='latest')
-        events_eth_Failed = event_filter_eth_TransferFailed.get_new_entries()
-
-        for event in events_eth_Failed:
-            toUserAddressOnEthereumChain = event.args.toUserAddressOnEthereumChain
-            amount = event.args.amount
-            tokenAddress=event.args.tokenAddress
-            fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
-            transferRequestId=event.args.transferRequestId
-            print(f'[Relayer] TokenReleaseFailed event detected')
-            releaseFailed(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId)
-            
-
-        # Listen for Transfer events on BSC
-        event_filter_bsc = bep20_contract.events.TokensMinted.createFilter(fromBlock='latest')
-        events_bsc = event_filter_bsc.get_new_entries()
-
-        for event in events_bsc:
-            from_address = event.args.fromUserAddresOnEthereumChain
-            to_address = event.args.toUserAddressOnBinanceChain
-            amount = event.args.amount
-            transferRequestId=event.args.transferRequestId
-            # This indicates minting (tokens are created and sent to the 'to' address)
-            print(f'[Relayer] TokensMinted event detected: {to_address} received {amount} Tokens')
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            while not acquire_lock():
-                print('Lock is held by another process. Retrying...')
-                time.sleep(1)
-            logger.info(f'[Relayer] Transfer of {amount} tokens from Ethereum Address {from_address} to Binance Addres {to_address} completed at [{timestamp}] for the transfer request Id: {transferRequestId}')
-            release_lock()
-            print(f'[Relayer] Transfer of {amount} tokens from Ethereum Address {from_address} to Binance Addres {to_address} completed at [{timestamp}] for the transfer request Id: {transferRequestId}')
-            # Optionally, handle minting logic if needed
-            
-        event_filter_bsc = bep20_contract.events.TokensTransferInitiated.createFilter(fromBlock='latest')
-        events_bsc = event_filter_bsc.get_new_entries()
-        
-        for event in events_bsc:
-            fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
-            toUserAddressOnEthereumChain= event.args.toUserAddressOnEthereumChain
-            amount = event.args.amount
-            tokenAddress=event.args.tokenAddress
-            transferRequestId=event.args.transferRequestId
-            # This indicates minting (tokens are created and sent to the 'to' address)
-            print(f'[Relayer] TokensTransferInitiated event detected')
-            initiateBurnAndRelease(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId)
-
-        event_filter_bsc = burnAndReleaseContract.events.BurnInitiated.createFilter(fromBlock='latest')
-        events_bsc = event_filter_bsc.get_new_entries()
-
-        for event in events_bsc:
-            fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
-            toUserAddressOnEthereumChain = event.args.toUserAddressOnEthereumChain
-            amount = event.args.amount
-            tokenAddress = event.args.tokenAddress
-            transferRequestId=event.args.transferRequestId
-            # This indicates minting (tokens are created and sent to the 'to' address)
-            print(f'[Relayer] TokensBurnInitiated event detected')
-            unlock_tokens_on_ethereum(tokenAddress,toUserAddressOnEthereumChain, amount,fromUserAddressOnBinanceChain,transferRequestId)
-            
-        event_filter_bsc = burnAndReleaseContract.events.TransferCompleted.createFilter(fromBlock='latest')
-        events_bsc = event_filter_bsc.get_new_entries()
-    
-        for event in events_bsc:
-            fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
-            toUserAddressOnEthereumChain = event.args.toUserAddressOnEthereumChain
-            amount = event.args.amount
-            tokenAddress = event.args.tokenAddress
-            transferRequestId=event.args.transferRequestId
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            # This indicates minting (tokens are created and sent to the 'to' address)
-            print(f'[Relayer] TransferCompleted event detected')
-            while not acquire_lock():
-                print('Lock is held by another process. Retrying...')
-                time.sleep(1)
-            logger.info(f'[Relayer] Transfer of {amount} tokens from Binance Address {fromUserAddressOnBinanceChain} to Ethereum Address {toUserAddressOnEthereumChain} into {tokenAddress} token completed at [{timestamp}] for the transfer request Id: {transferRequestId}')
-            release_lock()
-            print(f'[Relayer] Transfer of {amount} tokens from Binance Address {fromUserAddressOnBinanceChain} to Ethereum Address {toUserAddressOnEthereumChain} into {tokenAddress} token completed at [{timestamp}] for the transfer request Id: {transferRequestId}')
-            
-        event_filter_bsc = burnAndReleaseContract.events.ReturnedTokens.createFilter(fromBlock='latest')
-        events_bsc = event_filter_bsc.get_new_entries()
-    
-        for event in events_bsc:
-            toUserAddressOnBinanceChain = event.args.toUserAddressOnBinanceChain
-            amount = event.args.amount
-            transferRequestId=event.args.transferRequestId
-            # This indicates minting (tokens are created and sent to the 'to' address)
-            print(f'[Relayer] ReturnedTokens event detected')
-            print(f'[Relayer] {amount} tokens Returned to {toUserAddressOnBinanceChain}')
+        **bsc_gas_oracle.tx_params()
+    }, BURN_AND_RELEASE_COORDINATOR_CONTRACT_PRIVATE_KEY)
+    record_relay_tx(STAGE_RELEASE_FAILED, transferRequestId, tx_hash)
+    print(f'[Relayer] Created Transaction for Release Failure of {amount} tokens for {toUserAddressOnEthereumChain} on Ethereum. TxHash: {web3_bsc.to_hex(tx_hash)}')
+    watch_transaction(web3_bsc, 'bsc', tx_hash, 'Release failed')
+    record_fee_owed('Coordinator')
+    return tx_hash
+
+
+@once_per_transfer(STAGE_LOCKED, 'eth_to_bsc')
+def handle_tokens_locked(event, logger=None):
+    fromUserAddressOnEthereumChain = event.args.fromUserAddressOnEthereumChain
+    amount = event.args.amount
+    toUserAddressOnBinanceChain= event.args.toUserAddressOnBinanceChain
+    transferRequestId=event.args.transferRequestId
+    print(f'[Relayer] TokensLocked event detected: {fromUserAddressOnEthereumChain} locked {amount}')
+    tx_hash = mint_tokens_on_bsc(toUserAddressOnBinanceChain, amount,fromUserAddressOnEthereumChain,transferRequestId)
+    record_stage(STAGE_LOCKED, event, 'eth_to_bsc', tx_hash)
+
+@once_per_transfer(STAGE_RELEASED, 'bsc_to_eth')
+def handle_tokens_released(event, logger=None):
+    toUserAddressOnEthereumChain = event.args.toUserAddressOnEthereumChain
+    amount = event.args.amount
+    tokenAddress=event.args.tokenAddress
+    fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
+    transferRequestId=event.args.transferRequestId
+    print(f'[Relayer] TokensReleased event detected: {toUserAddressOnEthereumChain} released {amount}')
+    tx_hash = releaseCompleted(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId)
+    record_stage(STAGE_RELEASED, event, 'bsc_to_eth', tx_hash)
+
+@once_per_transfer(STAGE_RELEASE_FAILED, 'bsc_to_eth')
+def handle_token_release_failed(event, logger=None):
+    toUserAddressOnEthereumChain = event.args.toUserAddressOnEthereumChain
+    amount = event.args.amount
+    tokenAddress=event.args.tokenAddress
+    fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
+    transferRequestId=event.args.transferRequestId
+    print('[Relayer] TokenReleaseFailed event detected')
+    tx_hash = releaseFailed(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId)
+    record_stage(STAGE_RELEASE_FAILED, event, 'bsc_to_eth', tx_hash)
+
+@once_per_transfer(STAGE_MINTED, 'eth_to_bsc')
+def handle_tokens_minted(event, logger=None):
+    from_address = event.args.fromUserAddresOnEthereumChain
+    to_address = event.args.toUserAddressOnBinanceChain
+    amount = event.args.amount
+    transferRequestId=event.args.transferRequestId
+    # This indicates minting (tokens are created and sent to the 'to' address)
+    print(f'[Relayer] TokensMinted event detected: {to_address} received {amount} Tokens')
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if logger:
+        logger.info(f'[Relayer] Transfer of {amount} tokens from Ethereum Address {from_address} to Binance Addres {to_address} completed at [{timestamp}] for the transfer request Id: {transferRequestId}')
+    print(f'[Relayer] Transfer of {amount} tokens from Ethereum Address {from_address} to Binance Addres {to_address} completed at [{timestamp}] for the transfer request Id: {transferRequestId}')
+    record_stage(STAGE_MINTED, event, 'eth_to_bsc')
+
+@once_per_transfer(STAGE_TRANSFER_INITIATED, 'bsc_to_eth')
+def handle_tokens_transfer_initiated(event, logger=None):
+    fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
+    toUserAddressOnEthereumChain= event.args.toUserAddressOnEthereumChain
+    amount = event.args.amount
+    tokenAddress=event.args.tokenAddress
+    transferRequestId=event.args.transferRequestId
+    print('[Relayer] TokensTransferInitiated event detected')
+    tx_hash = initiateBurnAndRelease(tokenAddress,fromUserAddressOnBinanceChain,amount,toUserAddressOnEthereumChain,transferRequestId)
+    record_stage(STAGE_TRANSFER_INITIATED, event, 'bsc_to_eth', tx_hash)
+
+@once_per_transfer(STAGE_BURN_INITIATED, 'bsc_to_eth')
+def handle_burn_initiated(event, logger=None):
+    fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
+    toUserAddressOnEthereumChain = event.args.toUserAddressOnEthereumChain
+    amount = event.args.amount
+    tokenAddress = event.args.tokenAddress
+    transferRequestId=event.args.transferRequestId
+    print('[Relayer] TokensBurnInitiated event detected')
+    tx_hash = unlock_tokens_on_ethereum(tokenAddress,toUserAddressOnEthereumChain, amount,fromUserAddressOnBinanceChain,transferRequestId)
+    record_stage(STAGE_BURN_INITIATED, event, 'bsc_to_eth', tx_hash)
+
+@once_per_transfer(STAGE_COMPLETED, 'bsc_to_eth')
+def handle_transfer_completed(event, logger=None):
+    fromUserAddressOnBinanceChain = event.args.fromUserAddressOnBinanceChain
+    toUserAddressOnEthereumChain = event.args.toUserAddressOnEthereumChain
+    amount = event.args.amount
+    tokenAddress = event.args.tokenAddress
+    transferRequestId=event.args.transferRequestId
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print('[Relayer] TransferCompleted event detected')
+    if logger:
+        logger.info(f'[Relayer] Transfer of {amount} tokens from Binance Address {fromUserAddressOnBinanceChain} to Ethereum Address {toUserAddressOnEthereumChain} into {tokenAddress} token completed at [{timestamp}] for the transfer request Id: {transferRequestId}')
+    print(f'[Relayer] Transfer of {amount} tokens from Binance Address {fromUserAddressOnBinanceChain} to Ethereum Address {toUserAddressOnEthereumChain} into {tokenAddress} token completed at [{timestamp}] for the transfer request Id: {transferRequestId}')
+    record_stage(STAGE_COMPLETED, event, 'bsc_to_eth')
+
+@once_per_transfer(STAGE_RETURNED, 'bsc_to_eth')
+def handle_returned_tokens(event, logger=None):
+    toUserAddressOnBinanceChain = event.args.toUserAddressOnBinanceChain
+    amount = event.args.amount
+    print('[Relayer] ReturnedTokens event detected')
+    print(f'[Relayer] {amount} tokens Returned to {toUserAddressOnBinanceChain}')
+    record_stage(STAGE_RETURNED, event, 'bsc_to_eth')
+
+def create_log_pollers():
+    # One poller per chain, each covering every contract and event the relayer reacts to
+    checkpoint = BlockCheckpoint(RELAYER_CHECKPOINT_FILE)
+    eth_poller = LogPoller(web3_eth, 'ethereum', checkpoint, LOGS_MAX_BLOCK_RANGE, LOGS_BACKFILL_WORKERS,
+                           LOGS_MIN_POLL_INTERVAL, LOGS_MAX_POLL_INTERVAL)
+    eth_poller.watch(erc20_lock_contract, 'TokensLocked', handle_tokens_locked)
+    eth_poller.watch(erc20_lock_contract, 'TokensReleased', handle_tokens_released)
+    eth_poller.watch(erc20_lock_contract, 'TokenReleaseFailed', handle_token_release_failed)
+
+    bsc_poller = LogPoller(web3_bsc, 'bsc', checkpoint, LOGS_MAX_BLOCK_RANGE, LOGS_BACKFILL_WORKERS,
+                           LOGS_MIN_POLL_INTERVAL, LOGS_MAX_POLL_INTERVAL)
+    bsc_poller.watch(bep20_contract, 'TokensMinted', handle_tokens_minted)
+    bsc_poller.watch(bep20_contract, 'TokensTransferInitiated', handle_tokens_transfer_initiated)
+    bsc_poller.watch(burnAndReleaseContract, 'BurnInitiated', handle_burn_initiated)
+    bsc_poller.watch(burnAndReleaseContract, 'TransferCompleted', handle_transfer_completed)
+    bsc_poller.watch(burnAndReleaseContract, 'ReturnedTokens', handle_returned_tokens)
+    return [eth_poller, bsc_poller]
+
+def listen_and_relay(logger=None, poll_interval=RELAYER_POLL_INTERVAL):
+    reconcile_claims()
+    pollers = create_log_pollers()
+    # Each chain is polled on its own schedule, following its block time
+    next_poll = {poller: 0 for poller in pollers}
+    while not stop_flag.is_set():
+        now = time.monotonic()
+        for poller in pollers:
+            if next_poll[poller] > now:
+                continue
+            try:
+                events = poller.poll()
+            except Exception as e:
+                print(f'[Relayer] Error fetching logs on {poller.chain_name}: {e}')
+                next_poll[poller] = time.monotonic() + poll_interval
+                continue
+            fetched_at = time.monotonic()
+            failed_block = None
+            for event, handler in events:
+                try:
+                    handler(event, logger)
+                    events_handled.labels(event.event, 'ok').inc()
+                except Exception as e:
+                    events_handled.labels(event.event, 'error').inc()
+                    print(f'[Relayer] Error handling {event.event} event: {e}')
+                    if failed_block is None:
+                        failed_block = event.blockNumber
+                # Includes the time spent on the events fetched before it in the same range
+                event_to_transaction_latency.labels(event.event).observe(time.monotonic() - fetched_at)
+            if failed_block is None:
+                poller.commit()
+                # No wait while a chain is still catching up after a restart
+                next_poll[poller] = time.monotonic() + poller.next_poll_delay()
+            else:
+                # The block of the first failed event is fetched again, events already handled in it are skipped as duplicates
+                poller.commit(failed_block - 1)
+                next_poll[poller] = time.monotonic() + poll_interval
+        stop_flag.wait(max(0, min(next_poll.values()) - time.monotonic()))
 
 if __name__ == '__main__':
     listen_and_relay(logger=None)
@@ -1,17 +1,31 @@
-import threading
 import signal
 import sys
 import logging
 import os
-from feeEstimator import poll_fee_updates
-from receiptGenerator import start_event_listeners
-from relayer import listen_and_relay
+from utils.journal import CompletionJournal
+from utils.lifecycle import Service, stop_flag
+from utils.supervisor import Supervisor, report_health, SUPERVISOR_HEALTH_INTERVAL
+from utils.metrics import gauge, start_metrics_server, METRICS_PORT
 
-# Global variables to hold the threads
-fee_thread = None
-receipt_thread = None
-relayer_thread = None
-stop_flag = threading.Event()
+# Services of this process, constructed by build_services() and started by start_services()
+services = []
+
+# 'threaded' runs the relayer loop on one thread, 'async' runs the asyncio relayer engine with concurrent handlers
+RELAYER_MODE = os.getenv('RELAYER_MODE', 'threaded')
+# 'poll' reprices fees every 600 seconds, 'block' reprices them on every new block and updates only outside a band
+FEE_UPDATE_MODE = os.getenv('FEE_UPDATE_MODE', 'poll')
+# Seconds stop_services() waits for each service to return before giving up on it
+SERVICE_STOP_TIMEOUT = float(os.getenv('SERVICE_STOP_TIMEOUT', '10'))
+# 'threads' runs every service in this process (for development), 'processes' runs each group below in its own
+# process under a supervisor that restarts crashed processes
+SERVICE_MODE = os.getenv('SERVICE_MODE', 'threads')
+
+# Services sharing a process in 'processes' mode. The fee sweeper withdraws the fees counted by the relayer in memory
+PROCESS_GROUPS = {
+    'FeeEstimator': ['FeeEstimator'],
+    'ReceiptGenerator': ['ReceiptGenerator'],
+    'Relayer': ['Relayer', 'FeeSweeper'],
+}
 
 def setup_logger(log_file=None):
     logger = logging.getLogger('Relayer')
@@ -28,39 +42,63 @@ def setup_logger(log_file=None):
         # Construct the full path to the log file
         log_file_path = os.path.join(current_dir, log_file)
         
-        # Ensure the log file exists
-        if not os.path.isfile(log_file_path):
-            with open(log_file_path, 'w'):  # Create the file
-                pass
-        
-        # Add the file handler
-        file_handler = logging.FileHandler(log_file_path)
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        # Completion records are group-committed by a dedicated writer thread, so logging never blocks relaying
+        journal_handler = CompletionJournal(
+            log_file_path,
+            fsync_policy=os.getenv('JOURNAL_FSYNC_POLICY', 'interval'),
+            fsync_interval=float(os.getenv('JOURNAL_FSYNC_INTERVAL', '1')),
+            use_flock=os.getenv('JOURNAL_FILE_LOCK', 'true').lower() == 'true',
+        )
+        journal_handler.setLevel(logging.INFO)
+        journal_handler.setFormatter(formatter)
+        logger.addHandler(journal_handler)
     else:
         return None
     return logger
 
+def build_services(logger=None):
+    # The service modules are imported here, so importing this module (and constructing services) stays cheap
+    from feeEstimator import poll_fee_updates, run_block_driven_fee_updates
+    from receiptGenerator import start_event_listeners
+    from receiptApi import stop_http_server
+    from relayer import listen_and_relay, run_fee_sweeper, fee_sweep_requested
+
+    if FEE_UPDATE_MODE == 'block':
+        fee_service = Service('FeeEstimator', run_block_driven_fee_updates)
+    else:
+        fee_service = Service('FeeEstimator', poll_fee_updates, (600,))
+
+    # The receipt API runs next to the listeners, with RECEIPT_API_WORKERS > 1 as a uvicorn process that has to be stopped too
+    receipt_service = Service('ReceiptGenerator', start_event_listeners, on_stop=stop_http_server)
+
+    if RELAYER_MODE == 'async':
+        from asyncRelayer import run_async_relayer
+        relayer_service = Service('Relayer', run_async_relayer, (logger,))
+    else:
+        relayer_service = Service('Relayer', listen_and_relay, (logger,))
+
+    # The relayer's fee sweeper withdraws collected fees in bulk off the relay path, it is woken up to stop
+    fee_sweeper_service = Service('FeeSweeper', run_fee_sweeper, on_stop=fee_sweep_requested.set)
+
+    return [fee_service, receipt_service, relayer_service, fee_sweeper_service]
+
 # Function to stop all services
 def stop_services():
     print("\nStopping services...")
-    # Signal the threads to stop
-    stop_flag.set()
-    # Implement any necessary cleanup or stop logic for each service here
-    if fee_thread:
-        fee_thread.do_run = False  # Assuming the threads are designed to check this flag
-    if receipt_thread:
-        receipt_thread.do_run = False
-    if relayer_thread:
-        relayer_thread.do_run = False
-    
-    # Optionally wait for threads to finish
-    if fee_thread:
-        fee_thread.join()
-    if receipt_thread:
-        receipt_thread.join()
-    
+    # Signal every service to stop, then wait for each of them to return
+    for service in services:
+        service.stop()
+    for service in services:
+        service.join(SERVICE_STOP_TIMEOUT)
+        if service.is_alive():
+            print(f"[Service] {service.name} did not stop within {SERVICE_STOP_TIMEOUT} seconds")
+
+    # Flush completion and stage records still queued in the journal writers
+    logging.shutdown()
+    if services:
+        from relayer import close_transfer_journal
+        close_transfer_journal()
+
     print("All services stopped.")
 
 # Function to handle the Ctrl+C signal (SIGINT)
@@ -69,22 +107,72 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 def start_services():
-    global fee_thread, receipt_thread, relayer_thread
-    
-    # Starting the feeEstimator Service in a new thread
-    fee_thread = threading.Thread(target=poll_fee_updates, args=(600,), daemon=True)
-    fee_thread.start()
+    start_metrics_server(METRICS_PORT)
+    logger = setup_logger(log_file='./transfers.log')
+    services[:] = build_services(logger)
+    for service in services:
+        service.start()
 
-    # Starting receiptGenerator Service in a new thread
-    receipt_thread = threading.Thread(target=start_event_listeners, daemon=True)
-    receipt_thread.start()
+def run_service_group(group_name, health_queue):
+    """Entry point of a service process in 'processes' mode, runs until SIGTERM or until one of its services dies."""
+    # Ctrl+C reaches every process of the terminal, only the supervisor acts on it and stops the others with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda sig, frame: stop_flag.set())
 
-    logger = setup_logger(log_file='./transfers.log')
-    # Starting relayer Service in a new thread
-    relayer_thread = threading.Thread(target=lambda: listen_and_relay(logger), daemon=True)
-    relayer_thread.start()
+    names = PROCESS_GROUPS[group_name]
+    # The supervisor serves on METRICS_PORT, each service process on its own port after it
+    if METRICS_PORT > 0:
+        start_metrics_server(METRICS_PORT + 1 + list(PROCESS_GROUPS).index(group_name))
+    logger = setup_logger(log_file='./transfers.log') if 'Relayer' in names else None
+    services[:] = [service for service in build_services(logger) if service.name in names]
+    for service in services:
+        service.start()
+
+    while not stop_flag.is_set():
+        alive = [service.name for service in services if service.is_alive()]
+        if len(alive) < len(services):
+            # Exiting with an error lets the supervisor restart the whole group with a clean state
+            print(f"[Service] {group_name}: {', '.join(set(names) - set(alive))} stopped unexpectedly")
+            stop_services()
+            sys.exit(1)
+        report_health(health_queue, group_name, services=alive)
+        stop_flag.wait(SUPERVISOR_HEALTH_INTERVAL)
+    stop_services()
+
+def start_supervisor():
+    supervisor = Supervisor()
+    for group_name in PROCESS_GROUPS:
+        supervisor.add(group_name, run_service_group)
+    supervisor.start()
+
+    # Health of the service processes, as seen by the supervisor
+    service_up = gauge('oracle_service_up', 'Whether the process of a service group is running', ('service',))
+    service_restarts = gauge('oracle_service_restarts', 'Restarts of the process of a service group', ('service',))
+    service_report_age = gauge('oracle_service_health_report_age_seconds', 'Seconds since a service group last reported its health', ('service',))
+    for group_name in PROCESS_GROUPS:
+        service_up.labels(group_name).set_function(lambda name=group_name: int(supervisor.health()[name]['alive']))
+        service_restarts.labels(group_name).set_function(lambda name=group_name: supervisor.health()[name]['restarts'])
+        service_report_age.labels(group_name).set_function(lambda name=group_name: supervisor.health()[name]['last_report_age'] or 0)
+    start_metrics_server(METRICS_PORT)
+    return supervisor
 
 if __name__ == "__main__":
+    if SERVICE_MODE == 'processes':
+        supervisor = start_supervisor()
+
+        def stop_supervisor(sig, frame):
+            print("\nStopping services...")
+            supervisor.stop()
+            print("All services stopped.")
+            sys.exit(0)
+
+        signal.signal(signal.SIGINT, stop_supervisor)
+        signal.signal(signal.SIGTERM, stop_supervisor)
+        print("Services are running in separate processes. Press Ctrl+C to stop.")
+        # The supervisor's own thread restarts and health-checks the service processes
+        while True:
+            stop_flag.wait(1)
+
     # Set up the signal handler to catch Ctrl+C
     signal.signal(signal.SIGINT, signal_handler)
 
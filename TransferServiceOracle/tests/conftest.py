@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Service modules import each other as top-level modules (relayer, utils.x), the way service.py runs them
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('web3')
+pytest.importorskip('dotenv')
+
+import asyncRelayer
+from utils.lifecycle import stop_flag
+
+
+class FakePoller:
+    chain_name = 'ethereum'
+
+    def __init__(self, events):
+        self.events = events
+        self.commits = []
+
+    async def poll(self):
+        return self.events
+
+    def commit(self, up_to=None):
+        self.commits.append(up_to)
+        # One range is enough for the test
+        stop_flag.set()
+
+    def next_poll_delay(self):
+        return 0
+
+
+@pytest.fixture(autouse=True)
+def clear_stop_flag():
+    stop_flag.clear()
+    yield
+    stop_flag.clear()
+
+
+def run_ingest(events):
+    async def run():
+        engine = asyncRelayer.AsyncRelayer(poll_interval=0)
+        engine.queues['TokensLocked'] = asyncio.Queue()
+        workers = [asyncio.create_task(engine.handle_events('TokensLocked')) for _ in range(3)]
+        poller = FakePoller(events)
+        await engine.ingest(poller, ['TokensLocked'])
+        for worker in workers:
+            worker.cancel()
+        return poller
+
+    return asyncio.run(run())
+
+
+def make_event(block_number):
+    return SimpleNamespace(event='TokensLocked', blockNumber=block_number)
+
+
+def test_range_is_committed_once_every_event_is_handled():
+    handled = []
+
+    async def handler(event, logger=None):
+        handled.append(event.blockNumber)
+
+    poller = run_ingest([(make_event(block), handler) for block in (5, 6, 7)])
+    assert sorted(handled) == [5, 6, 7]
+    assert poller.commits == [None]
+
+
+def test_commit_stops_before_the_earliest_failed_block():
+    async def handler(event, logger=None):
+        # The later failure finishes first, the earliest one still bounds the commit
+        await asyncio.sleep(0.01 if event.blockNumber == 6 else 0)
+        if event.blockNumber in (6, 8):
+            raise RuntimeError('node unavailable')
+
+    poller = run_ingest([(make_event(block), handler) for block in (5, 6, 7, 8)])
+    assert poller.commits == [5]
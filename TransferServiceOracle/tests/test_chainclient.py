@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('web3')
+
+import aiohttp
+import requests
+from utils import chainclient
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(chainclient, 'backoff_delay', lambda attempt, base=None: 0)
+
+
+def flaky(errors, result=None):
+    calls = []
+
+    def make_request(method, params):
+        calls.append(method)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result or {'result': '0x1'}
+    return make_request, calls
+
+
+def test_transient_errors_are_retried():
+    make_request, calls = flaky([requests.exceptions.ConnectionError(), requests.exceptions.Timeout()])
+    assert chainclient.retry_middleware(make_request, None)('eth_blockNumber', []) == {'result': '0x1'}
+    assert len(calls) == 3
+
+
+def test_sends_are_never_retried():
+    make_request, calls = flaky([requests.exceptions.ConnectionError()])
+    with pytest.raises(requests.exceptions.ConnectionError):
+        chainclient.retry_middleware(make_request, None)('eth_sendRawTransaction', ['0x'])
+    assert len(calls) == 1
+
+
+def test_async_transient_errors_are_retried():
+    calls = []
+
+    async def make_request(method, params):
+        calls.append(method)
+        if len(calls) == 1:
+            raise aiohttp.ClientConnectionError()
+        if len(calls) == 2:
+            raise asyncio.TimeoutError()
+        return {'result': '0x1'}
+
+    async def run():
+        middleware = await chainclient.async_retry_middleware(make_request, None)
+        return await middleware('eth_getLogs', [{}])
+
+    assert asyncio.run(run()) == {'result': '0x1'}
+    assert len(calls) == 3
+
+
+def test_async_sends_are_never_retried():
+    calls = []
+
+    async def make_request(method, params):
+        calls.append(method)
+        raise aiohttp.ClientConnectionError()
+
+    async def run():
+        middleware = await chainclient.async_retry_middleware(make_request, None)
+        return await middleware('eth_sendRawTransaction', ['0x'])
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        asyncio.run(run())
+    assert len(calls) == 1
+
+
+def test_only_server_side_http_errors_are_transient():
+    def response_error(status):
+        return aiohttp.ClientResponseError(None, (), status=status)
+
+    assert chainclient.is_transient(response_error(503))
+    assert chainclient.is_transient(response_error(429))
+    assert not chainclient.is_transient(response_error(400))
+    assert not chainclient.is_transient(ValueError('execution reverted'))
+
+
+def test_async_sessions_are_pooled_per_loop():
+    async def sessions():
+        first = chainclient.async_http_session('http://node')
+        second = chainclient.async_http_session('http://node')
+        limit = first.connector.limit
+        await first.close()
+        return first is second, limit
+
+    assert asyncio.run(sessions()) == (True, chainclient.RPC_POOL_SIZE)
+
+
+def test_lazy_builds_on_first_use():
+    built = []
+
+    def factory(name):
+        built.append(name)
+        return type('Target', (), {'name': name})()
+
+    proxy = chainclient.lazy(factory, 'ethereum')
+    assert built == []
+    assert proxy.name == 'ethereum'
+    assert proxy.name == 'ethereum'
+    assert built == ['ethereum']
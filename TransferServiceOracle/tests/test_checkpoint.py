@@ -0,0 +1,27 @@
+import json
+
+from utils.checkpoint import BlockCheckpoint
+
+
+def test_saved_blocks_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    checkpoint = BlockCheckpoint(path)
+    checkpoint.save('ethereum', 120)
+    checkpoint.save('bsc', 77)
+    resumed = BlockCheckpoint(path)
+    assert resumed.load('ethereum') == 120
+    assert resumed.load('bsc') == 77
+    assert resumed.load('polygon') is None
+
+
+def test_save_leaves_no_temporary_file(tmp_path):
+    path = tmp_path / 'checkpoint.json'
+    BlockCheckpoint(str(path)).save('ethereum', 5)
+    assert json.loads(path.read_text()) == {'ethereum': 5}
+    assert not (tmp_path / 'checkpoint.json.tmp').exists()
+
+
+def test_unreadable_checkpoint_starts_empty(tmp_path):
+    path = tmp_path / 'checkpoint.json'
+    path.write_text('{"ethereum": 1')
+    assert BlockCheckpoint(str(path)).load('ethereum') is None
@@ -0,0 +1,85 @@
+import pytest
+
+pytest.importorskip('web3')
+pytest.importorskip('dotenv')
+
+from types import SimpleNamespace
+
+from web3 import Web3
+
+import feeEstimator
+from feeEstimator import BlockFeeUpdater
+
+OWNER = Web3.to_checksum_address('0x' + '22' * 20)
+
+
+class FakeReads:
+    """Stands in for a chain's read batcher, answering fee reads with the fee on chain."""
+
+    def __init__(self, fee):
+        self.fee = fee
+        self.calls = []
+
+    def call(self, function_call):
+        self.calls.append(function_call)
+        return SimpleNamespace(result=lambda: self.fee)
+
+
+@pytest.fixture
+def updater(monkeypatch):
+    now = [1000.0]
+    updates = []
+    contract = SimpleNamespace(functions={'mintFee': lambda: 'mintFee()'})
+    web3_instance = SimpleNamespace(from_wei=Web3.from_wei)
+    targets = {
+        'setMintFee': ('bsc', web3_instance, None, contract, 'mintFee', [(contract, 'mint')], OWNER, '0x' + '33' * 32),
+    }
+    monkeypatch.setattr(feeEstimator, 'fee_targets', lambda: targets)
+    monkeypatch.setattr(feeEstimator, 'time', SimpleNamespace(time=lambda: now[0]))
+    monkeypatch.setattr(feeEstimator, 'bsc_reads', FakeReads(1000))
+    # 10 gas for the relayed call, so the computed fee is 10 x the gas price
+    monkeypatch.setattr(feeEstimator.gas_estimates, 'estimate', lambda *args: 10)
+    monkeypatch.setattr(feeEstimator, 'update_gas_fee', lambda contract, web3_instance, chain_name, setter, address, private_key, fee: updates.append((setter, fee)))
+    fee_updater = BlockFeeUpdater('bsc', band=0.1, min_interval=120, current_refresh_interval=600)
+    fee_updater.now = now
+    fee_updater.updates = updates
+    return fee_updater
+
+
+def test_fees_inside_the_band_are_left_alone(updater):
+    for gas_price in (91, 100, 109):
+        updater.reprice('setMintFee', gas_price, 1000)
+    assert updater.updates == []
+
+
+def test_fee_leaving_the_band_is_updated(updater):
+    updater.reprice('setMintFee', 120, 1000)
+    assert updater.updates == [('setMintFee', 1200)]
+    # The pushed fee is the new fee on chain, without reading it back
+    assert updater.current_fees() == {'setMintFee': 1200}
+    assert feeEstimator.bsc_reads.calls == []
+
+    updater.reprice('setMintFee', 80, 1000)
+    assert updater.updates == [('setMintFee', 1200)]
+
+
+def test_each_fee_is_updated_at_most_once_per_min_interval(updater):
+    updater.reprice('setMintFee', 120, 1000)
+    updater.now[0] += 60
+    updater.reprice('setMintFee', 150, 1200)
+    assert updater.updates == [('setMintFee', 1200)]
+    updater.now[0] += 60
+    updater.reprice('setMintFee', 150, 1200)
+    assert updater.updates == [('setMintFee', 1200), ('setMintFee', 1500)]
+
+
+def test_fee_on_chain_is_read_again_once_stale(updater):
+    reads = feeEstimator.bsc_reads
+    assert updater.current_fees() == {'setMintFee': 1000}
+    assert updater.current_fees() == {'setMintFee': 1000}
+    assert reads.calls == ['mintFee()']
+
+    reads.fee = 1100
+    updater.now[0] += 600
+    assert updater.current_fees() == {'setMintFee': 1100}
+    assert reads.calls == ['mintFee()', 'mintFee()']
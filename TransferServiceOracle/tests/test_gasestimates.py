@@ -0,0 +1,123 @@
+import pytest
+
+pytest.importorskip('eth_utils')
+
+from utils.gasestimates import GasEstimateCache, representative_args
+
+
+class FakeEth:
+    def __init__(self):
+        self.code = b'\x60\x80'
+        self.code_reads = 0
+
+    def get_code(self, address):
+        self.code_reads += 1
+        return self.code
+
+
+class FakeWeb3:
+    def __init__(self):
+        self.eth = FakeEth()
+
+
+class FakeCall:
+    def __init__(self, contract):
+        self.contract = contract
+
+    def estimate_gas(self, tx_params):
+        self.contract.estimates += 1
+        return self.contract.gas
+
+
+class FakeContract:
+    def __init__(self, address='0xAbC0000000000000000000000000000000000001', gas=50000):
+        self.address = address
+        self.gas = gas
+        self.estimates = 0
+        self.abi = [{'type': 'function', 'name': 'withdrawMintFee', 'inputs': []}]
+        self.functions = {'withdrawMintFee': lambda *args: FakeCall(self)}
+
+
+def test_estimate_is_reused():
+    cache = GasEstimateCache()
+    web3_instance, contract = FakeWeb3(), FakeContract()
+    assert cache.estimate(web3_instance, 'bsc', contract, 'withdrawMintFee', {}) == 50000
+    contract.gas = 60000
+    assert cache.estimate(web3_instance, 'bsc', contract, 'withdrawMintFee', {}) == 50000
+    assert contract.estimates == 1
+    assert web3_instance.eth.code_reads == 1
+
+
+def test_expired_estimate_is_redone():
+    cache = GasEstimateCache(refresh_interval=0)
+    web3_instance, contract = FakeWeb3(), FakeContract()
+    cache.estimate(web3_instance, 'bsc', contract, 'withdrawMintFee', {})
+    contract.gas = 60000
+    assert cache.estimate(web3_instance, 'bsc', contract, 'withdrawMintFee', {}) == 60000
+
+
+def test_new_code_at_the_same_address_is_estimated_again():
+    cache = GasEstimateCache(code_check_interval=0)
+    web3_instance, contract = FakeWeb3(), FakeContract()
+    cache.estimate(web3_instance, 'bsc', contract, 'withdrawMintFee', {})
+    web3_instance.eth.code = b'\x60\x81'
+    contract.gas = 70000
+    assert cache.estimate(web3_instance, 'bsc', contract, 'withdrawMintFee', {}) == 70000
+    # The estimate for the old code is dropped
+    assert len(cache._estimates) == 1
+
+
+def test_chains_are_cached_separately():
+    cache = GasEstimateCache()
+    web3_instance, contract = FakeWeb3(), FakeContract()
+    cache.estimate(web3_instance, 'bsc', contract, 'withdrawMintFee', {})
+    cache.estimate(web3_instance, 'ethereum', contract, 'withdrawMintFee', {})
+    assert contract.estimates == 2
+    cache.invalidate()
+    cache.estimate(web3_instance, 'bsc', contract, 'withdrawMintFee', {})
+    assert contract.estimates == 3
+
+
+# Every call the fee estimator prices, by contract
+PRICED_CALLS = {
+    'BEP20Mintable': ['mint'],
+    'ERC20Lock': ['releaseTokens'],
+    'BurnAndReleaseCoordinator': ['initateBurnAndRelease', 'releaseCompleted', 'releaseFailed'],
+}
+
+
+def test_priced_calls_are_estimated_with_arguments_matching_the_abi():
+    pytest.importorskip('web3')
+    from web3 import Web3
+    from web3.providers import BaseProvider
+    from utils.chainclient import load_abi
+
+    class EstimatingProvider(BaseProvider):
+        def __init__(self):
+            self.estimated = []
+
+        def make_request(self, method, params):
+            if method == 'eth_estimateGas':
+                self.estimated.append(params[0]['data'])
+                return {'jsonrpc': '2.0', 'id': 1, 'result': hex(80000)}
+            if method == 'eth_getCode':
+                return {'jsonrpc': '2.0', 'id': 1, 'result': '0x6080'}
+            if method == 'eth_chainId':
+                return {'jsonrpc': '2.0', 'id': 1, 'result': hex(31337)}
+            raise ValueError(f'unexpected {method}')
+
+    owner = Web3.to_checksum_address('0x' + '22' * 20)
+    provider = EstimatingProvider()
+    web3_instance = Web3(provider)
+    cache = GasEstimateCache()
+    for contract_name, function_names in PRICED_CALLS.items():
+        try:
+            abi = load_abi(contract_name)
+        except FileNotFoundError:
+            pytest.skip('contract artifacts missing, run npx hardhat compile')
+        contract = web3_instance.eth.contract(address=Web3.to_checksum_address('0x' + '11' * 20), abi=abi)
+        for function_name in function_names:
+            assert cache.estimate(web3_instance, 'bsc', contract, function_name, {'from': owner}) == 80000
+            args = representative_args(contract, function_name, owner)
+            assert provider.estimated[-1] == contract.encode_abi(fn_name=function_name, args=args)
+            assert owner in args
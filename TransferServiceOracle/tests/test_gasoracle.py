@@ -0,0 +1,80 @@
+from utils import gasoracle
+from utils.gasoracle import GasOracle
+
+GWEI = 10 ** 9
+
+
+class FakeEth:
+    def __init__(self, history=None, gas_price=5 * GWEI):
+        self.block_number = 100
+        self.history = history
+        self.gas_price = gas_price
+        self.max_priority_fee = 2 * GWEI
+        self.samples = 0
+
+    def fee_history(self, block_count, newest_block, percentiles):
+        self.samples += 1
+        if self.history is None:
+            raise ValueError('the method eth_feeHistory does not exist')
+        return self.history
+
+
+class FakeWeb3:
+    def __init__(self, **options):
+        self.eth = FakeEth(**options)
+
+
+EIP1559_HISTORY = {
+    'baseFeePerGas': [10 * GWEI, 11 * GWEI, 12 * GWEI],
+    'reward': [[1 * GWEI], [3 * GWEI], [2 * GWEI]],
+}
+
+
+def test_eip1559_params_use_the_next_base_fee_and_median_tip():
+    oracle = GasOracle(FakeWeb3(history=EIP1559_HISTORY), 'ethereum', base_fee_multiplier=2)
+    assert oracle.tx_params() == {'maxFeePerGas': 26 * GWEI, 'maxPriorityFeePerGas': 2 * GWEI}
+    assert oracle.gas_price() == 14 * GWEI
+
+
+def test_chains_without_base_fee_use_legacy_gas_price():
+    oracle = GasOracle(FakeWeb3(history=None, gas_price=3 * GWEI), 'bsc')
+    assert oracle.tx_params() == {'gasPrice': 3 * GWEI}
+    assert oracle.gas_price() == 3 * GWEI
+
+
+def test_missing_rewards_fall_back_to_the_node_tip():
+    oracle = GasOracle(FakeWeb3(history={'baseFeePerGas': [10 * GWEI], 'reward': []}), 'ethereum', base_fee_multiplier=1)
+    assert oracle.tx_params() == {'maxFeePerGas': 12 * GWEI, 'maxPriorityFeePerGas': 2 * GWEI}
+
+
+def test_sampled_once_per_block():
+    web3_instance = FakeWeb3(history=EIP1559_HISTORY)
+    oracle = GasOracle(web3_instance, 'ethereum', refresh_interval=0)
+    oracle.tx_params()
+    oracle.gas_price()
+    assert web3_instance.eth.samples == 1
+    web3_instance.eth.block_number += 1
+    oracle.tx_params()
+    assert web3_instance.eth.samples == 2
+
+
+def test_block_number_is_checked_at_most_once_per_refresh_interval():
+    web3_instance = FakeWeb3(history=EIP1559_HISTORY)
+    oracle = GasOracle(web3_instance, 'ethereum', refresh_interval=60)
+    oracle.tx_params()
+    web3_instance.eth.block_number += 1
+    oracle.tx_params()
+    assert web3_instance.eth.samples == 1
+
+
+def test_tx_params_are_copies():
+    oracle = GasOracle(FakeWeb3(history=None), 'bsc')
+    oracle.tx_params()['gasPrice'] = 0
+    assert oracle.tx_params()['gasPrice'] == 5 * GWEI
+
+
+def test_one_oracle_per_chain(monkeypatch):
+    monkeypatch.setattr(gasoracle, '_oracles', {})
+    web3_instance = FakeWeb3()
+    assert gasoracle.get_gas_oracle(web3_instance, 'bsc') is gasoracle.get_gas_oracle(web3_instance, 'bsc')
+    assert gasoracle.get_gas_oracle(web3_instance, 'bsc') is not gasoracle.get_gas_oracle(web3_instance, 'ethereum')
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Every module is imported under the pinned requirements, so a missing or renamed web3 API fails here
+pytest.importorskip('web3')
+pytest.importorskip('fastapi')
+pytest.importorskip('dotenv')
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'utils.chainclient',
+    'utils.checkpoint',
+    'utils.gasestimates',
+    'utils.gasoracle',
+    'utils.journal',
+    'utils.lifecycle',
+    'utils.logpoller',
+    'utils.metrics',
+    'utils.multicall',
+    'utils.nonces',
+    'utils.receiptsigner',
+    'utils.receiptstore',
+    'utils.receipttracker',
+    'utils.rpcbatch',
+    'utils.supervisor',
+    'utils.transferjournal',
+    'utils.transferstore',
+    'relayer',
+    'asyncRelayer',
+    'feeEstimator',
+    'receiptApi',
+    'receiptGenerator',
+    'service',
+    'load',
+    'throughput',
+    'fakechain',
+    'startup',
+]
+
+
+@pytest.mark.parametrize('module', MODULES)
+def test_module_imports(module, tmp_path):
+    # A fresh interpreter per module, in a scratch directory, so nothing imported earlier hides a failure
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SERVICE_DIR, os.path.join(SERVICE_DIR, 'benchmarks')]))
+    result = subprocess.run([sys.executable, '-c', f'import {module}'], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
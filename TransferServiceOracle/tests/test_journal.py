@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+
+from utils.journal import FSYNC_ALWAYS, FSYNC_NEVER, CompletionJournal, GroupCommitWriter
+
+
+def read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_close_flushes_everything_queued(tmp_path):
+    path = str(tmp_path / 'completions.log')
+    writer = GroupCommitWriter(path, fsync_policy=FSYNC_NEVER, use_flock=False)
+    for index in range(500):
+        writer.enqueue(f'record {index}')
+    writer.close()
+    assert read_lines(path) == [f'record {index}' for index in range(500)]
+
+
+def test_queued_records_are_committed_in_groups(tmp_path, monkeypatch):
+    path = str(tmp_path / 'completions.log')
+    batches = []
+    release = threading.Event()
+    original_commit = GroupCommitWriter._commit
+
+    def commit(self, batch):
+        # Holds the writer thread on its first commit, so the rest piles up on the queue
+        release.wait(5)
+        batches.append(len(batch))
+        original_commit(self, batch)
+
+    monkeypatch.setattr(GroupCommitWriter, '_commit', commit)
+    writer = GroupCommitWriter(path, fsync_policy=FSYNC_NEVER, use_flock=False, max_batch=4)
+    writer.enqueue('first')
+    while writer.pending():
+        time.sleep(0.001)
+    for index in range(10):
+        writer.enqueue(f'record {index}')
+    release.set()
+    writer.close()
+    assert batches == [1, 4, 4, 2]
+    assert read_lines(path) == ['first'] + [f'record {index}' for index in range(10)]
+
+
+def test_fsync_policies(tmp_path, monkeypatch):
+    fsyncs = []
+    monkeypatch.setattr(GroupCommitWriter, '_fsync', lambda self: fsyncs.append(self.fsync_policy))
+
+    writer = GroupCommitWriter(str(tmp_path / 'never.log'), fsync_policy=FSYNC_NEVER, use_flock=False)
+    for index in range(3):
+        writer.enqueue(f'record {index}')
+    while writer.pending():
+        time.sleep(0.001)
+    # Group commits leave flushing to the OS, only close() syncs what was written
+    assert fsyncs == []
+    writer.close()
+    assert fsyncs == [FSYNC_NEVER]
+
+    fsyncs.clear()
+    writer = GroupCommitWriter(str(tmp_path / 'always.log'), fsync_policy=FSYNC_ALWAYS, use_flock=False)
+    writer.enqueue('record')
+    writer.close()
+    # Synced by the commit itself, nothing is left dirty for close()
+    assert fsyncs == [FSYNC_ALWAYS]
+
+
+def test_completion_journal_writes_formatted_records(tmp_path):
+    path = str(tmp_path / 'transfers.log')
+    handler = CompletionJournal(path, fsync_policy=FSYNC_NEVER, use_flock=False)
+    handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+    logger = logging.getLogger('test_completion_journal')
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        logger.warning('transfer relayed')
+        logger.warning('transfer completed')
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    assert read_lines(path) == ['WARNING transfer relayed', 'WARNING transfer completed']
@@ -0,0 +1,173 @@
+import pytest
+
+pytest.importorskip('eth_utils')
+
+from utils import logpoller
+from utils.checkpoint import BlockCheckpoint
+from utils.logpoller import BlockCadence, LogPoller
+
+
+class FakeEth:
+    def __init__(self, head):
+        self.block_number = head
+        self.requests = []
+
+    def get_logs(self, filter_params):
+        self.requests.append((filter_params['fromBlock'], filter_params['toBlock']))
+        return []
+
+
+class FakeWeb3:
+    def __init__(self, head):
+        self.eth = FakeEth(head)
+
+
+def make_poller(tmp_path, head, **options):
+    checkpoint = BlockCheckpoint(str(tmp_path / 'checkpoint.json'))
+    return LogPoller(FakeWeb3(head), 'ethereum', checkpoint, **options), checkpoint
+
+
+def test_first_start_begins_at_head(tmp_path):
+    poller, checkpoint = make_poller(tmp_path, 100)
+    assert poller.poll() == []
+    assert poller.web3.eth.requests == []
+    assert checkpoint.load('ethereum') == 100
+
+
+def test_restart_resumes_after_the_checkpoint(tmp_path):
+    poller, checkpoint = make_poller(tmp_path, 100)
+    checkpoint.save('ethereum', 90)
+    poller.poll()
+    assert poller.web3.eth.requests == [(91, 100)]
+    poller.commit()
+    assert checkpoint.load('ethereum') == 100
+    assert BlockCheckpoint(checkpoint.file_path).load('ethereum') == 100
+
+
+def test_uncommitted_range_is_fetched_again(tmp_path):
+    poller, checkpoint = make_poller(tmp_path, 100)
+    checkpoint.save('ethereum', 90)
+    poller.poll()
+    poller.web3.eth.block_number = 105
+    poller.poll()
+    assert poller.web3.eth.requests == [(91, 100), (91, 105)]
+
+
+def test_partial_commit_stops_before_the_failed_block(tmp_path):
+    poller, checkpoint = make_poller(tmp_path, 100)
+    checkpoint.save('ethereum', 90)
+    poller.poll()
+    poller.commit(94)
+    assert checkpoint.load('ethereum') == 94
+    assert not poller.caught_up
+    poller.poll()
+    assert poller.web3.eth.requests[-1] == (95, 100)
+
+
+def test_commit_at_the_start_of_the_range_keeps_the_checkpoint(tmp_path):
+    poller, checkpoint = make_poller(tmp_path, 100)
+    checkpoint.save('ethereum', 90)
+    poller.poll()
+    poller.commit(90)
+    assert checkpoint.load('ethereum') == 90
+    poller.poll()
+    assert poller.web3.eth.requests[-1] == (91, 100)
+
+
+def test_catch_up_is_split_into_ranges_fetched_per_poll(tmp_path):
+    poller, checkpoint = make_poller(tmp_path, 1000, max_block_range=100, backfill_workers=3)
+    checkpoint.save('ethereum', 0)
+    poller.poll()
+    # At most max_block_range * backfill_workers blocks per poll, in block order
+    assert poller.web3.eth.requests == [(1, 100), (101, 200), (201, 300)]
+    assert not poller.caught_up
+    assert poller.next_poll_delay() == 0
+    poller.commit()
+    assert checkpoint.load('ethereum') == 300
+
+    poller.web3.eth.requests.clear()
+    poller.poll()
+    assert poller.web3.eth.requests == [(301, 400), (401, 500), (501, 600)]
+
+
+def test_last_range_ends_at_the_head(tmp_path):
+    poller, checkpoint = make_poller(tmp_path, 250, max_block_range=100, backfill_workers=4)
+    checkpoint.save('ethereum', 0)
+    poller.poll()
+    assert poller.web3.eth.requests == [(1, 100), (101, 200), (201, 250)]
+    assert poller.caught_up
+
+
+def test_split_range_covers_every_block_once(tmp_path):
+    poller, _ = make_poller(tmp_path, 100, max_block_range=10)
+    assert poller._split_range(5, 5) == [(5, 5)]
+    assert poller._split_range(1, 10) == [(1, 10)]
+    assert poller._split_range(1, 11) == [(1, 10), (11, 11)]
+    assert poller._split_range(7, 6) == []
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(logpoller.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_cadence_uses_the_min_interval_until_a_block_time_is_learned(clock):
+    cadence = BlockCadence(min_interval=0.5, max_interval=30)
+    assert cadence.delay() == 0.5
+    cadence.observe(100)
+    assert cadence.block_time is None
+    assert cadence.delay() == 0.5
+
+
+def test_cadence_learns_the_block_time_and_waits_for_the_next_block(clock):
+    cadence = BlockCadence(min_interval=0.5, max_interval=30, smoothing=0.5)
+    cadence.observe(100)
+    clock[0] += 24
+    cadence.observe(102)
+    assert cadence.block_time == 12
+    clock[0] += 2
+    assert cadence.delay() == 10
+    # A moving average, not the last interval alone
+    clock[0] += 4
+    cadence.observe(103)
+    assert cadence.block_time == 9
+
+
+def test_cadence_backs_off_on_checks_that_find_no_block(clock):
+    cadence = BlockCadence(min_interval=1, max_interval=30, backoff=2)
+    cadence.observe(100)
+    clock[0] += 5
+    cadence.observe(101)
+    clock[0] += 5
+    assert cadence.delay() == 1
+    delays = []
+    for _ in range(6):
+        cadence.observe(101)
+        delays.append(cadence.delay())
+    assert delays == [2, 4, 8, 16, 30, 30]
+    # A new block resets the backoff
+    cadence.observe(102)
+    clock[0] += 10
+    assert cadence.delay() == 1
+
+
+def test_cadence_never_waits_longer_than_the_max_interval(clock):
+    cadence = BlockCadence(min_interval=0.5, max_interval=30)
+    cadence.observe(100)
+    clock[0] += 600
+    cadence.observe(101)
+    assert cadence.block_time == 600
+    assert cadence.delay() == 30
+
+
+def test_poller_polls_again_at_once_while_catching_up(tmp_path, clock):
+    poller, checkpoint = make_poller(tmp_path, 150, max_block_range=100, backfill_workers=1, min_poll_interval=0.5)
+    checkpoint.save('ethereum', 0)
+    poller.poll()
+    assert poller.next_poll_delay() == 0
+    poller.commit()
+    poller.poll()
+    assert poller.caught_up
+    assert poller.next_poll_delay() == 0.5
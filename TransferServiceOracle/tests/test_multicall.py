@@ -0,0 +1,95 @@
+import pytest
+
+pytest.importorskip('web3')
+
+from types import SimpleNamespace
+
+from eth_utils import to_bytes, to_hex
+from web3 import Web3
+from utils import multicall
+from utils.rpcbatch import RPCError
+
+CODEC = Web3().codec
+FEE_ADDRESS = '0x' + '11' * 20
+OWNER_ADDRESS = Web3.to_checksum_address('0x' + '22' * 20)
+
+
+class FakeFunction:
+    def __init__(self, address, selector, output_type):
+        self.address = address
+        self.selector = selector
+        self.abi = {'type': 'function', 'name': 'read', 'inputs': [], 'outputs': [{'name': '', 'type': output_type}]}
+
+    def _encode_transaction_data(self):
+        return '0x' + self.selector
+
+
+class FakeNode:
+    """Answers JSON-RPC batches, with view call results by selector."""
+
+    def __init__(self, results, multicall_deployed=True):
+        self.results = results
+        self.multicall_deployed = multicall_deployed
+        self.batches = []
+
+    def __call__(self, node_url, calls, **kwargs):
+        self.batches.append([method for method, _ in calls])
+        return [self.answer(method, params) for method, params in calls]
+
+    def answer(self, method, params):
+        if method == 'eth_getCode':
+            return '0x6080' if self.multicall_deployed else '0x'
+        if method == 'eth_gasPrice':
+            return '0x3b9aca00'
+        if method == 'eth_call' and params[0]['to'] == multicall.MULTICALL3_ADDRESS:
+            data = to_bytes(hexstr=params[0]['data'])
+            assert data[:4] == multicall.AGGREGATE3_SELECTOR
+            (calls,) = CODEC.decode(['(address,bool,bytes)[]'], data[4:])
+            returns = [self.results[call_data.hex()] for _, _, call_data in calls]
+            return to_hex(CODEC.encode(['(bool,bytes)[]'], [returns]))
+        success, return_data = self.results[to_bytes(hexstr=params[0]['data']).hex()]
+        return to_hex(return_data) if success else RPCError('execution reverted')
+
+
+RESULTS = {
+    'aaaaaaaa': (True, CODEC.encode(['uint256'], [10 ** 15])),
+    'bbbbbbbb': (True, CODEC.encode(['address'], [OWNER_ADDRESS])),
+    'cccccccc': (False, b''),
+}
+
+
+def make_batcher(monkeypatch, node):
+    monkeypatch.setattr(multicall, 'batch_request', node)
+    return multicall.ReadBatcher(SimpleNamespace(codec=CODEC), 'http://node', 'test', window=0.05)
+
+
+def test_view_calls_are_decoded_from_one_aggregate(monkeypatch):
+    node = FakeNode(RESULTS)
+    reads = make_batcher(monkeypatch, node)
+    fee = reads.call(FakeFunction(FEE_ADDRESS, 'aaaaaaaa', 'uint256'))
+    owner = reads.call(FakeFunction(FEE_ADDRESS, 'bbbbbbbb', 'address'))
+    gas_price = reads.gas_price()
+    assert fee.result(timeout=2) == 10 ** 15
+    assert owner.result(timeout=2) == OWNER_ADDRESS
+    assert gas_price.result(timeout=2) == 10 ** 9
+    # The aggregate and the plain read share one JSON-RPC batch
+    assert node.batches[-1] == ['eth_call', 'eth_gasPrice']
+
+
+def test_reverted_call_fails_only_its_own_future(monkeypatch):
+    reads = make_batcher(monkeypatch, FakeNode(RESULTS))
+    fee = reads.call(FakeFunction(FEE_ADDRESS, 'aaaaaaaa', 'uint256'))
+    reverted = reads.call(FakeFunction(FEE_ADDRESS, 'cccccccc', 'uint256'))
+    assert fee.result(timeout=2) == 10 ** 15
+    with pytest.raises(RPCError):
+        reverted.result(timeout=2)
+
+
+def test_without_multicall_calls_are_batched_individually(monkeypatch):
+    node = FakeNode(RESULTS, multicall_deployed=False)
+    reads = make_batcher(monkeypatch, node)
+    fee = reads.call(FakeFunction(FEE_ADDRESS, 'aaaaaaaa', 'uint256'))
+    owner = reads.call(FakeFunction(FEE_ADDRESS, 'bbbbbbbb', 'address'))
+    assert fee.result(timeout=2) == 10 ** 15
+    assert owner.result(timeout=2) == OWNER_ADDRESS
+    assert node.batches[-1] == ['eth_call', 'eth_call']
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from utils import nonces
+
+
+class FakeEth:
+    def __init__(self, pending_count, failures=()):
+        self.pending_count = pending_count
+        self.count_reads = 0
+        self.failures = list(failures)
+        self.sign_failures = []
+        self.sent = []
+        self.account = self
+
+    def get_transaction_count(self, address, block_identifier):
+        assert block_identifier == 'pending'
+        self.count_reads += 1
+        return self.pending_count
+
+    def sign_transaction(self, tx, private_key):
+        if self.sign_failures:
+            raise self.sign_failures.pop(0)
+        return type('SignedTransaction', (), {'rawTransaction': dict(tx)})()
+
+    def send_raw_transaction(self, raw_transaction):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append(raw_transaction['nonce'])
+        self.pending_count = raw_transaction['nonce'] + 1
+        return f"0x{raw_transaction['nonce']:064x}"
+
+
+class FakeWeb3:
+    def __init__(self, pending_count, failures=()):
+        self.eth = FakeEth(pending_count, failures)
+
+
+class FakeFunction:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+
+    def build_transaction(self, tx_params):
+        if self.failures:
+            raise self.failures.pop(0)
+        return dict(tx_params)
+
+
+@pytest.fixture(autouse=True)
+def fresh_managers(monkeypatch):
+    monkeypatch.setattr(nonces, '_managers', {})
+
+
+def test_allocate_reads_the_node_once():
+    web3_instance = FakeWeb3(7)
+    manager = nonces.NonceManager('0xabc')
+    assert [manager.allocate(web3_instance) for _ in range(3)] == [7, 8, 9]
+    assert web3_instance.eth.count_reads == 1
+
+
+def test_resync_rereads_the_pending_count():
+    web3_instance = FakeWeb3(3)
+    manager = nonces.NonceManager('0xabc')
+    manager.allocate(web3_instance)
+    manager.allocate(web3_instance)
+    web3_instance.eth.pending_count = 10
+    manager.resync()
+    assert manager.allocate(web3_instance) == 10
+    assert web3_instance.eth.count_reads == 2
+
+
+def test_managers_are_shared_per_chain_and_signer():
+    assert nonces.get_nonce_manager('ethereum', '0xABC') is nonces.get_nonce_manager('ethereum', '0xabc')
+    assert nonces.get_nonce_manager('ethereum', '0xabc') is not nonces.get_nonce_manager('bsc', '0xabc')
+
+
+def test_send_transaction_resyncs_after_a_nonce_conflict():
+    web3_instance = FakeWeb3(0, failures=[ValueError('nonce too low')])
+    # Another sender used nonces 0-4 behind our back
+    nonces.get_nonce_manager('ethereum', '0xabc').allocate(web3_instance)
+    web3_instance.eth.pending_count = 5
+    nonces.send_transaction(web3_instance, 'ethereum', FakeFunction(), {'from': '0xabc'}, 'key')
+    assert web3_instance.eth.sent == [5]
+
+
+def test_send_transaction_raises_other_errors_and_resyncs():
+    web3_instance = FakeWeb3(0, failures=[ValueError('insufficient funds')])
+    with pytest.raises(ValueError):
+        nonces.send_transaction(web3_instance, 'ethereum', FakeFunction(), {'from': '0xabc'}, 'key')
+    # The unused nonce is not skipped by the next send
+    nonces.send_transaction(web3_instance, 'ethereum', FakeFunction(), {'from': '0xabc'}, 'key')
+    assert web3_instance.eth.sent == [0]
+
+
+def test_nonce_is_not_lost_when_building_fails():
+    web3_instance = FakeWeb3(0)
+    # e.g. the gas estimate of a call that would revert
+    with pytest.raises(ValueError):
+        nonces.send_transaction(web3_instance, 'ethereum', FakeFunction([ValueError('execution reverted')]), {'from': '0xabc'}, 'key')
+    nonces.send_transaction(web3_instance, 'ethereum', FakeFunction(), {'from': '0xabc'}, 'key')
+    assert web3_instance.eth.sent == [0]
+
+
+def test_nonce_is_not_lost_when_signing_fails():
+    web3_instance = FakeWeb3(0)
+    web3_instance.eth.sign_failures = [ValueError('bad key')]
+    with pytest.raises(ValueError):
+        nonces.send_transaction(web3_instance, 'ethereum', FakeFunction(), {'from': '0xabc'}, 'key')
+    nonces.send_transaction(web3_instance, 'ethereum', FakeFunction(), {'from': '0xabc'}, 'key')
+    assert web3_instance.eth.sent == [0]
+
+
+def test_async_senders_share_the_counter():
+    class AsyncEth:
+        def __init__(self):
+            self.sent = []
+            self.account = FakeEth(0)
+
+        async def get_transaction_count(self, address, block_identifier):
+            return 4
+
+        async def send_raw_transaction(self, raw_transaction):
+            self.sent.append(raw_transaction['nonce'])
+            return raw_transaction['nonce']
+
+    class AsyncFunction:
+        async def build_transaction(self, tx_params):
+            return dict(tx_params)
+
+    async_web3 = type('AsyncWeb3', (), {'eth': AsyncEth()})()
+
+    async def send_all():
+        sends = [nonces.async_send_transaction(async_web3, 'bsc', AsyncFunction(), {'from': '0xabc'}, 'key') for _ in range(5)]
+        return await asyncio.gather(*sends)
+
+    assert sorted(asyncio.run(send_all())) == [4, 5, 6, 7, 8]
+    assert async_web3.eth.sent == [4, 5, 6, 7, 8]
@@ -0,0 +1,105 @@
+import asyncio
+import subprocess
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip('dotenv')
+pytest.importorskip('fastapi')
+pytest.importorskip('uvicorn')
+
+import receiptApi
+from utils.receiptstore import ReceiptStore
+
+
+class ThreadRecordingStore(ReceiptStore):
+    """Receipt store noting which threads its lookups ran on."""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.threads = set()
+
+    def get(self, receipt_id):
+        self.threads.add(threading.get_ident())
+        return super().get(receipt_id)
+
+    def get_many(self, receipt_ids):
+        self.threads.add(threading.get_ident())
+        return super().get_many(receipt_ids)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ThreadRecordingStore(str(tmp_path / 'receipts.db'))
+    monkeypatch.setattr(receiptApi, 'signed_receipts', store)
+    yield store
+    store.close()
+
+
+def test_receipt_lookups_run_off_the_event_loop(store):
+    store.put('r1', {'signature': '0x01'})
+
+    async def collect():
+        single = await receiptApi.collect_receipt(receiptApi.ReceiptRequest(receipt_id='r1'))
+        batch = [item async for item in receiptApi.receipts_as_signed(['r1', 'r2'], 0)]
+        return single, batch, threading.get_ident()
+
+    single, batch, loop_thread = asyncio.run(collect())
+    assert single == {'signature': '0x01'}
+    assert batch == [('r1', {'signature': '0x01'})]
+    assert store.threads and loop_thread not in store.threads
+
+
+def test_waiting_request_is_woken_when_the_receipt_is_signed(store):
+    async def collect():
+        waiting = asyncio.create_task(receiptApi.wait_for_receipt('r1', 5))
+        while 'r1' not in receiptApi.receipt_waiters:
+            await asyncio.sleep(0.01)
+        store.put('r1', {'signature': '0x01'})
+        receiptApi.notify_receipt('r1', {'signature': '0x01'})
+        return await waiting
+
+    assert asyncio.run(collect()) == {'signature': '0x01'}
+
+
+def test_lifespan_runs_the_store_watcher_in_worker_processes(monkeypatch):
+    started = []
+
+    async def watch_store(interval):
+        started.append(interval)
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(receiptApi, 'watch_store', watch_store)
+
+    async def serve(watch):
+        monkeypatch.setenv('RECEIPT_API_WATCH_STORE', watch)
+        async with receiptApi.lifespan(receiptApi.app):
+            await asyncio.sleep(0.01)
+
+    asyncio.run(serve('0'))
+    assert started == []
+    asyncio.run(serve('1'))
+    assert started == [receiptApi.RECEIPT_API_STORE_POLL_INTERVAL]
+
+
+def test_stop_terminates_the_uvicorn_process(monkeypatch):
+    server = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    monkeypatch.setattr(receiptApi, 'http_server', server)
+    receiptApi.stop_http_server(timeout=5)
+    assert server.poll() is not None
+
+
+def test_stop_asks_an_in_process_server_to_exit(monkeypatch):
+    class FakeServer:
+        should_exit = False
+
+    server = FakeServer()
+    monkeypatch.setattr(receiptApi, 'http_server', server)
+    receiptApi.stop_http_server()
+    assert server.should_exit
+
+
+def test_stop_before_start_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(receiptApi, 'http_server', None)
+    receiptApi.stop_http_server()
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip('eth_account')
+pytest.importorskip('web3')
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from hexbytes import HexBytes
+from web3 import Web3
+from utils.receiptsigner import ReceiptSigner, load_accounts, sign_receipts
+
+OWNER = Account.create()
+
+
+def receipt_message(user, amount, nonce, contract_address):
+    # keccak256(abi.encodePacked(user, amount, nonce, contractAddress)), as verifyReceipt rebuilds it
+    return Web3.solidity_keccak(['address', 'uint256', 'uint256', 'address'], [user, amount, nonce, contract_address])
+
+
+def ecrecover(message, signature):
+    # splitSignature and a bare ecrecover, like the contracts' recoverSigner
+    signature = HexBytes(signature)
+    assert len(signature) == 65
+    r, s, v = signature[:32], signature[32:64], signature[64]
+    assert v in (27, 28)
+    return Account._recover_hash(message, vrs=(v, r, s))
+
+
+def test_signature_recovers_to_the_owner_like_the_contract():
+    user, contract_address = Account.create().address, Account.create().address
+    message = receipt_message(user, 10 ** 18, 7, contract_address)
+    [(receipt_id, signature)] = sign_receipts(load_accounts({'MintFeePaid': OWNER.key}), [('r1', 'MintFeePaid', message)])
+    assert receipt_id == 'r1'
+    assert ecrecover(message, signature) == OWNER.address
+
+
+def test_hash_is_not_signed_with_the_eip191_prefix():
+    message = receipt_message(OWNER.address, 1, 1, OWNER.address)
+    [(_, signature)] = sign_receipts(load_accounts({'MintFeePaid': OWNER.key}), [('r1', 'MintFeePaid', message)])
+    assert signature != OWNER.sign_message(encode_defunct(primitive=message)).signature.hex()
+
+
+def test_hex_messages_are_signed_as_bytes():
+    message = receipt_message(OWNER.address, 1, 2, OWNER.address)
+    accounts = load_accounts({'ReleaseFeePaid': OWNER.key})
+    assert sign_receipts(accounts, [('r', 'ReleaseFeePaid', message.hex())]) == sign_receipts(accounts, [('r', 'ReleaseFeePaid', bytes(message))])
+
+
+def test_unknown_keys_are_skipped():
+    assert sign_receipts(load_accounts({'MintFeePaid': OWNER.key}), [('r1', 'ReleaseFeePaid', b'\0' * 32)]) == []
+
+
+def test_in_process_signer_hands_receipts_over():
+    signed = {}
+    signer = ReceiptSigner({'MintFeePaid': OWNER.key}, lambda receipt_id, receipt: signed.update({receipt_id: receipt}), processes=0)
+    message = receipt_message(OWNER.address, 3, 4, OWNER.address)
+    assert signer.submit('r1', 'MintFeePaid', message, {'sender': OWNER.address})
+    assert signer.wait_idle(timeout=5)
+    signer.close()
+    assert signed['r1']['sender'] == OWNER.address
+    assert ecrecover(message, signed['r1']['receipt']) == OWNER.address
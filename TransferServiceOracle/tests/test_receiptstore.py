@@ -0,0 +1,63 @@
+from utils import receiptstore
+from utils.receiptstore import ReceiptStore
+
+
+def receipt(index):
+    return {'receipt_id': f'r{index}', 'signature': '0x' + f'{index:02x}' * 65}
+
+
+def test_hot_tier_evicts_the_least_recently_used(tmp_path):
+    store = ReceiptStore(str(tmp_path / 'receipts.db'), capacity=2, ttl=60)
+    store.put('r1', receipt(1))
+    store.put('r2', receipt(2))
+    # Reading r1 makes r2 the least recently used
+    assert store.get('r1') == receipt(1)
+    store.put('r3', receipt(3))
+    assert store.hot_size() == 2
+    assert list(store._hot) == ['r1', 'r3']
+    # Evicted receipts are still served from disk, and promoted back into memory
+    assert store.get('r2') == receipt(2)
+    assert list(store._hot) == ['r3', 'r2']
+    store.close()
+
+
+def test_expired_receipts_are_reread_from_disk(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(receiptstore.time, 'monotonic', lambda: now[0])
+    store = ReceiptStore(str(tmp_path / 'receipts.db'), capacity=10, ttl=30)
+    store.put('r1', receipt(1))
+    assert store._get_hot('r1') == receipt(1)
+
+    now[0] += 31
+    assert store._get_hot('r1') is receiptstore._MISSING
+    assert store.hot_size() == 0
+    assert store.get('r1') == receipt(1)
+    assert store.hot_size() == 1
+    store.close()
+
+
+def test_receipts_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'receipts.db')
+    store = ReceiptStore(path, capacity=10, ttl=60)
+    for index in range(3):
+        store.put(f'r{index}', receipt(index))
+    store.close()
+
+    reopened = ReceiptStore(path, capacity=10, ttl=60)
+    assert reopened.hot_size() == 0
+    assert 'r1' in reopened
+    assert 'missing' not in reopened
+    assert reopened.get('missing') is None
+    assert reopened.get_many(['r0', 'r2', 'missing']) == {'r0': receipt(0), 'r2': receipt(2)}
+    assert reopened.hot_size() == 2
+    reopened.close()
+
+
+def test_get_many_queries_large_batches_in_chunks(tmp_path):
+    store = ReceiptStore(str(tmp_path / 'receipts.db'), capacity=10, ttl=60)
+    for index in range(1200):
+        store.put(f'r{index}', receipt(index % 256))
+    found = store.get_many([f'r{index}' for index in range(1200)])
+    assert len(found) == 1200
+    assert store.hot_size() == 10
+    store.close()
@@ -0,0 +1,125 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('web3')
+
+from hexbytes import HexBytes
+from web3 import Web3
+from utils import receipttracker
+from utils.rpcbatch import RPCError
+
+RAW_RECEIPT = {
+    'transactionHash': '0x' + '11' * 32,
+    'transactionIndex': '0x2',
+    'blockHash': '0x' + '22' * 32,
+    'blockNumber': '0x10',
+    'from': '0x' + 'ab' * 20,
+    'to': '0x' + 'cd' * 20,
+    'cumulativeGasUsed': '0xc350',
+    'gasUsed': '0x5208',
+    'effectiveGasPrice': '0x3b9aca00',
+    'contractAddress': None,
+    'logs': [{
+        'address': '0x' + 'cd' * 20,
+        'topics': ['0x' + '33' * 32],
+        'data': '0x',
+        'blockNumber': '0x10',
+        'blockHash': '0x' + '22' * 32,
+        'transactionHash': '0x' + '11' * 32,
+        'transactionIndex': '0x2',
+        'logIndex': '0x0',
+        'removed': False,
+    }],
+    'logsBloom': '0x' + '00' * 256,
+    'status': '0x1',
+    'type': '0x2',
+}
+
+
+def test_format_receipt_matches_web3_types():
+    receipt = receipttracker.format_receipt(RAW_RECEIPT)
+    assert receipt.status == 1
+    assert receipt.gasUsed == 21000
+    assert receipt.blockNumber == 16
+    assert receipt.effectiveGasPrice == 10 ** 9
+    assert receipt.transactionHash == HexBytes('0x' + '11' * 32)
+    assert receipt['from'] == Web3.to_checksum_address('0x' + 'ab' * 20)
+    assert receipt.contractAddress is None
+    assert receipt.logs[0].logIndex == 0
+    assert receipt.logs[0].topics == [HexBytes('0x' + '33' * 32)]
+
+
+class FakeEth:
+    def __init__(self):
+        self.block_number = 1
+
+
+class FakeWeb3:
+    def __init__(self):
+        self.eth = FakeEth()
+
+
+class GatedEth:
+    """Holds the tracker thread at its block number check until the test opens the gate."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+
+    @property
+    def block_number(self):
+        self.gate.wait(2)
+        return 1
+
+
+def test_tracker_resolves_receipts_from_one_batch(monkeypatch):
+    batches = []
+    mined = {'0x' + 'aa' * 32}
+
+    def fake_batch_request(node_url, calls, **kwargs):
+        batches.append(calls)
+        return [dict(RAW_RECEIPT, transactionHash=params[0]) if params[0] in mined else None for _, params in calls]
+
+    monkeypatch.setattr(receipttracker, 'batch_request', fake_batch_request)
+    eth = GatedEth()
+    tracker = receipttracker.ReceiptTracker(SimpleNamespace(eth=eth), 'http://node', 'test', poll_interval=0.01, on_stuck=None)
+    mined_future = tracker.track('0x' + 'aa' * 32)
+    pending_future = tracker.track(HexBytes('0x' + 'bb' * 32), timeout=0.2)
+    eth.gate.set()
+
+    assert mined_future.result(timeout=2).transactionHash == HexBytes('0x' + 'aa' * 32)
+    # Both hashes went out in the same batch request
+    assert sorted(params[0] for _, params in batches[0]) == ['0x' + 'aa' * 32, '0x' + 'bb' * 32]
+    with pytest.raises(TimeoutError):
+        pending_future.result(timeout=2)
+    assert tracker.pending_count() == 0
+
+
+def test_tracker_ignores_failed_lookups(monkeypatch):
+    calls = []
+
+    def fake_batch_request(node_url, batch, **kwargs):
+        calls.append(batch)
+        if len(calls) == 1:
+            return [RPCError('unknown')]
+        return [RAW_RECEIPT]
+
+    monkeypatch.setattr(receipttracker, 'batch_request', fake_batch_request)
+    web3_instance = FakeWeb3()
+    tracker = receipttracker.ReceiptTracker(web3_instance, 'http://node', 'test', poll_interval=0.01, on_stuck=None)
+    future = tracker.track(RAW_RECEIPT['transactionHash'])
+    time.sleep(0.05)
+    assert not future.done()
+    # The next block triggers another batch, which finds the receipt
+    web3_instance.eth.block_number = 2
+    assert future.result(timeout=2).status == 1
+
+
+def test_newly_tracked_transactions_are_checked_right_away(monkeypatch):
+    monkeypatch.setattr(receipttracker, 'batch_request', lambda node_url, calls, **kwargs: [dict(RAW_RECEIPT, transactionHash=params[0]) for _, params in calls])
+    tracker = receipttracker.ReceiptTracker(FakeWeb3(), 'http://node', 'test', poll_interval=30, on_stuck=None)
+    assert tracker.track('0x' + 'aa' * 32).result(timeout=2).status == 1
+    # The thread is now waiting out its poll_interval, tracking another hash wakes it
+    assert tracker.track(b'\xcc' * 32).result(timeout=2).transactionHash == HexBytes(b'\xcc' * 32)
@@ -0,0 +1,139 @@
+import asyncio
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('web3')
+pytest.importorskip('dotenv')
+
+import relayer
+from utils.transferstore import TransferStore
+
+TRANSFER_ID = bytes(range(16))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = TransferStore(str(tmp_path / 'transfers.db'))
+    monkeypatch.setattr(relayer, 'get_transfer_store', lambda: store)
+    return store
+
+
+def make_event(name='TokensLocked'):
+    return SimpleNamespace(
+        event=name,
+        args=SimpleNamespace(transferRequestId=TRANSFER_ID, amount=5),
+        transactionHash=b'\x01' * 32,
+        blockNumber=10,
+    )
+
+
+def test_handler_runs_once_per_transfer(store):
+    calls = []
+
+    @relayer.once_per_transfer('locked', 'eth_to_bsc')
+    def handler(event, logger=None):
+        calls.append(event)
+
+    handler(make_event())
+    handler(make_event())
+    assert len(calls) == 1
+    assert store.in_flight() == []
+
+
+def test_failed_handler_releases_its_claim(store):
+    attempts = []
+
+    @relayer.once_per_transfer('locked', 'eth_to_bsc')
+    def handler(event, logger=None):
+        attempts.append(event)
+        if len(attempts) == 1:
+            raise RuntimeError('node unavailable')
+
+    with pytest.raises(RuntimeError):
+        handler(make_event())
+    assert store.get(TRANSFER_ID) is None
+    handler(make_event())
+    assert len(attempts) == 2
+    assert store.get(TRANSFER_ID)['stage'] == 'locked'
+
+
+def test_handler_failing_after_sending_keeps_its_claim(store):
+    attempts = []
+
+    @relayer.once_per_transfer('locked', 'eth_to_bsc')
+    def handler(event, logger=None):
+        attempts.append(event)
+        relayer.record_relay_tx('locked', event.args.transferRequestId, b'\xab' * 32)
+        raise RuntimeError('journal unavailable')
+
+    with pytest.raises(RuntimeError):
+        handler(make_event())
+    # The replayed event is skipped, instead of sending a second relay transaction
+    handler(make_event())
+    assert len(attempts) == 1
+    assert store.in_flight() == [{'transfer_request_id': TRANSFER_ID.hex(), 'stage': 'locked', 'relay_tx_hash': '0x' + 'ab' * 32}]
+
+
+def test_coroutine_handlers_are_claimed_too(store):
+    calls = []
+
+    @relayer.once_per_transfer('locked', 'eth_to_bsc')
+    async def handler(event, logger=None):
+        calls.append(event)
+
+    asyncio.run(handler(make_event()))
+    asyncio.run(handler(make_event()))
+    assert len(calls) == 1
+
+
+class FakeTracker:
+    def __init__(self):
+        self.tracked = []
+
+    def track(self, tx_hash):
+        self.tracked.append(tx_hash)
+        return Future()
+
+    def pending_count(self):
+        return len(self.tracked)
+
+
+def test_reconcile_releases_claims_without_a_relay_transaction(store, monkeypatch):
+    tracker = FakeTracker()
+    monkeypatch.setattr(relayer, 'get_receipt_tracker', lambda web3_instance, url, chain_name: tracker)
+    relay_tx_hash = '0x' + 'ab' * 32
+    store.claim(TRANSFER_ID, 'locked')
+    store.claim(TRANSFER_ID, 'burn_initiated')
+    store.set_relay_tx_hash(TRANSFER_ID, 'burn_initiated', relay_tx_hash)
+
+    relayer.reconcile_claims()
+
+    assert store.in_flight() == []
+    assert [transition['stage'] for transition in store.get(TRANSFER_ID)['transitions']] == ['burn_initiated']
+    # The stored hash is a hex string, the real watch_transaction has to accept it as well as bytes
+    assert tracker.tracked == [relay_tx_hash]
+
+
+def test_watch_transaction_accepts_bytes_and_hex_hashes(monkeypatch):
+    tracker = FakeTracker()
+    monkeypatch.setattr(relayer, 'get_receipt_tracker', lambda web3_instance, url, chain_name: tracker)
+    relayer.watch_transaction(None, 'bsc', b'\xab' * 32, 'Mint')
+    relayer.watch_transaction(None, 'bsc', '0x' + 'ab' * 32, 'Mint')
+    assert tracker.tracked == ['0x' + 'ab' * 32] * 2
+
+
+def test_completion_handlers_run_without_a_logger(store, monkeypatch):
+    journal = SimpleNamespace(records=[])
+    journal.record = lambda stage, transfer_request_id, **fields: journal.records.append(stage)
+    monkeypatch.setattr(relayer, 'get_transfer_journal', lambda: journal)
+    event = make_event('TokensMinted')
+    event.args = SimpleNamespace(
+        transferRequestId=TRANSFER_ID, amount=5, tokenAddress='0x' + '33' * 20,
+        fromUserAddresOnEthereumChain='0x' + '11' * 20, toUserAddressOnBinanceChain='0x' + '22' * 20,
+        fromUserAddressOnBinanceChain='0x' + '22' * 20, toUserAddressOnEthereumChain='0x' + '11' * 20,
+    )
+    relayer.handle_tokens_minted(event, logger=None)
+    relayer.handle_transfer_completed(event, logger=None)
+    assert journal.records == ['minted', 'completed']
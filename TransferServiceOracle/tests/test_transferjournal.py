@@ -0,0 +1,99 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import uuid
+
+from utils.transferjournal import INDEX_ENTRY, TransferJournal, TransferJournalReader, transfer_request_id_bytes
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST = uuid.UUID('11111111-1111-1111-1111-111111111111').bytes
+SECOND = uuid.UUID('22222222-2222-2222-2222-222222222222').bytes
+
+
+def write(path, *records):
+    journal = TransferJournal(path, use_flock=False, fsync_policy='never')
+    for stage, transfer_request_id in records:
+        journal.record(stage, transfer_request_id, direction='eth_to_bsc', amount=1)
+    journal.close()
+
+
+def test_transfer_ids_in_any_form_normalize_alike():
+    assert transfer_request_id_bytes(FIRST) == FIRST
+    assert transfer_request_id_bytes('0x' + FIRST.hex()) == FIRST
+    assert transfer_request_id_bytes(str(uuid.UUID(bytes=FIRST))) == FIRST
+    assert transfer_request_id_bytes(uuid.UUID(bytes=FIRST)) == FIRST
+
+
+def test_lookup_returns_a_transfers_stages_in_order(tmp_path):
+    path = str(tmp_path / 'transfers.journal')
+    write(path, ('locked', FIRST), ('transfer_initiated', SECOND), ('minted', FIRST))
+    reader = TransferJournalReader(path)
+    assert [record['stage'] for record in reader.lookup(FIRST)] == ['locked', 'minted']
+    assert reader.status(SECOND)['stage'] == 'transfer_initiated'
+    assert reader.lookup(uuid.uuid4().bytes) == []
+    reader.close()
+
+
+def test_reader_only_reads_new_index_entries(tmp_path):
+    path = str(tmp_path / 'transfers.journal')
+    write(path, ('locked', FIRST))
+    reader = TransferJournalReader(path)
+    assert len(reader.lookup(FIRST)) == 1
+    read_pos = reader._index_read_pos
+    write(path, ('minted', FIRST))
+    assert [record['stage'] for record in reader.lookup(FIRST)] == ['locked', 'minted']
+    assert reader._index_read_pos == read_pos + INDEX_ENTRY.size
+    reader.close()
+
+
+def test_partial_index_entry_is_skipped_until_complete(tmp_path):
+    path = str(tmp_path / 'transfers.journal')
+    write(path, ('locked', FIRST))
+    entry = INDEX_ENTRY.pack(FIRST, os.path.getsize(path))
+    with open(path, 'ab') as f:
+        f.write(json.dumps({'transferRequestId': FIRST.hex(), 'stage': 'minted'}).encode() + b'\n')
+    with open(path + '.idx', 'ab') as f:
+        f.write(entry[:5])
+    reader = TransferJournalReader(path)
+    assert len(reader.lookup(FIRST)) == 1
+    with open(path + '.idx', 'ab') as f:
+        f.write(entry[5:])
+    assert [record['stage'] for record in reader.lookup(FIRST)] == ['locked', 'minted']
+    reader.close()
+
+
+def test_reader_of_a_missing_journal_finds_nothing(tmp_path):
+    reader = TransferJournalReader(str(tmp_path / 'missing.journal'))
+    assert reader.lookup(FIRST) == []
+    assert not os.path.exists(tmp_path / 'missing.journal.idx')
+
+
+def test_subscribe_is_woken_by_the_writer(tmp_path):
+    path = str(tmp_path / 'transfers.journal')
+    journal = TransferJournal(path, use_flock=False, fsync_policy='never')
+    stop = threading.Event()
+    received = []
+
+    def consume():
+        for record in journal.subscribe(offset=0, poll_interval=5, stop_event=stop):
+            received.append(record['stage'])
+            stop.set()
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    journal.record('locked', FIRST)
+    consumer.join(timeout=2)
+    journal.close()
+    assert received == ['locked']
+
+
+def test_cli_prints_records_without_opening_the_journal_for_writing(tmp_path):
+    path = str(tmp_path / 'transfers.journal')
+    write(path, ('locked', FIRST))
+    os.chmod(path, 0o444)
+    os.chmod(path + '.idx', 0o444)
+    result = subprocess.run([sys.executable, '-m', 'utils.transferjournal', path, FIRST.hex()], cwd=SERVICE_DIR, capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout)['stage'] == 'locked'
@@ -0,0 +1,83 @@
+import sqlite3
+import uuid
+
+import pytest
+
+from utils.transferstore import TransferStore
+
+TRANSFER_ID = uuid.UUID('12345678-1234-5678-1234-567812345678').bytes
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TransferStore(str(tmp_path / 'transfers.db'))
+
+
+def test_duplicate_claim_is_refused(store):
+    assert store.claim(TRANSFER_ID, 'locked', direction='eth_to_bsc', amount=10, tx_hash='0x01')
+    assert not store.claim(TRANSFER_ID, 'locked', direction='eth_to_bsc', amount=10, tx_hash='0x01')
+    status = store.get(TRANSFER_ID)
+    assert status['stage'] == 'locked'
+    assert status['amount'] == '10'
+    assert len(status['transitions']) == 1
+
+
+def test_released_claim_can_be_claimed_again(store):
+    store.claim(TRANSFER_ID, 'locked')
+    assert store.release(TRANSFER_ID, 'locked')
+    assert store.get(TRANSFER_ID) is None
+    assert store.claim(TRANSFER_ID, 'locked')
+
+
+def test_claim_with_a_relay_transaction_is_not_released(store):
+    store.claim(TRANSFER_ID, 'locked')
+    store.set_relay_tx_hash(TRANSFER_ID, 'locked', '0xabc')
+    assert not store.release(TRANSFER_ID, 'locked')
+    assert store.in_flight() == [{'transfer_request_id': TRANSFER_ID.hex(), 'stage': 'locked', 'relay_tx_hash': '0xabc'}]
+    assert not store.claim(TRANSFER_ID, 'locked')
+
+
+def test_release_restores_the_previous_stage(store):
+    store.claim(TRANSFER_ID, 'locked')
+    store.complete(TRANSFER_ID, 'locked')
+    store.claim(TRANSFER_ID, 'minted')
+    store.release(TRANSFER_ID, 'minted')
+    assert store.get(TRANSFER_ID)['stage'] == 'locked'
+
+
+def test_claims_stay_in_flight_until_completed(store):
+    store.claim(TRANSFER_ID, 'locked')
+    store.set_relay_tx_hash(TRANSFER_ID, 'locked', '0xabc')
+    assert store.in_flight() == [{'transfer_request_id': TRANSFER_ID.hex(), 'stage': 'locked', 'relay_tx_hash': '0xabc'}]
+    assert store.get(TRANSFER_ID)['transitions'][0]['inFlight']
+    store.complete(TRANSFER_ID, 'locked')
+    assert store.in_flight() == []
+    assert not store.get(TRANSFER_ID)['transitions'][0]['inFlight']
+
+
+def test_transfer_ids_in_any_form_match(store):
+    store.claim(TRANSFER_ID, 'locked')
+    assert not store.claim('0x' + TRANSFER_ID.hex(), 'locked')
+    assert store.get(uuid.UUID(bytes=TRANSFER_ID)) is not None
+
+
+def test_stores_without_claim_state_are_migrated(tmp_path):
+    path = str(tmp_path / 'transfers.db')
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE transitions (
+            transfer_request_id TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            tx_hash TEXT,
+            relay_tx_hash TEXT,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (transfer_request_id, stage)
+        ) WITHOUT ROWID;
+    ''')
+    conn.execute("INSERT INTO transitions VALUES (?, 'locked', NULL, '0xabc', 1)", (TRANSFER_ID.hex(),))
+    conn.commit()
+    conn.close()
+    store = TransferStore(path)
+    # Rows written before the migration were finished stages
+    assert store.in_flight() == []
+    assert not store.claim(TRANSFER_ID, 'locked')
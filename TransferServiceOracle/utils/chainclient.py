@@ -0,0 +1,260 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import AsyncWeb3, Web3
+from .metrics import counter, histogram
+
+# Keep-alive connections kept open per node, shared by every Web3 instance and batch request in the process
+RPC_POOL_SIZE = int(os.getenv('RPC_POOL_SIZE', '20'))
+# Transient RPC failures (connection errors, timeouts, 429 and 5xx) are retried with jittered exponential backoff
+RPC_RETRIES = int(os.getenv('RPC_RETRIES', '3'))
+RPC_RETRY_BACKOFF = float(os.getenv('RPC_RETRY_BACKOFF', '0.25'))
+RPC_TIMEOUT = float(os.getenv('RPC_TIMEOUT', '10'))
+# Hardhat build output, resolved from the repository root so it does not depend on the working directory
+ARTIFACTS_DIR = os.getenv('ARTIFACTS_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'artifacts', 'contracts'))
+
+# Environment variable holding each chain's node URL
+NODE_URL_ENV = {
+    'ethereum': 'ETHEREUM_NODE_URL',
+    'bsc': 'BSC_NODE_URL',
+}
+
+# contract name -> (chain it is deployed on, environment variable holding its address)
+CONTRACTS = {
+    'ERC20Lock': ('ethereum', 'ERC20_LOCK_ADDRESS'),
+    'BEP20Mintable': ('bsc', 'BEP20_MINTABLE_ADDRESS'),
+    'BurnAndReleaseCoordinator': ('bsc', 'BURN_AND_RELEASE_COORDINATOR_ADDRESS'),
+}
+
+# Sending a transaction twice is never safe to retry blindly, the nonce handling in utils.nonces deals with it
+NON_RETRYABLE_METHODS = {'eth_sendRawTransaction', 'eth_sendTransaction'}
+
+rpc_requests = counter('oracle_rpc_requests', 'JSON-RPC requests sent, by chain, method and outcome', ('chain', 'method', 'outcome'))
+rpc_latency = histogram('oracle_rpc_request_duration_seconds', 'JSON-RPC request latency, by chain and method', ('chain', 'method'))
+
+_lock = threading.RLock()
+_sessions = {}
+# aiohttp sessions are bound to the event loop that created them: loop -> {url: session}
+_async_sessions = weakref.WeakKeyDictionary()
+_abis = {}
+_web3s = {}
+_async_web3s = {}
+_contracts = {}
+
+
+def node_url(chain_name):
+    # Read on use, so a .env loaded after this module was imported is still picked up
+    return os.getenv(NODE_URL_ENV[chain_name])
+
+
+def chain_for_url(url):
+    for chain_name in NODE_URL_ENV:
+        if node_url(chain_name) == url:
+            return chain_name
+    return url
+
+
+def observe_rpc(chain_name, method, started, outcome):
+    rpc_requests.labels(chain_name, method, outcome).inc()
+    rpc_latency.labels(chain_name, method).observe(time.perf_counter() - started)
+
+
+def backoff_delay(attempt, base=None):
+    """Full-jitter exponential backoff: a random delay in [0, base * 2^attempt]."""
+    return random.uniform(0, (RPC_RETRY_BACKOFF if base is None else base) * 2 ** attempt)
+
+
+def is_transient(error):
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return False
+
+
+def http_session(url):
+    """Keep-alive session for a node URL, with a connection pool of RPC_POOL_SIZE."""
+    with _lock:
+        session = _sessions.get(url)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=RPC_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[url] = session
+        return session
+
+
+def async_http_session(url):
+    """Keep-alive aiohttp session for a node URL on the running event loop, with a connection pool of RPC_POOL_SIZE."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        sessions = _async_sessions.setdefault(loop, {})
+        session = sessions.get(url)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=RPC_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(total=RPC_TIMEOUT),
+                raise_for_status=True,
+            )
+            sessions[url] = session
+        return session
+
+
+class PooledAsyncHTTPProvider(AsyncWeb3.AsyncHTTPProvider):
+    """AsyncHTTPProvider on the shared pooled session of its event loop, instead of web3's default unbounded one."""
+
+    _session_loop = None
+
+    async def make_request(self, method, params):
+        loop = asyncio.get_running_loop()
+        if self._session_loop is not loop:
+            await self.cache_async_session(async_http_session(self.endpoint_uri))
+            self._session_loop = loop
+        return await super().make_request(method, params)
+
+
+def retry_middleware(make_request, web3_instance):
+    def middleware(method, params):
+        if method in NON_RETRYABLE_METHODS:
+            return make_request(method, params)
+        for attempt in range(RPC_RETRIES + 1):
+            try:
+                return make_request(method, params)
+            except Exception as e:
+                if attempt == RPC_RETRIES or not is_transient(e):
+                    raise
+                time.sleep(backoff_delay(attempt))
+    return middleware
+
+
+async def async_retry_middleware(make_request, web3_instance):
+    async def middleware(method, params):
+        if method in NON_RETRYABLE_METHODS:
+            return await make_request(method, params)
+        for attempt in range(RPC_RETRIES + 1):
+            try:
+                return await make_request(method, params)
+            except Exception as e:
+                if attempt == RPC_RETRIES or not is_transient(e):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+    return middleware
+
+
+def metrics_middleware(chain_name):
+    # Inside the retry middleware, so every attempt is counted
+    def middleware_factory(make_request, web3_instance):
+        def middleware(method, params):
+            started = time.perf_counter()
+            try:
+                response = make_request(method, params)
+            except Exception:
+                observe_rpc(chain_name, method, started, 'exception')
+                raise
+            observe_rpc(chain_name, method, started, 'error' if 'error' in response else 'ok')
+            return response
+        return middleware
+    return middleware_factory
+
+
+def async_metrics_middleware(chain_name):
+    async def middleware_factory(make_request, web3_instance):
+        async def middleware(method, params):
+            started = time.perf_counter()
+            try:
+                response = await make_request(method, params)
+            except Exception:
+                observe_rpc(chain_name, method, started, 'exception')
+                raise
+            observe_rpc(chain_name, method, started, 'error' if 'error' in response else 'ok')
+            return response
+        return middleware
+    return middleware_factory
+
+
+def load_abi(contract_name):
+    """ABI of a compiled contract, parsed once per process."""
+    with _lock:
+        abi = _abis.get(contract_name)
+        if abi is None:
+            with open(os.path.join(ARTIFACTS_DIR, f'{contract_name}.sol', f'{contract_name}.json'), 'r') as file:
+                abi = json.load(file)['abi']
+            _abis[contract_name] = abi
+        return abi
+
+
+def get_web3(chain_name):
+    """The process-wide Web3 instance of a chain, on the shared session and with transient errors retried."""
+    with _lock:
+        web3_instance = _web3s.get(chain_name)
+        if web3_instance is None:
+            url = node_url(chain_name)
+            web3_instance = Web3(Web3.HTTPProvider(url, request_kwargs={'timeout': RPC_TIMEOUT}, session=http_session(url)))
+            web3_instance.middleware_onion.add(metrics_middleware(chain_name), 'metrics')
+            web3_instance.middleware_onion.add(retry_middleware, 'retry')
+            _web3s[chain_name] = web3_instance
+        return web3_instance
+
+
+def get_async_web3(chain_name):
+    """The process-wide AsyncWeb3 instance of a chain, on a pooled session and with transient errors retried."""
+    with _lock:
+        web3_instance = _async_web3s.get(chain_name)
+        if web3_instance is None:
+            web3_instance = AsyncWeb3(PooledAsyncHTTPProvider(node_url(chain_name), request_kwargs={'timeout': aiohttp.ClientTimeout(total=RPC_TIMEOUT)}))
+            web3_instance.middleware_onion.add(async_metrics_middleware(chain_name), 'metrics')
+            web3_instance.middleware_onion.add(async_retry_middleware, 'retry')
+            _async_web3s[chain_name] = web3_instance
+        return web3_instance
+
+
+class Lazy:
+    """
+    Stands in for an object that is only built the first time one of its
+    attributes is used, e.g. lazy(get_contract, 'ERC20Lock'). Modules can
+    keep their web3 and contract globals while importing them stays free of
+    artifact parsing and provider setup.
+    """
+
+    def __init__(self, factory, *args, **kwargs):
+        self._factory = factory
+        self._args = args
+        self._kwargs = kwargs
+        self._target = None
+
+    def resolve(self):
+        if self._target is None:
+            self._target = self._factory(*self._args, **self._kwargs)
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+
+def lazy(factory, *args, **kwargs):
+    return Lazy(factory, *args, **kwargs)
+
+
+def get_contract(contract_name, asynchronous=False):
+    """Contract object bound to the chain the contract is deployed on, built on first use and then shared."""
+    key = (contract_name, asynchronous)
+    with _lock:
+        contract = _contracts.get(key)
+        if contract is None:
+            chain_name, address_env = CONTRACTS[contract_name]
+            web3_instance = get_async_web3(chain_name) if asynchronous else get_web3(chain_name)
+            contract = web3_instance.eth.contract(address=os.getenv(address_env), abi=load_abi(contract_name))
+            _contracts[key] = contract
+        return contract
@@ -0,0 +1,40 @@
+import json
+import os
+import threading
+
+
+class BlockCheckpoint:
+    """
+    Durable "last processed block" per chain, stored as a small JSON file.
+    Writes go to a temporary file first and are swapped in with os.replace so a
+    crash mid-write never leaves a truncated checkpoint behind.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._blocks = self._read()
+
+    def _read(self):
+        if not os.path.isfile(self.file_path):
+            return {}
+        try:
+            with open(self.file_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Checkpoint] Ignoring unreadable checkpoint file {self.file_path}: {e}")
+            return {}
+
+    def load(self, chain_name):
+        with self._lock:
+            return self._blocks.get(chain_name)
+
+    def save(self, chain_name, block_number):
+        with self._lock:
+            self._blocks[chain_name] = block_number
+            tmp_path = self.file_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._blocks, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.file_path)
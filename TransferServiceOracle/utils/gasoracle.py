@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+
+# Percentile of priority fees paid in recent blocks to target, and how many blocks of history to sample
+GAS_PRICE_PERCENTILE = float(os.getenv('GAS_PRICE_PERCENTILE', '50'))
+GAS_HISTORY_BLOCKS = int(os.getenv('GAS_HISTORY_BLOCKS', '10'))
+# Headroom on maxFeePerGas, as a multiple of the next block's base fee
+GAS_BASE_FEE_MULTIPLIER = float(os.getenv('GAS_BASE_FEE_MULTIPLIER', '2'))
+# Minimum seconds between two block number checks, samples are refreshed at most once per new block
+GAS_ORACLE_REFRESH_INTERVAL = float(os.getenv('GAS_ORACLE_REFRESH_INTERVAL', '3'))
+
+_oracles = {}
+_oracles_lock = threading.Lock()
+
+
+class GasOracle:
+    """
+    Cached gas pricing for one chain, sampled from eth_feeHistory once per block.
+    On chains with a base fee, tx_params() returns EIP-1559 maxFeePerGas and
+    maxPriorityFeePerGas; otherwise it falls back to a legacy gasPrice.
+    gas_price() is the expected effective price per gas, for fee estimates.
+    """
+
+    def __init__(self, web3_instance, chain_name, percentile=GAS_PRICE_PERCENTILE, history_blocks=GAS_HISTORY_BLOCKS,
+                 base_fee_multiplier=GAS_BASE_FEE_MULTIPLIER, refresh_interval=GAS_ORACLE_REFRESH_INTERVAL):
+        self.web3 = web3_instance
+        self.chain_name = chain_name
+        self.percentile = percentile
+        self.history_blocks = history_blocks
+        self.base_fee_multiplier = base_fee_multiplier
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._block = None
+        self._checked_at = 0
+        self._params = None
+        self._effective_gas_price = None
+
+    def _refresh(self):
+        with self._lock:
+            now = time.time()
+            if self._params is not None and now - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = now
+            block = self.web3.eth.block_number
+            if block == self._block:
+                return
+            self._sample()
+            self._block = block
+
+    def _sample(self):
+        try:
+            history = self.web3.eth.fee_history(self.history_blocks, 'latest', [self.percentile])
+        except Exception:
+            history = None
+
+        # The last entry of baseFeePerGas is the base fee of the next block
+        next_base_fee = history['baseFeePerGas'][-1] if history and history.get('baseFeePerGas') else 0
+        if next_base_fee:
+            rewards = sorted(reward[0] for reward in history.get('reward') or [] if reward)
+            priority_fee = rewards[len(rewards) // 2] if rewards else self.web3.eth.max_priority_fee
+            self._params = {
+                'maxFeePerGas': int(next_base_fee * self.base_fee_multiplier) + priority_fee,
+                'maxPriorityFeePerGas': priority_fee,
+            }
+            self._effective_gas_price = next_base_fee + priority_fee
+        else:
+            gas_price = self.web3.eth.gas_price
+            self._params = {'gasPrice': gas_price}
+            self._effective_gas_price = gas_price
+
+    def tx_params(self):
+        self._refresh()
+        return dict(self._params)
+
+    def gas_price(self):
+        self._refresh()
+        return self._effective_gas_price
+
+
+def get_gas_oracle(web3_instance, chain_name):
+    with _oracles_lock:
+        oracle = _oracles.get(chain_name)
+        if oracle is None:
+            oracle = GasOracle(web3_instance, chain_name)
+            _oracles[chain_name] = oracle
+        return oracle
@@ -0,0 +1,130 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows, no advisory locks
+    fcntl = None
+
+FSYNC_ALWAYS = 'always'      # fsync after every group commit
+FSYNC_INTERVAL = 'interval'  # fsync at most once per fsync_interval seconds
+FSYNC_NEVER = 'never'        # leave flushing to the OS
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Appends items to a file from a dedicated writer thread. enqueue() only puts
+    the item on an in-memory queue; the writer drains whatever has accumulated
+    and commits it with a single O_APPEND write, so producers never wait on disk
+    or on other writers. When use_flock is set, each group commit holds an OS
+    advisory lock on the file for cross-process exclusion.
+    """
+
+    def __init__(self, file_path, fsync_policy=FSYNC_INTERVAL, fsync_interval=1.0, use_flock=True, max_batch=1024):
+        self.file_path = file_path
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.use_flock = use_flock and fcntl is not None
+        self.max_batch = max_batch
+        self._fd = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._last_fsync = time.time()
+        self._dirty = False
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def enqueue(self, item):
+        self._queue.put(item)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._commit(batch)
+            except Exception as e:
+                print(f"[Journal] Error writing {len(batch)} records to {self.file_path}: {e}")
+            if stop:
+                break
+        if self._dirty:
+            self._fsync()
+
+    def _encode(self, batch):
+        return ''.join(line + '\n' for line in batch).encode('utf-8')
+
+    def _append(self, batch):
+        self._write_all(self._fd, self._encode(batch))
+
+    def _write_all(self, fd, data):
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+
+    def _fsync(self):
+        os.fsync(self._fd)
+
+    def _commit(self, batch):
+        if self.use_flock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._append(batch)
+            self._dirty = True
+            now = time.time()
+            if self.fsync_policy == FSYNC_ALWAYS or (self.fsync_policy == FSYNC_INTERVAL and now - self._last_fsync >= self.fsync_interval):
+                self._fsync()
+                self._last_fsync = now
+                self._dirty = False
+        finally:
+            if self.use_flock:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        # Flushes everything queued so far before closing the file
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class CompletionJournal(logging.Handler):
+    """
+    logging handler backed by a GroupCommitWriter, so logging a completion
+    record never blocks the caller.
+    """
+
+    def __init__(self, file_path, **writer_options):
+        super().__init__()
+        self.writer = GroupCommitWriter(file_path, **writer_options)
+
+    def emit(self, record):
+        try:
+            self.writer.enqueue(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.writer.close()
+        super().close()
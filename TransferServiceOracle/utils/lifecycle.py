@@ -0,0 +1,48 @@
+import threading
+import time
+
+# Set once to stop every service loop in the process, the loops wait on it instead of sleeping
+stop_flag = threading.Event()
+
+
+class Service:
+    """
+    One long-running part of the oracle, with an explicit lifecycle.
+    Constructing a Service does no work; start() runs target(*args) on a
+    daemon thread, stop() sets the shared stop_flag and join() waits for the
+    thread to return. Targets are expected to poll stop_flag and return once
+    it is set; on_stop can wake a target that is blocked on something else.
+    """
+
+    def __init__(self, name, target, args=(), on_stop=None):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.on_stop = on_stop
+        self.thread = None
+        self.started_at = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            self.target(*self.args)
+        except Exception as e:
+            print(f"[Service] {self.name} stopped with an error: {e}")
+
+    def stop(self):
+        stop_flag.set()
+        if self.on_stop is not None:
+            self.on_stop()
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
@@ -0,0 +1,214 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from eth_utils import encode_hex, event_abi_to_log_topic
+
+
+def find_event_abi(contract, event_name):
+    for entry in contract.abi:
+        if entry.get('type') == 'event' and entry.get('name') == event_name:
+            return entry
+    raise ValueError(f"Event {event_name} not found in ABI of {contract.address}")
+
+
+class BlockCadence:
+    """
+    Decides how long to wait before the next eth_blockNumber check on one chain.
+    The chain's block time is learned as a moving average of the observed
+    interval between new heads, and the next check is scheduled for when the
+    next block is expected. Every check that finds no new block after that
+    point backs off exponentially, up to max_interval, so an idle chain (or a
+    dev node that only mines on demand) is checked less and less often.
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=30.0, smoothing=0.2, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.backoff = backoff
+        self.block_time = None
+        self._head = None
+        self._head_seen_at = None
+        self._misses = 0
+
+    def observe(self, head):
+        now = time.monotonic()
+        if self._head is None:
+            self._head, self._head_seen_at = head, now
+            return
+        if head > self._head:
+            interval = (now - self._head_seen_at) / (head - self._head)
+            if self.block_time is None:
+                self.block_time = interval
+            else:
+                self.block_time += self.smoothing * (interval - self.block_time)
+            self._head, self._head_seen_at = head, now
+            self._misses = 0
+        else:
+            self._misses += 1
+
+    def delay(self):
+        if self.block_time is None:
+            return self.min_interval
+        until_next_block = self._head_seen_at + self.block_time - time.monotonic()
+        if until_next_block > self.min_interval:
+            return min(until_next_block, self.max_interval)
+        # The block is due or late: check again soon, backing off for every check that found nothing
+        delay = self.min_interval * self.backoff ** self._misses
+        return max(self.min_interval, min(delay, self.max_interval))
+
+
+class LogPoller:
+    """
+    Watches a set of (contract, event) pairs on a single chain and fetches all of
+    them with one eth_getLogs request per new block range, instead of creating a
+    filter per event on every pass.
+
+    When a checkpoint is given, the poller resumes from the last committed block
+    after a restart. Missed ranges are split into chunks of at most
+    max_block_range blocks and fetched in parallel, backfill_workers chunks per
+    poll, until the poller has caught up with the chain head.
+
+    poll() costs a single eth_blockNumber call unless a new block has arrived.
+    next_poll_delay() tells the caller when to poll again, following this
+    chain's own block time.
+    """
+
+    def __init__(self, web3_instance, chain_name, checkpoint=None, max_block_range=2000, backfill_workers=4,
+                 min_poll_interval=0.5, max_poll_interval=30.0):
+        self.web3 = web3_instance
+        self.chain_name = chain_name
+        self.checkpoint = checkpoint
+        self.max_block_range = max_block_range
+        self.backfill_workers = backfill_workers
+        self.last_block = None
+        self.caught_up = True
+        self.cadence = BlockCadence(min_poll_interval, max_poll_interval)
+        self._pending_block = None
+        self._executor = None
+        self._routes = {}
+        self._addresses = []
+        self._topics = []
+
+    def watch(self, contract, event_name, handler):
+        topic = event_abi_to_log_topic(find_event_abi(contract, event_name))
+        address = contract.address.lower()
+        self._routes[(address, topic)] = (contract.events[event_name](), handler)
+        if contract.address not in self._addresses:
+            self._addresses.append(contract.address)
+        if encode_hex(topic) not in self._topics:
+            self._topics.append(encode_hex(topic))
+
+    def _start_block(self, head):
+        saved = self.checkpoint.load(self.chain_name) if self.checkpoint else None
+        if saved is None:
+            # Nothing to resume from, same starting point as createFilter(fromBlock='latest')
+            if self.checkpoint:
+                self.checkpoint.save(self.chain_name, head)
+            return head
+        if saved < head:
+            print(f"[LogPoller] {self.chain_name}: resuming from block {saved + 1}, {head - saved} blocks behind head")
+        return saved
+
+    def _plan_ranges(self, head):
+        """Returns the block ranges to fetch next, or an empty list when already at head."""
+        self.cadence.observe(head)
+        if self.last_block is None:
+            self.last_block = self._start_block(head)
+        if head <= self.last_block:
+            self.caught_up = True
+            return []
+        to_block = min(head, self.last_block + self.max_block_range * self.backfill_workers)
+        self._pending_block = to_block
+        self.caught_up = to_block >= head
+        return self._split_range(self.last_block + 1, to_block)
+
+    def poll(self):
+        """
+        Returns a list of (decoded_event, handler) for logs emitted since the last
+        committed block. Call commit() once the events have been handled.
+        """
+        ranges = self._plan_ranges(self.web3.eth.block_number)
+        if not ranges:
+            return []
+        if len(ranges) == 1:
+            logs = self.get_logs(*ranges[0])
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.backfill_workers)
+            # map() keeps chunk order, so logs stay sorted by block and log index
+            chunks = self._executor.map(lambda block_range: self.get_logs(*block_range), ranges)
+            logs = [log for chunk in chunks for log in chunk]
+        return self.decode(logs)
+
+    def next_poll_delay(self):
+        """Seconds to wait before the next poll(), 0 while still catching up."""
+        if not self.caught_up:
+            return 0
+        return self.cadence.delay()
+
+    def commit(self, up_to=None):
+        """
+        Marks the range returned by the last poll() as processed, or only the
+        blocks up to up_to when an event after it could not be handled. The
+        blocks after up_to are fetched again by the next poll().
+        """
+        if self._pending_block is None:
+            return
+        block = self._pending_block if up_to is None else min(up_to, self._pending_block)
+        if block < self._pending_block:
+            self.caught_up = False
+        self._pending_block = None
+        if block <= self.last_block:
+            return
+        self.last_block = block
+        if self.checkpoint:
+            self.checkpoint.save(self.chain_name, self.last_block)
+
+    def _split_range(self, from_block, to_block):
+        ranges = []
+        start = from_block
+        while start <= to_block:
+            end = min(start + self.max_block_range - 1, to_block)
+            ranges.append((start, end))
+            start = end + 1
+        return ranges
+
+    def get_logs(self, from_block, to_block):
+        return self.web3.eth.get_logs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': self._addresses,
+            'topics': [self._topics],
+        })
+
+    def decode(self, logs):
+        routed = []
+        for log in logs:
+            if not log['topics']:
+                continue
+            route = self._routes.get((log['address'].lower(), bytes(log['topics'][0])))
+            if route is None:
+                continue
+            event, handler = route
+            routed.append((event.process_log(log), handler))
+        return routed
+
+
+class AsyncLogPoller(LogPoller):
+    """LogPoller for an AsyncWeb3 provider, catch-up ranges are fetched concurrently on the event loop."""
+
+    async def poll(self):
+        ranges = self._plan_ranges(await self.web3.eth.block_number)
+        if not ranges:
+            return []
+        chunks = await asyncio.gather(*(self.get_logs(*block_range) for block_range in ranges))
+        return self.decode([log for chunk in chunks for log in chunk])
+
+    async def get_logs(self, from_block, to_block):
+        return await self.web3.eth.get_logs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': self._addresses,
+            'topics': [self._topics],
+        })
@@ -0,0 +1,201 @@
+import os
+import threading
+from concurrent.futures import Future
+from eth_utils import to_bytes, to_hex
+from web3._utils.abi import get_abi_output_types
+from .rpcbatch import batch_request, RPCError
+
+# Multicall3 is deployed at the same address on Ethereum, BSC and most other EVM chains
+MULTICALL3_ADDRESS = os.getenv('MULTICALL3_ADDRESS', '0xcA11bde05977b3631167028862bE2a173976CA11')
+# aggregate3((address target, bool allowFailure, bytes callData)[]) returns (bool success, bytes returnData)[]
+AGGREGATE3_SELECTOR = bytes.fromhex('82ad56cb')
+# Seconds reads are held back to be grouped with others, and the most reads sent in one round trip
+READ_BATCH_WINDOW = float(os.getenv('READ_BATCH_WINDOW', '0.005'))
+READ_BATCH_MAX_SIZE = int(os.getenv('READ_BATCH_MAX_SIZE', '100'))
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def _to_int(result):
+    return int(result, 16)
+
+
+def _block_param(block_identifier):
+    return hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+
+
+class _ContractRead:
+    def __init__(self, future, address, data, output_types, block_identifier):
+        self.future = future
+        self.address = address
+        self.data = data
+        self.output_types = output_types
+        self.block_identifier = block_identifier
+
+
+class _RPCRead:
+    def __init__(self, future, method, params, formatter):
+        self.future = future
+        self.method = method
+        self.params = params
+        self.formatter = formatter
+
+
+class ReadBatcher:
+    """
+    Groups the reads issued on one chain within a short window into a single
+    round trip. View calls are packed into one Multicall3 aggregate3 eth_call
+    (or sent as individual eth_calls when Multicall3 is not deployed on the
+    chain), and travel in the same JSON-RPC batch as plain reads such as
+    eth_gasPrice, eth_getBalance and eth_getTransactionCount.
+
+    Every read returns a concurrent.futures.Future, so a caller can issue all
+    the reads it needs before waiting on any of them.
+    """
+
+    def __init__(self, web3_instance, node_url, chain_name, window=READ_BATCH_WINDOW, max_batch=READ_BATCH_MAX_SIZE,
+                 multicall_address=MULTICALL3_ADDRESS):
+        self.web3 = web3_instance
+        self.node_url = node_url
+        self.chain_name = chain_name
+        self.window = window
+        self.max_batch = max_batch
+        self.multicall_address = multicall_address
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._full = threading.Event()
+        self._thread = None
+        self._multicall_deployed = None
+
+    def _submit(self, read):
+        with self._lock:
+            self._pending.append(read)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'ReadBatcher-{self.chain_name}', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+            self._wakeup.set()
+        return read.future
+
+    def call(self, contract_function, block_identifier='latest'):
+        """Future of what contract_function.call() would return."""
+        return self._submit(_ContractRead(
+            Future(),
+            contract_function.address,
+            to_bytes(hexstr=contract_function._encode_transaction_data()),
+            get_abi_output_types(contract_function.abi),
+            block_identifier,
+        ))
+
+    def rpc(self, method, params, formatter=None):
+        return self._submit(_RPCRead(Future(), method, params, formatter))
+
+    def gas_price(self):
+        return self.rpc('eth_gasPrice', [], _to_int)
+
+    def get_balance(self, address, block_identifier='latest'):
+        return self.rpc('eth_getBalance', [address, _block_param(block_identifier)], _to_int)
+
+    def get_transaction_count(self, address, block_identifier='pending'):
+        return self.rpc('eth_getTransactionCount', [address, _block_param(block_identifier)], _to_int)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Give concurrent callers the window to add their reads, unless the batch is already full
+            self._full.wait(self.window)
+            with self._lock:
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+                if not self._pending:
+                    self._wakeup.clear()
+                if len(self._pending) < self.max_batch:
+                    self._full.clear()
+            try:
+                self._flush(batch)
+            except Exception as e:
+                for read in batch:
+                    if not read.future.done():
+                        read.future.set_exception(e)
+
+    def _has_multicall(self):
+        if self._multicall_deployed is None:
+            code = batch_request(self.node_url, [('eth_getCode', [self.multicall_address, 'latest'])])[0]
+            self._multicall_deployed = not isinstance(code, RPCError) and code not in (None, '0x', '0x0')
+            if not self._multicall_deployed:
+                print(f"[ReadBatcher] Multicall3 not deployed on {self.chain_name}, batching eth_calls as JSON-RPC")
+        return self._multicall_deployed
+
+    def _flush(self, batch):
+        contract_reads = [read for read in batch if isinstance(read, _ContractRead)]
+        aggregated = [read for read in contract_reads if read.block_identifier == 'latest']
+        if len(aggregated) < 2 or not self._has_multicall():
+            aggregated = []
+        calls = []
+        resolvers = []
+        if aggregated:
+            calls.append(('eth_call', [{'to': self.multicall_address, 'data': self._encode_aggregate(aggregated)}, 'latest']))
+            resolvers.append(lambda result: self._resolve_aggregate(aggregated, result))
+        for read in contract_reads:
+            if read not in aggregated:
+                calls.append(self._eth_call(read))
+                resolvers.append(lambda result, read=read: self._resolve_call(read, result))
+        for read in batch:
+            if isinstance(read, _RPCRead):
+                calls.append((read.method, read.params))
+                resolvers.append(lambda result, read=read: self._resolve_rpc(read, result))
+
+        for resolve, result in zip(resolvers, batch_request(self.node_url, calls)):
+            resolve(result)
+
+    def _eth_call(self, read):
+        return ('eth_call', [{'to': read.address, 'data': to_hex(read.data)}, _block_param(read.block_identifier)])
+
+    def _encode_aggregate(self, reads):
+        encoded = self.web3.codec.encode(['(address,bool,bytes)[]'], [[(read.address, True, read.data) for read in reads]])
+        return to_hex(AGGREGATE3_SELECTOR + encoded)
+
+    def _resolve_aggregate(self, reads, result):
+        if isinstance(result, RPCError):
+            # The aggregate itself failed, fall back to one eth_call per read
+            for read, call_result in zip(reads, batch_request(self.node_url, [self._eth_call(read) for read in reads])):
+                self._resolve_call(read, call_result)
+            return
+        (returns,) = self.web3.codec.decode(['(bool,bytes)[]'], to_bytes(hexstr=result))
+        for read, (success, return_data) in zip(reads, returns):
+            if success:
+                self._set_decoded(read, return_data)
+            else:
+                read.future.set_exception(RPCError(f"Call to {read.address} reverted: {to_hex(return_data)}"))
+
+    def _resolve_call(self, read, result):
+        if isinstance(result, RPCError):
+            read.future.set_exception(result)
+        else:
+            self._set_decoded(read, to_bytes(hexstr=result))
+
+    def _set_decoded(self, read, return_data):
+        try:
+            values = self.web3.codec.decode(read.output_types, return_data)
+        except Exception as e:
+            read.future.set_exception(e)
+            return
+        read.future.set_result(values[0] if len(values) == 1 else list(values))
+
+    def _resolve_rpc(self, read, result):
+        if isinstance(result, RPCError):
+            read.future.set_exception(result)
+        else:
+            read.future.set_result(read.formatter(result) if read.formatter else result)
+
+
+def get_read_batcher(web3_instance, node_url, chain_name):
+    with _batchers_lock:
+        batcher = _batchers.get(chain_name)
+        if batcher is None:
+            batcher = ReadBatcher(web3_instance, node_url, chain_name)
+            _batchers[chain_name] = batcher
+        return batcher
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+# Node errors meaning our local nonce view is stale (another sender used it, or the node restarted)
+NONCE_RESYNC_ERRORS = ('nonce too low', 'replacement transaction underpriced', 'replacement underpriced')
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+class NonceManager:
+    """
+    Hands out nonces for one signer on one chain. The pending transaction count
+    is read from the node once, after that nonces are allocated locally so many
+    transactions from the same account can be in flight at once. The same
+    counter is shared by the threaded and the asyncio senders.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self._lock = threading.Lock()
+        self._next_nonce = None
+        # Keeps allocate-sign-send in nonce order for asyncio senders, created on first async use
+        self.send_lock = None
+
+    def allocate_local(self, pending_count=None):
+        """Returns the next nonce, or None if the manager has not been synced with the node yet."""
+        with self._lock:
+            if self._next_nonce is None:
+                if pending_count is None:
+                    return None
+                self._next_nonce = pending_count
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    def allocate(self, web3_instance):
+        nonce = self.allocate_local()
+        if nonce is None:
+            # The node is queried outside the lock, a concurrent sync that lands first wins
+            nonce = self.allocate_local(web3_instance.eth.get_transaction_count(self.address, 'pending'))
+        return nonce
+
+    async def allocate_async(self, async_web3_instance):
+        nonce = self.allocate_local()
+        if nonce is None:
+            nonce = self.allocate_local(await async_web3_instance.eth.get_transaction_count(self.address, 'pending'))
+        return nonce
+
+    def resync(self):
+        # Re-read from the node on the next allocation
+        with self._lock:
+            self._next_nonce = None
+
+
+def get_nonce_manager(chain_name, address):
+    key = (chain_name, address.lower())
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = NonceManager(address)
+            _managers[key] = manager
+        return manager
+
+
+def is_nonce_error(error):
+    message = str(error).lower()
+    return any(text in message for text in NONCE_RESYNC_ERRORS)
+
+
+def send_transaction(web3_instance, chain_name, contract_function, tx_params, private_key, retries=3):
+    """
+    Builds, signs and sends a contract call using a locally allocated nonce.
+    Retries with a fresh nonce when the node reports the nonce as already used.
+    """
+    manager = get_nonce_manager(chain_name, tx_params['from'])
+    for attempt in range(retries):
+        nonce = manager.allocate(web3_instance)
+        try:
+            tx = contract_function.build_transaction({**tx_params, 'nonce': nonce})
+            signed_tx = web3_instance.eth.account.sign_transaction(tx, private_key=private_key)
+            return web3_instance.eth.send_raw_transaction(signed_tx.rawTransaction)
+        except Exception as e:
+            # The allocated nonce was not consumed, so the local counter is ahead of the node
+            manager.resync()
+            if is_nonce_error(e) and attempt < retries - 1:
+                print(f"[NonceManager] Nonce conflict for {tx_params['from']} on {chain_name}, resyncing: {e}")
+                continue
+            raise
+
+
+async def async_send_transaction(async_web3_instance, chain_name, contract_function, tx_params, private_key, retries=3):
+    """
+    Asyncio counterpart of send_transaction. The transaction is built without
+    holding any lock, then nonce allocation, signing and sending happen under a
+    per-signer lock so transactions reach the node in nonce order.
+    """
+    manager = get_nonce_manager(chain_name, tx_params['from'])
+    if manager.send_lock is None:
+        manager.send_lock = asyncio.Lock()
+    # Placeholder nonce so build_transaction does not query the node for one
+    tx = await contract_function.build_transaction({**tx_params, 'nonce': 0})
+    for attempt in range(retries):
+        async with manager.send_lock:
+            tx['nonce'] = await manager.allocate_async(async_web3_instance)
+            try:
+                signed_tx = async_web3_instance.eth.account.sign_transaction(tx, private_key=private_key)
+                return await async_web3_instance.eth.send_raw_transaction(signed_tx.rawTransaction)
+            except Exception as e:
+                manager.resync()
+                if is_nonce_error(e) and attempt < retries - 1:
+                    print(f"[NonceManager] Nonce conflict for {tx_params['from']} on {chain_name}, resyncing: {e}")
+                    continue
+                raise
@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from eth_account import Account
+from hexbytes import HexBytes
+
+# Signing processes (0 signs on the dispatcher thread), and the most receipts sent to a worker in one batch
+RECEIPT_SIGNER_PROCESSES = int(os.getenv('RECEIPT_SIGNER_PROCESSES', str(os.cpu_count() or 1)))
+RECEIPT_SIGNER_BATCH_SIZE = int(os.getenv('RECEIPT_SIGNER_BATCH_SIZE', '64'))
+# Workers are spawned: importing the service modules has no side effects, and the pool is created after the
+# service threads are running, which forking does not handle safely
+RECEIPT_SIGNER_START_METHOD = os.getenv('RECEIPT_SIGNER_START_METHOD', 'spawn')
+
+_STOP = object()
+
+# Accounts loaded once per worker process by the pool initializer
+_worker_accounts = None
+
+
+def load_accounts(private_keys):
+    return {key_name: Account.from_key(private_key) for key_name, private_key in private_keys.items() if private_key}
+
+
+# The contracts recover the signer with a bare ecrecover over the 32-byte receiptMessage, without the EIP-191
+# prefix, so the hash is signed as is. eth-account renamed _sign_hash to unsafe_sign_hash in 0.13
+_sign_hash = getattr(Account, 'unsafe_sign_hash', None) or Account._sign_hash
+
+
+def sign_receipts(accounts, batch):
+    """Signs [(receipt_id, key_name, message hash)] and returns [(receipt_id, signature hex)], skipping unknown keys."""
+    signatures = []
+    for receipt_id, key_name, message in batch:
+        account = accounts.get(key_name)
+        if account is None:
+            continue
+        signatures.append((receipt_id, _sign_hash(HexBytes(message), private_key=account.key).signature.hex()))
+    return signatures
+
+
+def _init_worker(private_keys):
+    global _worker_accounts
+    _worker_accounts = load_accounts(private_keys)
+
+
+def _sign_batch(batch):
+    return sign_receipts(_worker_accounts, batch)
+
+
+class ReceiptSigner:
+    """
+    Signs receipts in a process pool so ECDSA and keccak run on every core
+    instead of holding the GIL on the listener threads. submit() only queues
+    the message; a dispatcher thread groups queued messages into batches for
+    the workers, and each signed receipt is passed to on_signed(receipt_id,
+    receipt) from the pool's result thread. Workers load their private keys
+    once, in the pool initializer.
+    """
+
+    def __init__(self, private_keys, on_signed, processes=RECEIPT_SIGNER_PROCESSES, batch_size=RECEIPT_SIGNER_BATCH_SIZE,
+                 start_method=RECEIPT_SIGNER_START_METHOD):
+        self.on_signed = on_signed
+        self.processes = processes
+        self.batch_size = batch_size
+        self._accounts = load_accounts(private_keys)
+        self._pending = {}  # receipt_id -> receipt fields waiting for their signature
+        self._pending_lock = threading.Condition()
+        self._queue = queue.SimpleQueue()
+        self._executor = None
+        if processes > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context(start_method),
+                initializer=_init_worker,
+                initargs=(private_keys,),
+            )
+        # Bounds the batches in flight, so a burst accumulates into larger batches instead of many small ones
+        self._in_flight = threading.BoundedSemaphore(max(processes, 1) * 2)
+        self._thread = threading.Thread(target=self._run, name='ReceiptSigner', daemon=True)
+        self._thread.start()
+
+    def submit(self, receipt_id, key_name, message, receipt):
+        """Queues a receipt for signing; returns False if it is already waiting to be signed."""
+        with self._pending_lock:
+            if receipt_id in self._pending:
+                return False
+            self._pending[receipt_id] = receipt
+        self._queue.put((receipt_id, key_name, message))
+        return True
+
+    def is_pending(self, receipt_id):
+        with self._pending_lock:
+            return receipt_id in self._pending
+
+    def wait_idle(self, timeout=None):
+        """Blocks until every submitted receipt has been signed and handed to on_signed."""
+        with self._pending_lock:
+            return self._pending_lock.wait_for(lambda: not self._pending, timeout)
+
+    def pending_count(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            self._in_flight.acquire()
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+            if stop:
+                break
+
+    def _dispatch(self, batch):
+        if self._executor is None:
+            self._complete(batch, sign_receipts(self._accounts, batch))
+            return
+        try:
+            future = self._executor.submit(_sign_batch, batch)
+        except Exception as e:
+            print(f"[ReceiptSigner] Signing pool unavailable ({e}), signing {len(batch)} receipts in process")
+            self._complete(batch, sign_receipts(self._accounts, batch))
+            return
+        future.add_done_callback(lambda f: self._collect(batch, f))
+
+    def _collect(self, batch, future):
+        try:
+            signatures = future.result()
+        except Exception as e:
+            print(f"[ReceiptSigner] Signing batch of {len(batch)} receipts failed in the pool ({e}), signing in process")
+            signatures = sign_receipts(self._accounts, batch)
+        self._complete(batch, signatures)
+
+    def _complete(self, batch, signatures):
+        try:
+            for receipt_id, signature in signatures:
+                with self._pending_lock:
+                    receipt = self._pending.get(receipt_id)
+                if receipt is None:
+                    continue
+                try:
+                    self.on_signed(receipt_id, dict(receipt, receipt=signature))
+                except Exception as e:
+                    print(f"[ReceiptSigner] Error storing signed receipt {receipt_id}: {e}")
+            # Receipts stay pending until stored, so a replayed event is never signed twice.
+            # Receipts that could not be signed (no key configured) are dropped.
+            with self._pending_lock:
+                for receipt_id, _, _ in batch:
+                    self._pending.pop(receipt_id, None)
+                self._pending_lock.notify_all()
+        finally:
+            self._in_flight.release()
+
+    def close(self):
+        # Signs everything submitted so far before shutting the pool down
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# On-disk receipt history, and the size / lifetime of the in-memory tier serving recent receipts
+RECEIPT_STORE_FILE = os.getenv('RECEIPT_STORE_FILE', './receipts.db')
+RECEIPT_CACHE_SIZE = int(os.getenv('RECEIPT_CACHE_SIZE', '10000'))
+RECEIPT_CACHE_TTL = float(os.getenv('RECEIPT_CACHE_TTL', '3600'))
+
+_MISSING = object()
+
+
+class ReceiptStore:
+    """
+    Two-tier store of signed receipts. Every receipt is persisted to SQLite,
+    whose primary-key index survives restarts, so nothing has to be re-signed
+    or reloaded on startup. Recent receipts are also kept in a bounded LRU
+    dict with a TTL, so /collect/ hits for them never touch the disk; older
+    receipts are read from SQLite and promoted back into memory.
+    """
+
+    def __init__(self, db_path=RECEIPT_STORE_FILE, capacity=RECEIPT_CACHE_SIZE, ttl=RECEIPT_CACHE_TTL):
+        self.db_path = db_path
+        self.capacity = capacity
+        self.ttl = ttl
+        self._hot = OrderedDict()  # receipt_id -> (expires_at, receipt)
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def _conn(self):
+        # Caller holds self._lock. The database is opened on first use, not when the store is created at import time
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS receipts (
+                    receipt_id TEXT PRIMARY KEY,
+                    receipt TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+        return self._db
+
+    def _cache(self, receipt_id, receipt):
+        # Caller holds self._lock
+        self._hot[receipt_id] = (time.monotonic() + self.ttl, receipt)
+        self._hot.move_to_end(receipt_id)
+        while len(self._hot) > self.capacity:
+            self._hot.popitem(last=False)
+
+    def put(self, receipt_id, receipt):
+        data = json.dumps(receipt, separators=(',', ':'))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO receipts (receipt_id, receipt, created_at) VALUES (?, ?, ?)',
+                (receipt_id, data, time.time()),
+            )
+            self._cache(receipt_id, receipt)
+
+    def _get_hot(self, receipt_id):
+        # Caller holds self._lock
+        entry = self._hot.get(receipt_id)
+        if entry is None:
+            return _MISSING
+        expires_at, receipt = entry
+        if expires_at < time.monotonic():
+            del self._hot[receipt_id]
+            return _MISSING
+        self._hot.move_to_end(receipt_id)
+        return receipt
+
+    def get(self, receipt_id):
+        """Returns the receipt, or None if it was never stored."""
+        with self._lock:
+            receipt = self._get_hot(receipt_id)
+            if receipt is not _MISSING:
+                return receipt
+            row = self._conn.execute('SELECT receipt FROM receipts WHERE receipt_id = ?', (receipt_id,)).fetchone()
+            if row is None:
+                return None
+            receipt = json.loads(row[0])
+            self._cache(receipt_id, receipt)
+            return receipt
+
+    def get_many(self, receipt_ids):
+        """Returns {receipt_id: receipt} for the ids that are stored, with one query for all disk-tier misses."""
+        found = {}
+        with self._lock:
+            cold = []
+            for receipt_id in receipt_ids:
+                receipt = self._get_hot(receipt_id)
+                if receipt is _MISSING:
+                    cold.append(receipt_id)
+                else:
+                    found[receipt_id] = receipt
+            # Stay below SQLite's default limit on bound parameters
+            for start in range(0, len(cold), 500):
+                chunk = cold[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT receipt_id, receipt FROM receipts WHERE receipt_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for receipt_id, data in rows:
+                    receipt = json.loads(data)
+                    self._cache(receipt_id, receipt)
+                    found[receipt_id] = receipt
+        return found
+
+    def __contains__(self, receipt_id):
+        with self._lock:
+            if self._get_hot(receipt_id) is not _MISSING:
+                return True
+            return self._conn.execute('SELECT 1 FROM receipts WHERE receipt_id = ?', (receipt_id,)).fetchone() is not None
+
+    def hot_size(self):
+        with self._lock:
+            return len(self._hot)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import Future
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from .rpcbatch import batch_request, RPCError
+
+# Receipt fields that are hex quantities, 32-byte hashes and addresses in a raw JSON-RPC receipt
+RECEIPT_QUANTITIES = ('blockNumber', 'cumulativeGasUsed', 'effectiveGasPrice', 'gasUsed', 'status', 'transactionIndex', 'type')
+RECEIPT_HASHES = ('blockHash', 'transactionHash', 'logsBloom', 'root')
+RECEIPT_ADDRESSES = ('contractAddress', 'from', 'to')
+LOG_QUANTITIES = ('blockNumber', 'logIndex', 'transactionIndex')
+LOG_HASHES = ('blockHash', 'transactionHash', 'data')
+
+
+def _format_fields(raw, quantities, hashes, addresses=('address',)):
+    formatted = dict(raw)
+    for field in quantities:
+        if isinstance(formatted.get(field), str):
+            formatted[field] = int(formatted[field], 16)
+    for field in hashes:
+        if formatted.get(field) is not None:
+            formatted[field] = HexBytes(formatted[field])
+    for field in addresses:
+        if formatted.get(field):
+            formatted[field] = Web3.to_checksum_address(formatted[field])
+    return formatted
+
+
+def format_receipt(raw):
+    """
+    Converts a raw eth_getTransactionReceipt result fetched in a batch to the
+    shape web3's get_transaction_receipt returns: ints for quantities,
+    HexBytes for hashes, checksummed addresses, attribute access throughout.
+    """
+    receipt = _format_fields(raw, RECEIPT_QUANTITIES, RECEIPT_HASHES, RECEIPT_ADDRESSES)
+    receipt['logs'] = [
+        dict(_format_fields(log, LOG_QUANTITIES, LOG_HASHES), topics=[HexBytes(topic) for topic in log.get('topics', [])])
+        for log in raw.get('logs') or []
+    ]
+    return AttributeDict.recursive(receipt)
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+class _TrackedTransaction:
+    def __init__(self, future, deadline):
+        self.future = future
+        self.deadline = deadline
+        self.submitted_at = time.time()
+
+
+def report_stuck_transaction(chain_name, tx_hash, waited):
+    print(f"[ReceiptTracker] Transaction {tx_hash} on {chain_name} not mined after {int(waited)}s")
+
+
+class ReceiptTracker:
+    """
+    Waits for the receipts of many transactions on one chain at once. A single
+    background thread checks the block number every poll_interval seconds and,
+    when a new block has arrived, fetches the receipts of all outstanding
+    transactions with one JSON-RPC batch request.
+
+    track() returns a concurrent.futures.Future resolved with the receipt, or
+    failed with TimeoutError once the transaction's timeout expires, after the
+    on_stuck hook has been called for it.
+    """
+
+    def __init__(self, web3_instance, node_url, chain_name, poll_interval=1.0, default_timeout=600, on_stuck=report_stuck_transaction):
+        self.web3 = web3_instance
+        self.node_url = node_url
+        self.chain_name = chain_name
+        self.poll_interval = poll_interval
+        self.default_timeout = default_timeout
+        self.on_stuck = on_stuck
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_block = None
+        self._has_new = False
+
+    def track(self, tx_hash, timeout=None):
+        # Accepts the bytes send_raw_transaction returns as well as hex strings
+        tx_hash = HexBytes(tx_hash).hex()
+        future = Future()
+        deadline = time.time() + (timeout or self.default_timeout)
+        with self._lock:
+            self._pending[tx_hash] = _TrackedTransaction(future, deadline)
+            self._has_new = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        # Checked right away instead of after the rest of the current poll_interval
+        self._wakeup.set()
+        return future
+
+    def wait(self, tx_hash, timeout=None):
+        """Blocking helper, equivalent to waitForTransactionReceipt but sharing the batched poll."""
+        return self.track(tx_hash, timeout).result()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                if not self._pending:
+                    continue
+                has_new = self._has_new
+                self._has_new = False
+            try:
+                block = self.web3.eth.block_number
+                # Receipts only change when a block is mined, newly tracked hashes get one check right away
+                if block != self._last_block or has_new:
+                    self._last_block = block
+                    self._poll_receipts()
+            except Exception as e:
+                print(f"[ReceiptTracker] Error polling receipts on {self.chain_name}: {e}")
+            self._expire()
+
+    def _poll_receipts(self):
+        with self._lock:
+            tx_hashes = list(self._pending)
+        results = batch_request(self.node_url, [('eth_getTransactionReceipt', [tx_hash]) for tx_hash in tx_hashes])
+        for tx_hash, result in zip(tx_hashes, results):
+            if result is None or isinstance(result, RPCError):
+                continue
+            with self._lock:
+                tracked = self._pending.pop(tx_hash, None)
+            if tracked:
+                tracked.future.set_result(format_receipt(result))
+
+    def _expire(self):
+        now = time.time()
+        with self._lock:
+            expired = [(tx_hash, tracked) for tx_hash, tracked in self._pending.items() if tracked.deadline <= now]
+            for tx_hash, _ in expired:
+                del self._pending[tx_hash]
+        for tx_hash, tracked in expired:
+            if self.on_stuck:
+                self.on_stuck(self.chain_name, tx_hash, now - tracked.submitted_at)
+            tracked.future.set_exception(TimeoutError(f"Transaction {tx_hash} not mined in time"))
+
+
+def get_receipt_tracker(web3_instance, node_url, chain_name):
+    with _trackers_lock:
+        tracker = _trackers.get(chain_name)
+        if tracker is None:
+            tracker = ReceiptTracker(web3_instance, node_url, chain_name)
+            _trackers[chain_name] = tracker
+        return tracker
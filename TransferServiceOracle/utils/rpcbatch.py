@@ -0,0 +1,49 @@
+import time
+from .chainclient import http_session, backoff_delay, is_transient, chain_for_url, observe_rpc, rpc_requests, RPC_RETRIES
+
+
+class RPCError(Exception):
+    pass
+
+
+def batch_request(node_url, calls, timeout=10):
+    """
+    Sends several JSON-RPC calls in a single HTTP request. calls is a list of
+    (method, params) tuples. Returns the results in the same order, with an
+    RPCError in place of the result for calls the node answered with an error.
+    """
+    if not calls:
+        return []
+    payload = [
+        {'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params}
+        for request_id, (method, params) in enumerate(calls)
+    ]
+    chain_name = chain_for_url(node_url)
+    # Batches only carry reads, so transient failures are retried; the session is the one the node's Web3 instance uses
+    for attempt in range(RPC_RETRIES + 1):
+        started = time.perf_counter()
+        try:
+            response = http_session(node_url).post(node_url, json=payload, timeout=timeout)
+            response.raise_for_status()
+            observe_rpc(chain_name, 'batch', started, 'ok')
+            break
+        except Exception as e:
+            observe_rpc(chain_name, 'batch', started, 'exception')
+            if attempt == RPC_RETRIES or not is_transient(e):
+                raise
+            time.sleep(backoff_delay(attempt))
+    replies = response.json()
+    if isinstance(replies, dict):
+        # Some nodes answer a rejected batch with a single error object
+        raise RPCError(replies.get('error', replies))
+
+    results = [RPCError('No reply for request')] * len(calls)
+    for reply in replies:
+        if 'error' in reply:
+            results[reply['id']] = RPCError(reply['error'])
+        else:
+            results[reply['id']] = reply.get('result')
+    # The round trip is timed as 'batch' above, the calls it carried are counted one by one
+    for (method, _), result in zip(calls, results):
+        rpc_requests.labels(chain_name, method, 'error' if isinstance(result, RPCError) else 'ok').inc()
+    return results
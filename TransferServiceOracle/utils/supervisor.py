@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+# Delay before restarting a crashed service process, doubled on every crash in a row up to the maximum
+SUPERVISOR_RESTART_BACKOFF = float(os.getenv('SUPERVISOR_RESTART_BACKOFF', '1'))
+SUPERVISOR_MAX_RESTART_BACKOFF = float(os.getenv('SUPERVISOR_MAX_RESTART_BACKOFF', '60'))
+# A process that stayed up this long counts as healthy again, its next crash restarts it after the initial backoff
+SUPERVISOR_STABLE_AFTER = float(os.getenv('SUPERVISOR_STABLE_AFTER', '60'))
+# Seconds between health reports of a service process, and silence after which it is considered hung and restarted
+SUPERVISOR_HEALTH_INTERVAL = float(os.getenv('SUPERVISOR_HEALTH_INTERVAL', '5'))
+SUPERVISOR_HEALTH_TIMEOUT = float(os.getenv('SUPERVISOR_HEALTH_TIMEOUT', '60'))
+# Seconds a service process gets to shut down after SIGTERM before it is killed
+SUPERVISOR_STOP_TIMEOUT = float(os.getenv('SUPERVISOR_STOP_TIMEOUT', '15'))
+
+
+def report_health(health_queue, name, **status):
+    """Called from a service process to tell the supervisor it is alive, with any extra status."""
+    try:
+        health_queue.put_nowait({'name': name, 'pid': os.getpid(), 'time': time.time(), **status})
+    except Exception:
+        pass  # The supervisor is gone or its queue is full, the next report will try again
+
+
+class _Child:
+    def __init__(self, name, target, args):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.process = None
+        self.started_at = None
+        self.last_report = None
+        self.last_report_at = None
+        self.restarts = 0
+        self.crashes_in_a_row = 0
+        self.restart_at = None
+
+
+class Supervisor:
+    """
+    Runs each service in its own process and keeps it running. A process that
+    exits while the supervisor is not stopping is restarted after a backoff
+    that doubles with every crash in a row and resets once the process stays
+    up for stable_after seconds. Service processes report their health over a
+    queue, target(name, health_queue, *args), and one that stops reporting for
+    health_timeout seconds is terminated and restarted.
+
+    stop() sends SIGTERM to every process, waits up to stop_timeout for them
+    to shut down cleanly and kills whatever is left.
+    """
+
+    def __init__(self, start_method='spawn', restart_backoff=SUPERVISOR_RESTART_BACKOFF,
+                 max_restart_backoff=SUPERVISOR_MAX_RESTART_BACKOFF, stable_after=SUPERVISOR_STABLE_AFTER,
+                 health_timeout=SUPERVISOR_HEALTH_TIMEOUT, stop_timeout=SUPERVISOR_STOP_TIMEOUT):
+        self.context = multiprocessing.get_context(start_method)
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.stable_after = stable_after
+        self.health_timeout = health_timeout
+        self.stop_timeout = stop_timeout
+        self.health_queue = self.context.Queue()
+        self._children = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def add(self, name, target, args=()):
+        self._children[name] = _Child(name, target, args)
+
+    def start(self):
+        with self._lock:
+            for child in self._children.values():
+                self._spawn(child)
+        self._thread = threading.Thread(target=self._monitor, name='Supervisor', daemon=True)
+        self._thread.start()
+
+    def _spawn(self, child):
+        # Caller holds self._lock
+        child.process = self.context.Process(
+            target=child.target, args=(child.name, self.health_queue, *child.args), name=child.name,
+        )
+        child.process.start()
+        child.started_at = time.monotonic()
+        child.last_report_at = child.started_at
+        child.restart_at = None
+        print(f"[Supervisor] Started {child.name} (pid {child.process.pid})")
+
+    def _receive_reports(self, timeout):
+        try:
+            report = self.health_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            child = self._children.get(report['name'])
+            # Reports still queued by a process that has since been replaced are ignored
+            if child is not None and child.process is not None and report['pid'] == child.process.pid:
+                child.last_report = report
+                child.last_report_at = time.monotonic()
+            try:
+                report = self.health_queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _monitor(self):
+        while not self._stopping.is_set():
+            self._receive_reports(timeout=1)
+            if self._stopping.is_set():
+                break
+            now = time.monotonic()
+            with self._lock:
+                for child in self._children.values():
+                    self._check(child, now)
+
+    def _check(self, child, now):
+        # Caller holds self._lock
+        if child.restart_at is not None:
+            if now >= child.restart_at:
+                child.restarts += 1
+                self._spawn(child)
+            return
+        if child.process.is_alive():
+            if now - child.last_report_at > self.health_timeout:
+                print(f"[Supervisor] {child.name} (pid {child.process.pid}) sent no health report for {now - child.last_report_at:.0f} seconds, restarting it")
+                child.process.terminate()
+                child.process.join(self.stop_timeout)
+                if child.process.is_alive():
+                    child.process.kill()
+                    child.process.join()
+            else:
+                return
+        child.process.join()
+        if now - child.started_at >= self.stable_after:
+            child.crashes_in_a_row = 0
+        delay = min(self.max_restart_backoff, self.restart_backoff * 2 ** child.crashes_in_a_row)
+        child.crashes_in_a_row += 1
+        child.restart_at = now + delay
+        print(f"[Supervisor] {child.name} exited with code {child.process.exitcode}, restarting in {delay:.1f} seconds")
+
+    def health(self):
+        """Per service: pid, whether it is running, restarts so far, uptime and the last report it sent."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                child.name: {
+                    'pid': child.process.pid if child.process else None,
+                    'alive': bool(child.process and child.process.is_alive()),
+                    'restarts': child.restarts,
+                    'uptime': now - child.started_at if child.started_at and child.restart_at is None else 0,
+                    'last_report_age': now - child.last_report_at if child.last_report_at else None,
+                    'last_report': child.last_report,
+                }
+                for child in self._children.values()
+            }
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            running = [child for child in self._children.values() if child.process and child.process.is_alive()]
+            for child in running:
+                child.process.terminate()
+            deadline = time.monotonic() + self.stop_timeout
+            for child in running:
+                child.process.join(max(0, deadline - time.monotonic()))
+                if child.process.is_alive():
+                    print(f"[Supervisor] {child.name} did not stop within {self.stop_timeout} seconds, killing it")
+                    child.process.kill()
+                    child.process.join()
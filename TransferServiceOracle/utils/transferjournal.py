@@ -0,0 +1,200 @@
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import uuid
+from .journal import GroupCommitWriter
+
+# Index entry: 16-byte transferRequestId followed by the record's byte offset in the journal
+INDEX_ENTRY = struct.Struct('>16sQ')
+
+STAGE_LOCKED = 'locked'
+STAGE_MINTED = 'minted'
+STAGE_TRANSFER_INITIATED = 'transfer_initiated'
+STAGE_BURN_INITIATED = 'burn_initiated'
+STAGE_RELEASED = 'released'
+STAGE_RELEASE_FAILED = 'release_failed'
+STAGE_COMPLETED = 'completed'
+STAGE_RETURNED = 'returned'
+
+
+def transfer_request_id_bytes(transfer_request_id):
+    """Normalizes a bytes16 / hex string / UUID transferRequestId to its 16 raw bytes."""
+    if isinstance(transfer_request_id, uuid.UUID):
+        return transfer_request_id.bytes
+    if isinstance(transfer_request_id, (bytes, bytearray)):
+        return bytes(transfer_request_id).ljust(16, b'\0')[:16]
+    text = str(transfer_request_id).lower()
+    if text.startswith('0x'):
+        text = text[2:]
+    return bytes.fromhex(text.replace('-', '')).ljust(16, b'\0')[:16]
+
+
+class TransferJournalReader:
+    """
+    Read-only view of a TransferJournal, for processes that only query it.
+    The index and journal files are kept open; every lookup first reads the
+    index entries appended since the previous one, so it costs a dict lookup
+    plus one seek per stage record, whatever the size of the history. Records
+    are written before their index entries, so an entry never points at a
+    partial record.
+    """
+
+    def __init__(self, file_path, index_path=None, committed=None):
+        self.file_path = file_path
+        self.index_path = index_path or file_path + '.idx'
+        # Notified by a writer in the same process after every commit, wakes subscribers right away
+        self._committed = committed
+        self._index = {}
+        self._index_read_pos = 0
+        self._index_file = None
+        self._journal_file = None
+        self._lock = threading.Lock()
+
+    def _refresh_index(self):
+        if self._index_file is None:
+            if not os.path.exists(self.index_path):
+                return
+            self._index_file = open(self.index_path, 'rb')
+        self._index_file.seek(self._index_read_pos)
+        data = self._index_file.read()
+        # Ignore a trailing partial entry that is still being written
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        for transfer_id, offset in INDEX_ENTRY.iter_unpack(data[:usable]):
+            self._index.setdefault(transfer_id, []).append(offset)
+        self._index_read_pos += usable
+
+    def lookup(self, transfer_request_id):
+        """Returns every stage record of a transfer, oldest first."""
+        with self._lock:
+            self._refresh_index()
+            offsets = self._index.get(transfer_request_id_bytes(transfer_request_id), [])
+            if not offsets:
+                return []
+            if self._journal_file is None:
+                self._journal_file = open(self.file_path, 'rb')
+            records = []
+            for offset in offsets:
+                self._journal_file.seek(offset)
+                records.append(json.loads(self._journal_file.readline()))
+        return records
+
+    def status(self, transfer_request_id):
+        """Returns the latest stage record of a transfer, or None if it was never seen."""
+        records = self.lookup(transfer_request_id)
+        return records[-1] if records else None
+
+    def tail(self, offset=0):
+        """Yields (next_offset, record) for every complete record from offset to the current end of the journal."""
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                yield offset, json.loads(line)
+
+    def subscribe(self, offset=None, poll_interval=0.5, stop_event=None):
+        """
+        Yields only records appended after offset (default: the current end of the
+        journal), waiting for new ones. Commits from a writer in this process wake
+        subscribers right away, other commits are picked up every poll_interval.
+        """
+        if offset is None:
+            offset = os.path.getsize(self.file_path)
+        while stop_event is None or not stop_event.is_set():
+            found = False
+            for offset, record in self.tail(offset):
+                found = True
+                yield record
+            if found:
+                continue
+            if self._committed is not None:
+                with self._committed:
+                    self._committed.wait(poll_interval)
+            elif stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+
+    def close(self):
+        with self._lock:
+            for f in (self._index_file, self._journal_file):
+                if f is not None:
+                    f.close()
+            self._index_file = self._journal_file = None
+
+
+class TransferJournal(GroupCommitWriter):
+    """
+    Append-only JSON-lines journal with one record per transfer stage, and a
+    compact side index of fixed-size (transferRequestId, offset) entries.
+    Queries go through a TransferJournalReader over the same files; processes
+    that only read the journal use a TransferJournalReader of their own.
+    """
+
+    def __init__(self, file_path, index_path=None, **writer_options):
+        self.index_path = index_path or file_path + '.idx'
+        self._index_fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._committed = threading.Condition()
+        self.reader = TransferJournalReader(file_path, self.index_path, self._committed)
+        super().__init__(file_path, **writer_options)
+
+    def record(self, stage, transfer_request_id, direction=None, amount=None, tx_hash=None, **fields):
+        self.enqueue({
+            'transferRequestId': transfer_request_id_bytes(transfer_request_id).hex(),
+            'stage': stage,
+            'direction': direction,
+            'amount': amount,
+            'txHash': tx_hash,
+            'timestamp': time.time(),
+            **fields,
+        })
+
+    def _append(self, batch):
+        # Under the file lock, so the end of file is where this batch really lands
+        offset = os.lseek(self._fd, 0, os.SEEK_END)
+        lines = []
+        entries = []
+        for record in batch:
+            line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+            entries.append(INDEX_ENTRY.pack(bytes.fromhex(record['transferRequestId']), offset))
+            lines.append(line)
+            offset += len(line)
+        self._write_all(self._fd, b''.join(lines))
+        self._write_all(self._index_fd, b''.join(entries))
+        with self._committed:
+            self._committed.notify_all()
+
+    def _fsync(self):
+        os.fsync(self._fd)
+        os.fsync(self._index_fd)
+
+    def close(self):
+        super().close()
+        self.reader.close()
+        if self._index_fd is not None:
+            os.close(self._index_fd)
+            self._index_fd = None
+
+    def lookup(self, transfer_request_id):
+        return self.reader.lookup(transfer_request_id)
+
+    def status(self, transfer_request_id):
+        return self.reader.status(transfer_request_id)
+
+    def tail(self, offset=0):
+        return self.reader.tail(offset)
+
+    def subscribe(self, offset=None, poll_interval=0.5, stop_event=None):
+        return self.reader.subscribe(offset, poll_interval, stop_event)
+
+
+if __name__ == '__main__':
+    # Usage: python -m utils.transferjournal <journal file> <transferRequestId>
+    reader = TransferJournalReader(sys.argv[1])
+    for stage_record in reader.lookup(sys.argv[2]):
+        print(json.dumps(stage_record))
+    reader.close()
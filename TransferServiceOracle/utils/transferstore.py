@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import threading
+import time
+from .transferjournal import transfer_request_id_bytes
+
+# Lifecycle store shared by the relayer (writer) and the receipt API (reader)
+TRANSFER_STORE_FILE = os.getenv('TRANSFER_STORE_FILE', './transfers.db')
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class TransferStore:
+    """
+    Embedded SQLite store of transfer lifecycles, keyed by transferRequestId.
+    Every stage a transfer goes through is a row keyed by (transferRequestId,
+    stage), so claiming a stage is a single primary-key insert that fails for a
+    duplicate event. The transfers table keeps the latest stage for status queries.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS transfers (
+                transfer_request_id TEXT PRIMARY KEY,
+                direction TEXT,
+                amount TEXT,
+                stage TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS transitions (
+                transfer_request_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                tx_hash TEXT,
+                relay_tx_hash TEXT,
+                state TEXT NOT NULL DEFAULT 'done',
+                created_at REAL NOT NULL,
+                PRIMARY KEY (transfer_request_id, stage)
+            ) WITHOUT ROWID;
+        ''')
+        # Stores created before claims had a state only hold finished stages
+        columns = [row['name'] for row in self._conn.execute('PRAGMA table_info(transitions)')]
+        if 'state' not in columns:
+            self._conn.execute("ALTER TABLE transitions ADD COLUMN state TEXT NOT NULL DEFAULT 'done'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS transitions_in_flight ON transitions (state) WHERE state = 'in_flight'")
+
+    def claim(self, transfer_request_id, stage, direction=None, amount=None, tx_hash=None):
+        """
+        Records that a transfer reached a stage, in flight until complete() is
+        called. Returns False, without changing anything, if the stage was
+        already recorded, i.e. the event is a duplicate.
+        """
+        transfer_id = transfer_request_id_bytes(transfer_request_id).hex()
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO transitions (transfer_request_id, stage, tx_hash, state, created_at) VALUES (?, ?, ?, 'in_flight', ?)",
+                    (transfer_id, stage, tx_hash, now),
+                ).rowcount
+                if inserted:
+                    self._conn.execute(
+                        '''INSERT INTO transfers (transfer_request_id, direction, amount, stage, created_at, updated_at)
+                           VALUES (?, ?, ?, ?, ?, ?)
+                           ON CONFLICT(transfer_request_id) DO UPDATE SET stage = excluded.stage, updated_at = excluded.updated_at''',
+                        (transfer_id, direction, None if amount is None else str(amount), stage, now, now),
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return bool(inserted)
+
+    def release(self, transfer_request_id, stage):
+        """
+        Undoes a claim whose action failed, so the same event is handled again
+        when seen next. A claim with a relay transaction is kept in flight and
+        False is returned: handling the event again would send a second one.
+        """
+        transfer_id = transfer_request_id_bytes(transfer_request_id).hex()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                released = self._conn.execute(
+                    'DELETE FROM transitions WHERE transfer_request_id = ? AND stage = ? AND relay_tx_hash IS NULL',
+                    (transfer_id, stage),
+                ).rowcount
+                if released:
+                    latest = self._conn.execute(
+                        'SELECT stage, created_at FROM transitions WHERE transfer_request_id = ? ORDER BY created_at DESC LIMIT 1',
+                        (transfer_id,),
+                    ).fetchone()
+                    if latest is None:
+                        self._conn.execute('DELETE FROM transfers WHERE transfer_request_id = ?', (transfer_id,))
+                    else:
+                        self._conn.execute(
+                            'UPDATE transfers SET stage = ?, updated_at = ? WHERE transfer_request_id = ?',
+                            (latest['stage'], latest['created_at'], transfer_id),
+                        )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return bool(released)
+
+    def set_relay_tx_hash(self, transfer_request_id, stage, relay_tx_hash):
+        transfer_id = transfer_request_id_bytes(transfer_request_id).hex()
+        with self._lock:
+            self._conn.execute(
+                'UPDATE transitions SET relay_tx_hash = ? WHERE transfer_request_id = ? AND stage = ?',
+                (relay_tx_hash, transfer_id, stage),
+            )
+
+    def complete(self, transfer_request_id, stage):
+        """Marks a claimed stage as handled, after which only a duplicate event can reach it again."""
+        transfer_id = transfer_request_id_bytes(transfer_request_id).hex()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE transitions SET state = 'done' WHERE transfer_request_id = ? AND stage = ?",
+                (transfer_id, stage),
+            )
+
+    def in_flight(self):
+        """Claims that were never completed or released, e.g. because the relayer crashed while handling them."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT transfer_request_id, stage, relay_tx_hash FROM transitions WHERE state = 'in_flight' ORDER BY created_at",
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stage_time(self, transfer_request_id, stage):
+        """When the transfer reached a stage, as a Unix timestamp, or None if it has not."""
+        transfer_id = transfer_request_id_bytes(transfer_request_id).hex()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT created_at FROM transitions WHERE transfer_request_id = ? AND stage = ?',
+                (transfer_id, stage),
+            ).fetchone()
+        return row[0] if row else None
+
+    def get(self, transfer_request_id):
+        """Returns the transfer's current stage and its stage history, or None if it is unknown."""
+        transfer_id = transfer_request_id_bytes(transfer_request_id).hex()
+        with self._lock:
+            transfer = self._conn.execute('SELECT * FROM transfers WHERE transfer_request_id = ?', (transfer_id,)).fetchone()
+            if transfer is None:
+                return None
+            transitions = self._conn.execute(
+                'SELECT * FROM transitions WHERE transfer_request_id = ? ORDER BY created_at',
+                (transfer_id,),
+            ).fetchall()
+        return {
+            'transferRequestId': transfer_id,
+            'direction': transfer['direction'],
+            'amount': transfer['amount'],
+            'stage': transfer['stage'],
+            'createdAt': transfer['created_at'],
+            'updatedAt': transfer['updated_at'],
+            'transitions': [
+                {
+                    'stage': transition['stage'],
+                    'txHash': transition['tx_hash'],
+                    'relayTxHash': transition['relay_tx_hash'],
+                    'inFlight': transition['state'] == 'in_flight',
+                    'timestamp': transition['created_at'],
+                }
+                for transition in transitions
+            ],
+        }
+
+
+def get_transfer_store(db_path=TRANSFER_STORE_FILE):
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = TransferStore(db_path)
+            _stores[db_path] = store
+        return store
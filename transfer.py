@@ -4,15 +4,15 @@ from dotenv import load_dotenv
 import time
 from datetime import datetime
 import requests
+import json
 import uuid
+from TransferServiceOracle.utils.receipttracker import get_receipt_tracker
+from TransferServiceOracle.utils.gasoracle import get_gas_oracle
+from TransferServiceOracle.utils.multicall import get_read_batcher
+from TransferServiceOracle.utils.chainclient import get_web3, get_contract
 # Load environment variables
 load_dotenv()
 
-def load_abi(file_path):
-    with open(file_path, 'r') as file:
-        contract_json = json.load(file)
-        return contract_json['abi']
-
 # Infura/Node URLs for Ethereum and Binance Smart Chain
 ETHEREUM_NODE_URL = os.getenv('ETHEREUM_NODE_URL')
 BSC_NODE_URL = os.getenv('BSC_NODE_URL')
@@ -24,36 +24,161 @@ BSC_CONTRACT_USER_PRIVATE_KEY = os.getenv('BSC_CONTRACT_USER_PRIVATE_KEY')
 ETH_CONTRACT_USER_ADDRESS = os.getenv('ETH_CONTRACT_USER_ADDRESS')  
 BSC_CONTRACT_USER_ADDRESS = os.getenv('BSC_CONTRACT_USER_ADDRESS')  
 
-# Initialize Web3 instances for Ethereum and BSC
-web3_eth = Web3(Web3.HTTPProvider(ETHEREUM_NODE_URL))
-web3_bsc = Web3(Web3.HTTPProvider(BSC_NODE_URL))
+# Receipt service, and how long a single long-poll for a receipt is held open by the server
+RECEIPT_SERVICE_URL = os.getenv('RECEIPT_SERVICE_URL', 'http://localhost:8000')
+RECEIPT_LONG_POLL_WAIT = float(os.getenv('RECEIPT_LONG_POLL_WAIT', '30'))
+# Batches of at least this many receipt ids are streamed back as NDJSON instead of one JSON document
+RECEIPT_BATCH_STREAM_THRESHOLD = int(os.getenv('RECEIPT_BATCH_STREAM_THRESHOLD', '500'))
+# Seconds collect_receipts keeps waiting for a batch before giving up on the receipts still missing
+RECEIPT_BATCH_TIMEOUT = float(os.getenv('RECEIPT_BATCH_TIMEOUT', '600'))
+# Receipt stream timeouts: connecting, and the longest silence between two lines (the server sends a keep-alive
+# comment every 15 seconds), then how many times a dropped stream is reopened before falling back to long-polling
+RECEIPT_STREAM_CONNECT_TIMEOUT = float(os.getenv('RECEIPT_STREAM_CONNECT_TIMEOUT', '10'))
+RECEIPT_STREAM_READ_TIMEOUT = float(os.getenv('RECEIPT_STREAM_READ_TIMEOUT', '45'))
+RECEIPT_STREAM_RECONNECTS = int(os.getenv('RECEIPT_STREAM_RECONNECTS', '3'))
+
+# Web3 instances for Ethereum and BSC, on pooled keep-alive sessions with transient RPC errors retried
+web3_eth = get_web3('ethereum')
+web3_bsc = get_web3('bsc')
 
-# ABI and contract addresses (Replace with actual ABI and contract addresses)
-ERC20_LOCK_ABI = load_abi('./artifacts/contracts/ERC20Lock.sol/ERC20Lock.json')  # Replace with the ABI of your ERC20Lock contract
+# Contract addresses (ABIs of the bridge contracts are loaded from the Hardhat artifacts by utils.chainclient)
 ERC20_LOCK_ADDRESS = os.getenv('ERC20_LOCK_ADDRESS')
-BEP20_ABI = load_abi('./artifacts/contracts/BEP20Mintable.sol/BEP20Mintable.json')  # Replace with the ABI of your BEP20Mintable contract
 BEP20_ADDRESS = os.getenv('BEP20_MINTABLE_ADDRESS')
 BURN_ESCROW_ADDRESS = os.getenv('BURN_ESCROW_ADDRESS')
 
 ERC20_TOKEN_TO_TRANSFER_ABI = [...]
-ERC20_TOKEN_TO_TRANSFER_ADDRESS = web3_eth.toChecksumAddress(os.getenv('ERC20_TOKEN_TO_TRANSFER_ADDRESS'))
+ERC20_TOKEN_TO_TRANSFER_ADDRESS = web3_eth.to_checksum_address(os.getenv('ERC20_TOKEN_TO_TRANSFER_ADDRESS'))
 
 erc20_token_contract = web3_eth.eth.contract(address=ERC20_TOKEN_TO_TRANSFER_ADDRESS, abi=ERC20_TOKEN_TO_TRANSFER_ABI)
-erc20_lock_contract = web3_eth.eth.contract(address=ERC20_LOCK_ADDRESS, abi=ERC20_LOCK_ABI)
-bep20_contract = web3_bsc.eth.contract(address=BEP20_ADDRESS, abi=BEP20_ABI)
+erc20_lock_contract = get_contract('ERC20Lock')
+bep20_contract = get_contract('BEP20Mintable')
+
+
+def wait_for_receipt(web3_instance, tx_hash):
+    # Receipts are polled in batches once per block, shared by every transaction waiting on the same chain
+    if web3_instance is web3_eth:
+        tracker = get_receipt_tracker(web3_eth, ETHEREUM_NODE_URL, 'ethereum')
+    else:
+        tracker = get_receipt_tracker(web3_bsc, BSC_NODE_URL, 'bsc')
+    return tracker.wait(tx_hash)
+
+def gas_params(web3_instance):
+    # Fee caps from the live per-chain gas oracle instead of a fixed gas price
+    if web3_instance is web3_eth:
+        return get_gas_oracle(web3_eth, 'ethereum').tx_params()
+    return get_gas_oracle(web3_bsc, 'bsc').tx_params()
+
+def stream_receipt(receipt_id, reconnects=RECEIPT_STREAM_RECONNECTS):
+    # Subscribes to the receipt's server-sent event stream, returns once the receipt event arrives.
+    # A stream that goes silent or drops is reopened, the server sends the receipt right away if it was signed meanwhile
+    url = f"{RECEIPT_SERVICE_URL}/collect/stream/{receipt_id}"
+    for attempt in range(reconnects + 1):
+        try:
+            with requests.get(url, stream=True, timeout=(RECEIPT_STREAM_CONNECT_TIMEOUT, RECEIPT_STREAM_READ_TIMEOUT)) as response:
+                response.raise_for_status()
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith('event:'):
+                        event = line[len('event:'):].strip()
+                    elif line.startswith('data:') and event == 'receipt':
+                        return json.loads(line[len('data:'):])
+            error = requests.exceptions.ConnectionError("Receipt stream closed before the receipt arrived")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            error = e
+        if attempt < reconnects:
+            print(f"Receipt stream interrupted ({error}), reconnecting...")
+            time.sleep(min(2 ** attempt, 10))
+    raise error
+
+def long_poll_receipt(receipt_id):
+    # Each request is held by the server until the receipt is signed or the wait expires
+    url = f"{RECEIPT_SERVICE_URL}/collect/"
+    payload = {'receipt_id': receipt_id, 'wait': RECEIPT_LONG_POLL_WAIT}
+    while True:
+        try:
+            response = requests.post(url, json=payload, timeout=RECEIPT_LONG_POLL_WAIT + 10)
+            if response.status_code == 200:
+                return response.json()
+            print("Receipt not signed yet, waiting again...")
+        except requests.exceptions.RequestException as e:
+            print(f"Error during the HTTP request: {e}")
+            time.sleep(1)
+
+def collect_receipt(receipt_id):
+    # The receipt is pushed as soon as it is signed, long-polling is the fallback if streaming is unavailable
+    try:
+        receipt_data = stream_receipt(receipt_id)
+    except requests.exceptions.RequestException as e:
+        print(f"Receipt stream unavailable ({e}), falling back to long-polling")
+        receipt_data = long_poll_receipt(receipt_id)
+    print(f"Receipt found: {receipt_data}")
+    return receipt_data
+
+def collect_receipts_batch(receipt_ids, wait):
+    # One request for the whole batch, returns ({receipt_id: receipt}, [missing receipt ids])
+    url = f"{RECEIPT_SERVICE_URL}/collect/batch"
+    payload = {'receipt_ids': receipt_ids, 'wait': wait}
+    if len(receipt_ids) < RECEIPT_BATCH_STREAM_THRESHOLD:
+        response = requests.post(url, json=payload, timeout=wait + 30)
+        response.raise_for_status()
+        result = response.json()
+        return result['receipts'], result['missing']
 
+    receipts = {}
+    missing = []
+    with requests.post(url, json=payload, headers={'Accept': 'application/x-ndjson'}, stream=True, timeout=(10, wait + 30)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            item = json.loads(line)
+            if 'missing' in item:
+                missing = item['missing']
+            else:
+                receipts[item['receipt_id']] = item['receipt']
+    return receipts, missing
+
+def collect_receipts(receipt_ids, timeout=RECEIPT_BATCH_TIMEOUT):
+    """
+    Collects many receipts with a handful of long-poll batch requests, each held
+    by the server until every missing receipt is signed or the wait expires.
+    Gives up after timeout seconds, returns ({receipt_id: receipt}, [missing receipt ids]).
+    """
+    receipts = {}
+    missing = list(dict.fromkeys(receipt_ids))
+    deadline = time.monotonic() + timeout
+    while missing:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"{len(receipts)} receipts collected, gave up on {len(missing)} after {timeout} seconds")
+            break
+        try:
+            found, missing = collect_receipts_batch(missing, min(RECEIPT_LONG_POLL_WAIT, remaining))
+            receipts.update(found)
+            if missing:
+                print(f"{len(receipts)} receipts collected, waiting for {len(missing)} more...")
+        except requests.exceptions.RequestException as e:
+            print(f"Error during the HTTP request: {e}")
+            time.sleep(min(1, max(0, deadline - time.monotonic())))
+    return receipts, missing
+
+def read_batcher(web3_instance):
+    # Reads issued together on a chain (view calls, nonces, balances) go out in one round trip
+    if web3_instance is web3_eth:
+        return get_read_batcher(web3_eth, ETHEREUM_NODE_URL, 'ethereum')
+    return get_read_batcher(web3_bsc, BSC_NODE_URL, 'bsc')
 
 def approve_transfer(web3_instance,contract,method,spender, amount, from_address, private_key):
-    tx = contract.functions[method](spender, amount).buildTransaction({
+    tx = contract.functions[method](spender, amount).build_transaction({
         'from': from_address,
-        'nonce': web3_instance.eth.getTransactionCount(from_address),
+        'nonce': web3_instance.eth.get_transaction_count(from_address),
         'gas': 2000000,
-        'gasPrice': web3_instance.toWei('20', 'gwei')
+        **gas_params(web3_instance)
     })
     signed_tx = web3_instance.eth.account.sign_transaction(tx, private_key=private_key)
-    tx_hash = web3_instance.eth.sendRawTransaction(signed_tx.rawTransaction)
-    receipt = web3_instance.eth.waitForTransactionReceipt(tx_hash)
-    print(f"Tokens Approved. TxHash: {web3_instance.toHex(tx_hash)}")
+    tx_hash = web3_instance.eth.send_raw_transaction(signed_tx.rawTransaction)
+    receipt = wait_for_receipt(web3_instance, tx_hash)
+    print(f"Tokens Approved. TxHash: {web3_instance.to_hex(tx_hash)}")
     return receipt
 
 def pay_mint_fee(to_address, mint_fee):
@@ -61,75 +186,39 @@ def pay_mint_fee(to_address, mint_fee):
     receipt_id = f"{to_address}-{timestamp}"
 
     # Make the transaction to pay the mint fee
-    txn = bep20_contract.functions.payMintFee(timestamp).buildTransaction({
+    txn = bep20_contract.functions.payMintFee(timestamp).build_transaction({
         'from': to_address,
-        'value': web3_bsc.toWei(mint_fee, 'ether'),  # Replace with the actual mint fee in ether
-        'nonce': web3_bsc.eth.getTransactionCount(to_address),
+        'value': web3_bsc.to_wei(mint_fee, 'ether'),  # Replace with the actual mint fee in ether
+        'nonce': web3_bsc.eth.get_transaction_count(to_address),
         'gas': 2000000,
-        'gasPrice': web3_bsc.toWei('20', 'gwei')
+        **gas_params(web3_bsc)
     })
 
-    signed_txn = web3_bsc.eth.account.signTransaction(txn, private_key=BSC_CONTRACT_USER_PRIVATE_KEY)
-    txn_hash = web3_bsc.eth.sendRawTransaction(signed_txn.rawTransaction)
+    signed_txn = web3_bsc.eth.account.sign_transaction(txn, private_key=BSC_CONTRACT_USER_PRIVATE_KEY)
+    txn_hash = web3_bsc.eth.send_raw_transaction(signed_txn.rawTransaction)
 
     print(f"Mint fee transaction sent. Hash: {txn_hash.hex()}")
 
-    # Poll for the receipt using the receipt_id via HTTP request
-    url = f"http://localhost:8000/collect/"
-    payload = {'receipt_id': receipt_id}
-    
-    while True:
-        try:
-            response = requests.post(url, json=payload)
-            
-            if response.status_code == 200:
-                receipt_data = response.json()
-                print(f"Receipt found: {receipt_data}")
-                break
-            else:
-                print("Receipt not found, polling again in 5 seconds...")
-        except requests.exceptions.RequestException as e:
-            print(f"Error during the HTTP request: {e}")
-        
-        time.sleep(5)
-
-    return receipt_data
+    # Wait for the receipt service to push the signed receipt
+    return collect_receipt(receipt_id)
 
 def pay_release_fee( to_address, release_fee):
     timestamp = int(time.time())
     receipt_id = f"{to_address}-{timestamp}"
-    tx = erc20_lock_contract.functions.payReleaseFee(timestamp).buildTransaction({
+    tx = erc20_lock_contract.functions.payReleaseFee(timestamp).build_transaction({
         'from': from_address,
-        'value': web3_eth.toWei(release_fee, 'ether'),
-        'nonce': web3_eth.eth.getTransactionCount(from_address),
+        'value': web3_eth.to_wei(release_fee, 'ether'),
+        'nonce': web3_eth.eth.get_transaction_count(from_address),
         'gas': 2000000,
-        'gasPrice': web3_eth.toWei('20', 'gwei')
+        **gas_params(web3_eth)
     })
     signed_tx = web3_eth.eth.account.sign_transaction(tx, private_key=ETH_CONTRACT_USER_PRIVATE_KEY)
-    tx_hash = web3_eth.eth.sendRawTransaction(signed_tx.rawTransaction)
-    receipt = web3_eth.eth.waitForTransactionReceipt(tx_hash)
-    print(f"Release Fee Paid. TxHash: {web3_eth.toHex(tx_hash)}")
+    tx_hash = web3_eth.eth.send_raw_transaction(signed_tx.rawTransaction)
+    wait_for_receipt(web3_eth, tx_hash)
+    print(f"Release Fee Paid. TxHash: {web3_eth.to_hex(tx_hash)}")
     
-     # Poll for the receipt using the receipt_id via HTTP request
-    url = f"http://localhost:8000/collect/"
-    payload = {'receipt_id': receipt_id}
-    
-    while True:
-        try:
-            response = requests.post(url, json=payload)
-            
-            if response.status_code == 200:
-                receipt_data = response.json()
-                print(f"Receipt found: {receipt_data}")
-                break
-            else:
-                print("Receipt not found, polling again in 5 seconds...")
-        except requests.exceptions.RequestException as e:
-            print(f"Error during the HTTP request: {e}")
-        
-        time.sleep(5)
-
-    return receipt_data
+     # Wait for the receipt service to push the signed receipt
+    return collect_receipt(receipt_id)
 
 def transfer_tokens(from_chain_user_address, to_chain_user_address, amount, direction,receipt,token_contract_address_of_token_to_transfer_from_or_to_on_eth_chain):
     transferRequestId = uuid.uuid4()
@@ -138,16 +227,16 @@ def transfer_tokens(from_chain_user_address, to_chain_user_address, amount, dire
         nonce = receipt['nonce']
         contract_address = receipt['contractAddress']
         receipt_signature = receipt['receipt']
-        tx = erc20_lock_contract.functions.lockTokens(token_contract_address_of_token_to_transfer_from_or_to_on_eth_chain, amount, to_chain_user_address,fee_amount,nonce,contract_address,receipt_signature,transferRequestId).buildTransaction({
+        tx = erc20_lock_contract.functions.lockTokens(token_contract_address_of_token_to_transfer_from_or_to_on_eth_chain, amount, to_chain_user_address,fee_amount,nonce,contract_address,receipt_signature,transferRequestId).build_transaction({
             'from': from_chain_user_address,
-            'nonce': web3_eth.eth.getTransactionCount(from_chain_user_address),
+            'nonce': web3_eth.eth.get_transaction_count(from_chain_user_address),
             'gas': 2000000,
-            'gasPrice': web3_eth.toWei('20', 'gwei')
+            **gas_params(web3_eth)
         })
         signed_tx = web3_eth.eth.account.sign_transaction(tx, private_key=ETH_CONTRACT_USER_PRIVATE_KEY)
-        tx_hash = web3_eth.eth.sendRawTransaction(signed_tx.rawTransaction)
+        tx_hash = web3_eth.eth.send_raw_transaction(signed_tx.rawTransaction)
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f'Tokens Lock called on Ethereum. TxHash: {web3_eth.toHex(tx_hash)} ')
+        print(f'Tokens Lock called on Ethereum. TxHash: {web3_eth.to_hex(tx_hash)} ')
         print(f'Token Transfer for ${amount} tokens of {token_contract_address_of_token_to_transfer_from_or_to_on_eth_chain} from Ethereum  address {from_chain_user_address} to Binance  address {to_chain_user_address} initiated at [{timestamp}] with Transfer request id [{transferRequestId}]')
 
     elif direction == "bsc_to_eth":
@@ -155,19 +244,21 @@ def transfer_tokens(from_chain_user_address, to_chain_user_address, amount, dire
         nonce = receipt['nonce']
         contract_address = receipt['contractAddress']
         receipt_signature = receipt['receipt']
-        coordinator_fee = bep20_contract.functions.coordinatorFee().call()
+        # The coordinator fee and the account nonce are read in a single round trip
+        coordinator_fee = read_batcher(web3_bsc).call(bep20_contract.functions.coordinatorFee())
+        account_nonce = read_batcher(web3_bsc).get_transaction_count(from_chain_user_address)
         # Burn tokens on BSC
-        tx = bep20_contract.functions.burn(from_chain_user_address, amount, to_chain_user_address,token_contract_address_of_token_to_transfer_from_or_to_on_eth_chain,fee_amount,nonce,contract_address,receipt_signature,transferRequestId).buildTransaction({
+        tx = bep20_contract.functions.burn(from_chain_user_address, amount, to_chain_user_address,token_contract_address_of_token_to_transfer_from_or_to_on_eth_chain,fee_amount,nonce,contract_address,receipt_signature,transferRequestId).build_transaction({
             'from': from_chain_user_address,
-            'value': coordinator_fee,
-            'nonce': web3_bsc.eth.getTransactionCount(from_chain_user_address),
+            'value': coordinator_fee.result(),
+            'nonce': account_nonce.result(),
             'gas': 2000000,
-            'gasPrice': web3_bsc.toWei('5', 'gwei')
+            **gas_params(web3_bsc)
         })
         signed_tx = web3_bsc.eth.account.sign_transaction(tx, private_key=BSC_CONTRACT_USER_PRIVATE_KEY)
-        tx_hash = web3_bsc.eth.sendRawTransaction(signed_tx.rawTransaction)
+        tx_hash = web3_bsc.eth.send_raw_transaction(signed_tx.rawTransaction)
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f'Tokens Burn called on BSC. TxHash: {web3_bsc.toHex(tx_hash)} at [{timestamp}]')
+        print(f'Tokens Burn called on BSC. TxHash: {web3_bsc.to_hex(tx_hash)} at [{timestamp}]')
         print(f'Token Transfer for ${amount} tokens from Ethereum  address {from_chain_user_address} to Binance  address {to_chain_user_address} into  {token_contract_address_of_token_to_transfer_from_or_to_on_eth_chain} tokens initiated at [{timestamp}] with Transfer request id [{transferRequestId}]')
 
 def transfer(from_address,to_address,amount,direction,token_contract_address):    
@@ -187,9 +278,9 @@ def transfer(from_address,to_address,amount,direction,token_contract_address):
         print('Invalid direction')
         
 if __name__ == "__main__":
-    from_address = Web3.toChecksumAddress(ETH_CONTRACT_USER_ADDRESS)
-    to_address = Web3.toChecksumAddress(BSC_CONTRACT_USER_ADDRESS)
+    from_address = Web3.to_checksum_address(ETH_CONTRACT_USER_ADDRESS)
+    to_address = Web3.to_checksum_address(BSC_CONTRACT_USER_ADDRESS)
     amount = int(0.01)
     direction = "eth_to_bsc"
-    token_contract_address = Web3.toChecksumAddress(ERC20_TOKEN_TO_TRANSFER_ADDRESS)
+    token_contract_address = Web3.to_checksum_address(ERC20_TOKEN_TO_TRANSFER_ADDRESS)
     transfer(from_address,to_address,amount,direction,token_contract_address)
\ No newline at end of file